@@ -0,0 +1,171 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+
+from stage_timer import StageTimer
+
+
+class NullDBLogger:
+    """Stands in for AzureDBLogger so replays never touch the network."""
+    connected = False
+
+    def __init__(self):
+        self.events = []
+
+    def log_event(self, camera_id, angle, status, experiment_id=None, clip_path=None):
+        self.events.append((camera_id, angle, status, experiment_id, clip_path))
+
+    def close(self):
+        pass
+
+
+class NullEventStore:
+    """Stands in for event_store.LocalEventStore so replays stay out of fall_events.db."""
+
+    def __init__(self):
+        self.events = []
+
+    def log_event(self, camera_id, angle, status, experiment_id=None, stage=None, clip_path=None):
+        self.events.append((camera_id, angle, status, experiment_id, stage, clip_path))
+
+    def close(self):
+        pass
+
+
+def has_display():
+    """Whether cv2.imshow can open a window here (Windows/macOS, or X11/Wayland on Linux)."""
+    if not sys.platform.startswith('linux'):
+        return True
+    return bool(os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+
+
+@contextlib.contextmanager
+def offscreen_window():
+    """
+    Replaces imshow/waitKey/destroyAllWindows with no-ops so GUI-mode runs
+    still pay for all overlay rendering on a box without a display.
+    """
+    saved = cv2.imshow, cv2.waitKey, cv2.destroyAllWindows
+    cv2.imshow = lambda name, frame: None
+    cv2.waitKey = lambda delay=0: -1
+    cv2.destroyAllWindows = lambda: None
+    try:
+        yield
+    finally:
+        cv2.imshow, cv2.waitKey, cv2.destroyAllWindows = saved
+
+
+def run_benchmark(source, max_frames=None, headless=True, pipelined=False, drop_policy='block',
+                  tracking=None, cylinder_diameter=None, preview_every=1, instrument=True, clips=None):
+    """
+    Replays a frame source through main() as fast as possible and returns
+    {'frames', 'seconds', 'fps', 'events', 'clips', 'stages': StageTimer.summary()}.
+    Sequential by default so stage timings are not skewed by thread contention;
+    pipelined=True measures the threaded pipeline (lossless 'block' policy).
+    Runs inside a scratch directory so fall_events.db / telemetry files
+    from the replay do not land in the working tree.
+    headless=False renders every preview_every-th frame and shows it
+    (offscreen when there is no display, see offscreen_window()).
+    clips (ClipRecorder options) records alert clips into the scratch directory.
+    """
+    import cylinder_fall_detection
+
+    timer = StageTimer()
+    db = NullDBLogger()
+    cwd = os.getcwd()
+    window = offscreen_window() if not headless and not has_display() else contextlib.nullcontext()
+    with tempfile.TemporaryDirectory() as scratch, window:
+        os.chdir(scratch)
+        try:
+            start = time.perf_counter()
+            cylinder_fall_detection.main(source=source, headless=headless, db=db,
+                                         timer=timer, max_frames=max_frames,
+                                         pipelined=pipelined, drop_policy=drop_policy,
+                                         tracking=tracking, cylinder_diameter=cylinder_diameter,
+                                         preview_every=preview_every, instrument=instrument,
+                                         clips=clips, store=NullEventStore())
+            elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+    stages = timer.summary()
+    frames = stages.get('capture', {}).get('count', 0)
+    return {
+        'frames': frames,
+        'seconds': elapsed,
+        'fps': frames / elapsed if elapsed > 0 else 0.0,
+        'events': len(db.events),
+        'clips': sum(1 for event in db.events if event[-1] is not None),
+        'stages': stages,
+    }
+
+
+def compare_render_modes(source, max_frames=None, preview_every=10, **kwargs):
+    """Same replay in headless, GUI and low-rate preview mode; prints FPS side by side."""
+    modes = [('headless', True, 1), ('gui', False, 1), (f"preview 1/{preview_every}", False, preview_every)]
+    results = []
+    for label, headless, every in modes:
+        result = run_benchmark(source, max_frames=max_frames, headless=headless,
+                               preview_every=every, **kwargs)
+        results.append((label, result))
+
+    base = results[0][1]['fps']
+    window = "window" if has_display() else "offscreen"
+    print(f"\n{'mode':<16}{'FPS':>8}{'vs headless':>13}{'overlay p50':>13}{'display p50':>13}  ({window})")
+    for label, r in results:
+        overlay = r['stages'].get('overlay', {}).get('p50_ms', 0.0)
+        display = r['stages'].get('display', {}).get('p50_ms', 0.0)
+        ratio = r['fps'] / base if base > 0 else 0.0
+        print(f"{label:<16}{r['fps']:>8.1f}{ratio:>12.2f}x{overlay:>11.3f}ms{display:>11.3f}ms")
+    return results
+
+
+def print_report(result):
+    print(f"\n[BENCH] {result['frames']} frames in {result['seconds']:.2f}s "
+          f"-> {result['fps']:.1f} FPS ({result['events']} fall events)")
+    print(f"{'stage':<16}{'count':>8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for name, s in result['stages'].items():
+        print(f"{name:<16}{s['count']:>8}{s['mean_ms']:>9.3f}{s['p50_ms']:>9.3f}"
+              f"{s['p95_ms']:>9.3f}{s['p99_ms']:>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay benchmark for the detection loop")
+    parser.add_argument('--source', default='synthetic:600',
+                        help="Video file, image directory or 'synthetic[:N]' (default: synthetic:600)")
+    parser.add_argument('--frames', type=int, default=None, help="Stop after this many frames")
+    parser.add_argument('--json', default=None, help="Also write the result to this JSON file (for CI tracking)")
+    parser.add_argument('--pipeline', action='store_true', help="Benchmark the threaded pipeline")
+    parser.add_argument('--drop-policy', default='block', choices=['latest', 'block'],
+                        help="Queue policy when --pipeline is set (default: block, lossless)")
+    parser.add_argument('--track', action='store_true', help="Enable ROI tracking")
+    parser.add_argument('--rescan', type=int, default=15, help="Frames between full rescans with --track")
+    parser.add_argument('--pyramid', type=int, default=0, help="Pyramid levels for full rescans with --track")
+    parser.add_argument('--cylinder-pose', type=float, default=None, metavar='DIAMETER_MM',
+                        help="Use the fused cylinder pose for a strip printed at this diameter")
+    parser.add_argument('--gui', action='store_true', help="Render the overlay and show it (default: headless)")
+    parser.add_argument('--preview-every', type=int, default=None, metavar='N',
+                        help="With --gui, render only every Nth frame (--compare-render default: 10)")
+    parser.add_argument('--compare-render', action='store_true',
+                        help="Compare headless, GUI and every-Nth-frame preview throughput")
+    args = parser.parse_args()
+
+    tracking = {'rescan_interval': args.rescan, 'pyramid_levels': args.pyramid} if args.track else None
+    options = dict(pipelined=args.pipeline, drop_policy=args.drop_policy, tracking=tracking,
+                   cylinder_diameter=args.cylinder_pose / 1000.0 if args.cylinder_pose else None)
+    if args.compare_render:
+        compare_render_modes(args.source, args.frames, max(2, args.preview_every or 10), **options)
+        raise SystemExit
+    result = run_benchmark(args.source, max_frames=args.frames, headless=not args.gui,
+                           preview_every=max(1, args.preview_every or 1), **options)
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"[BENCH] Saved {args.json}")
@@ -0,0 +1,68 @@
+import argparse
+import multiprocessing as mp
+import statistics
+import threading
+
+# Ring configurations compared against clip capture off
+MODES = [
+    ('off', None),
+    ('color 1.0', {'scale': 1.0}),
+    ('color 0.5', {'scale': 0.5}),
+    ('gray 0.5', {'scale': 0.5, 'grayscale': True}),
+]
+
+
+def run_mode(source, frames, clips, interval=0.25):
+    """
+    One replay in this (fresh) process with RSS sampled every `interval`
+    seconds; steady-state RSS is the median over the second half of the run.
+    """
+    from benchmark import run_benchmark
+    from process_metrics import MetricsSampler
+
+    sampler = MetricsSampler()
+    samples = []
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(interval):
+            samples.append(sampler.sample()['rss_mb'])
+
+    thread = threading.Thread(target=sample, daemon=True)
+    thread.start()
+    try:
+        result = run_benchmark(source, max_frames=frames, clips=clips)
+    finally:
+        stop.set()
+        thread.join()
+    steady = samples[len(samples) // 2:] or [sampler.sample()['rss_mb']]
+    result['rss_mb'] = statistics.median(steady)
+    result['peak_rss_mb'] = max(samples or steady)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Steady-state RAM and FPS with fall-clip capture")
+    parser.add_argument('--source', default='synthetic:1800',
+                        help="Video file, image directory or 'synthetic[:N]' (default: synthetic:1800, 6 falls)")
+    parser.add_argument('--frames', type=int, default=None, help="Stop after this many frames")
+    parser.add_argument('--pre', type=float, default=8.0, help="Seconds before the alert")
+    parser.add_argument('--post', type=float, default=4.0, help="Seconds after the alert")
+    args = parser.parse_args()
+
+    # Each mode in a fresh interpreter so freed ring memory does not carry over
+    ctx = mp.get_context('spawn')
+    results = []
+    for label, options in MODES:
+        clips = dict(options, directory='clips', pre_s=args.pre, post_s=args.post) if options is not None else None
+        with ctx.Pool(1) as pool:
+            results.append((label, pool.apply(run_mode, (args.source, args.frames, clips))))
+
+    base = results[0][1]
+    print(f"\n{'clips':<12}{'FPS':>8}{'vs off':>8}{'RSS':>9}{'+RSS':>8}{'peak':>8}{'push p50':>10}"
+          f"{'push p99':>10}{'alerts':>8}{'clips':>7}")
+    for label, r in results:
+        push = r['stages'].get('clipBuffer', {})
+        print(f"{label:<12}{r['fps']:>8.1f}{r['fps'] / base['fps']:>7.2f}x{r['rss_mb']:>7.0f}MB"
+              f"{r['rss_mb'] - base['rss_mb']:>6.0f}MB{r['peak_rss_mb']:>6.0f}MB"
+              f"{push.get('p50_ms', 0.0):>8.3f}ms{push.get('p99_ms', 0.0):>8.3f}ms{r['events']:>8}{r['clips']:>7}")
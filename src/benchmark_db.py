@@ -0,0 +1,154 @@
+import argparse
+import datetime
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from db_logger import BatchEventWriter, INSERT_EVENT_QUERY
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS FallEvents (
+    EventID INTEGER PRIMARY KEY AUTOINCREMENT,
+    CameraID TEXT, RiskAngle INTEGER, Status TEXT, Timestamp TEXT, ExperimentID TEXT,
+    VerificationStatus INTEGER DEFAULT 0
+)
+"""
+
+
+class SlowConnection:
+    """sqlite3 connection that sleeps rtt seconds per round trip, standing in for Azure SQL."""
+
+    def __init__(self, path, rtt):
+        self._conn = sqlite3.connect(path)
+        self.rtt = rtt
+        time.sleep(rtt * 3)  # TCP + TLS + login
+
+    def cursor(self):
+        conn = self
+
+        class _Cursor:
+            def __init__(self):
+                self._cur = conn._conn.cursor()
+
+            def execute(self, *args):
+                time.sleep(conn.rtt)
+                return self._cur.execute(*args)
+
+            def executemany(self, *args):
+                time.sleep(conn.rtt)
+                return self._cur.executemany(*args)
+
+            def fetchall(self):
+                return self._cur.fetchall()
+
+        return _Cursor()
+
+    def commit(self):
+        time.sleep(self.rtt)
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+class FlakyConnect:
+    """connect() factory that fails until `down_until` (time.monotonic()), like a firewall outage."""
+
+    def __init__(self, connect, down_for):
+        self.connect = connect
+        self.down_until = time.monotonic() + down_for
+
+    def __call__(self):
+        if time.monotonic() < self.down_until:
+            raise ConnectionError("simulated outage")
+        return self.connect()
+
+
+def _percentiles_ms(samples):
+    ms = np.asarray(samples) * 1000.0
+    return "p50 %.2f / p95 %.2f / p99 %.2f ms" % tuple(np.percentile(ms, [50, 95, 99]))
+
+
+def _row(i):
+    return ("Bench_Cam", i, "FALL_CONFIRMED", datetime.datetime.now(), "EXP_BENCH")
+
+
+def bench_connect_per_event(path, events, rtt):
+    """The old AzureDBLogger.log_event path: connect, INSERT, commit per event."""
+    blocked = []
+    start = time.perf_counter()
+    for i in range(events):
+        t = time.perf_counter()
+        conn = SlowConnection(path, rtt)
+        cur = conn.cursor()
+        cur.execute(INSERT_EVENT_QUERY, _row(i))
+        conn.commit()
+        conn.close()
+        blocked.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    print(f"[connect-per-event] {events / elapsed:8.1f} events/s | caller blocked {_percentiles_ms(blocked)}")
+
+
+def bench_batch_writer(path, events, rtt, batch_size, flush_interval, spool):
+    blocked = []
+    writer = BatchEventWriter(lambda: SlowConnection(path, rtt), batch_size=batch_size,
+                              flush_interval=flush_interval, spool_path=spool)
+    start = time.perf_counter()
+    for i in range(events):
+        t = time.perf_counter()
+        writer.submit(_row(i))
+        blocked.append(time.perf_counter() - t)
+    writer.close(timeout=60.0)
+    elapsed = time.perf_counter() - start
+    print(f"[batch writer]      {events / elapsed:8.1f} events/s | caller blocked {_percentiles_ms(blocked)}")
+    print(f"                    flush latency {_percentiles_ms(writer.flush_latencies)} | {writer.stats}")
+
+
+def bench_outage(path, events, rtt, outage, spool):
+    """Submits events while the DB is down, then checks every row arrives once and in order."""
+    connect = FlakyConnect(lambda: SlowConnection(path, rtt), outage)
+    writer = BatchEventWriter(connect, batch_size=20, flush_interval=0.2, spool_path=spool,
+                              retry_interval=0.5)
+    base = sqlite3.connect(path).execute("SELECT COUNT(*) FROM FallEvents").fetchone()[0]
+    for i in range(events):
+        writer.submit(("Outage_Cam", i, "FALL_CONFIRMED", datetime.datetime.now(), "EXP_OUTAGE"))
+        time.sleep(outage * 1.5 / events)
+    deadline = time.monotonic() + outage + 30
+    while os.path.exists(spool) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    writer.close(timeout=30.0)
+
+    conn = sqlite3.connect(path)
+    angles = [r[0] for r in conn.execute(
+        "SELECT RiskAngle FROM FallEvents WHERE CameraID = 'Outage_Cam' ORDER BY EventID")]
+    conn.close()
+    ok = angles == list(range(events))
+    print(f"[outage {outage:.0f}s]        spooled {writer.stats['spooled']}, replayed {writer.stats['replayed']}, "
+          f"rows {len(angles)}/{events} in order: {ok} (table had {base} rows before)")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput / flush latency of the DB event writer on a SQLite stand-in")
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--rtt-ms', type=float, default=20.0, help="Simulated DB round trip")
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--flush-interval', type=float, default=0.5)
+    parser.add_argument('--outage', type=float, default=3.0, help="Seconds of simulated outage (0 = skip)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, "fall_events.sqlite")
+        spool = os.path.join(scratch, "db_spool.jsonl")
+        with sqlite3.connect(path) as conn:
+            conn.execute(SCHEMA)
+        rtt = args.rtt_ms / 1000.0
+
+        baseline_events = min(args.events, 100)
+        bench_connect_per_event(path, baseline_events, rtt)
+        bench_batch_writer(path, args.events, rtt, args.batch_size, args.flush_interval, spool)
+        if args.outage > 0:
+            bench_outage(path, 100, rtt, args.outage, spool)
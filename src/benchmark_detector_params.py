@@ -0,0 +1,179 @@
+import argparse
+import itertools
+import multiprocessing as mp
+import os
+import time
+
+import cv2
+import cv2.aruco as aruco
+import numpy as np
+
+from cylinder_fall_detection import MARKER_SIZE, calculate_angles
+from detector_params import PARAMETER_GRID, make_parameters, save_parameters
+from synthetic_scene import BOTTOM_MARKER_ID, CylinderScene, labelled_frames, scene_grid
+
+_scene = None
+_frames = None
+
+
+def _render(chunk):
+    global _scene
+    if _scene is None:
+        _scene = CylinderScene()
+    return list(labelled_frames(_scene, chunk))
+
+
+def _init_worker(frames):
+    global _frames
+    _frames = frames
+
+
+def evaluate(values):
+    """
+    Runs detection + per-marker pose with one parameter set over every
+    labelled frame. Returns the metrics dict for the Pareto front:
+    detection rate of the markers a detector should find, mean absolute
+    strip-marker tilt error, IDs that are not on the cylinder, CPU ms/frame,
+    and frames on which OpenCV raised (such a configuration is unusable live).
+    """
+    aruco_dict = aruco.getPredefinedDictionary(aruco.DICT_4X4_100)
+    params = make_parameters(values)
+    expected = found = false_ids = crashes = 0
+    errors = []
+    cpu = 0.0
+    for gray, label in _frames:
+        h, w = gray.shape
+        camera_matrix = np.array([[w, 0, w / 2], [0, w, h / 2], [0, 0, 1]], dtype=np.float64)
+        start = time.process_time()
+        angles = None
+        try:
+            corners, ids, _ = aruco.detectMarkers(gray, aruco_dict, parameters=params)
+            if ids is not None:
+                rvecs, _, _ = aruco.estimatePoseSingleMarkers(corners, MARKER_SIZE, camera_matrix, np.zeros(4))
+                angles = calculate_angles(rvecs)
+        except cv2.error:
+            ids = None
+            crashes += 1
+        cpu += time.process_time() - start
+
+        visible = set(label['visible_ids'])
+        expected += len(visible)
+        if ids is None:
+            continue
+        for marker_id, angle in zip(ids.ravel().tolist(), angles.tolist()):
+            if marker_id in visible:
+                found += 1
+            if marker_id == BOTTOM_MARKER_ID:
+                continue
+            if marker_id >= label['strip_markers']:
+                false_ids += 1
+            else:
+                errors.append(abs(angle - label['tilt']))
+    return {
+        'parameters': values,
+        'detection_rate': found / expected if expected else 0.0,
+        'angle_error': float(np.mean(errors)) if errors else float('nan'),
+        'false_ids': false_ids,
+        'crashes': crashes,
+        'ms_per_frame': cpu / len(_frames) * 1000.0,
+    }
+
+
+def pareto_front(results):
+    """Results not dominated on (detection rate up, angle error down, ms/frame down)."""
+    def key(r):
+        return (-r['detection_rate'], r['angle_error'], r['ms_per_frame'])
+
+    front = []
+    for r in results:
+        kr = key(r)
+        dominated = any(all(a <= b for a, b in zip(key(o), kr)) and key(o) != kr for o in results)
+        if not dominated:
+            front.append(r)
+    return sorted(front, key=key)
+
+
+def pick_best(results, max_ms=None, rate_tolerance=0.005):
+    """
+    Highest detection rate without foreign IDs or OpenCV errors (and within
+    max_ms); among configurations within rate_tolerance of it, the lowest
+    angle error, then the fastest.
+    """
+    pool = [r for r in results if r['false_ids'] == 0 and r['crashes'] == 0] or results
+    if max_ms is not None:
+        pool = [r for r in pool if r['ms_per_frame'] <= max_ms] or pool
+    best_rate = max(r['detection_rate'] for r in pool)
+    close = [r for r in pool if r['detection_rate'] >= best_rate - rate_tolerance]
+    return min(close, key=lambda r: (r['angle_error'], r['ms_per_frame']))
+
+
+def _describe(values):
+    defaults = make_parameters()
+    changed = [f"{k}={v}" for k, v in values.items()
+               if k == 'cornerRefinementMethod' and v != 'NONE'
+               or k != 'cornerRefinementMethod' and getattr(defaults, k) != v]
+    return ", ".join(changed) or "(OpenCV defaults)"
+
+
+def _print_row(label, r):
+    print(f"{label:<6}{r['detection_rate'] * 100:>7.1f}%{r['angle_error']:>9.2f}{r['ms_per_frame']:>9.2f}"
+          f"{r['false_ids']:>7}{r['crashes']:>7}  {_describe(r['parameters'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Tune ArUco detector parameters on labelled synthetic cylinder frames")
+    parser.add_argument('--tilts', default="0,20,40,60,80", help="Tilt angles (degrees)")
+    parser.add_argument('--distances', default="0.3,0.5,0.8,1.2", help="Distances (m)")
+    parser.add_argument('--blurs', default="0,1.5,3", help="Gaussian blur sigmas (px)")
+    parser.add_argument('--noises', default="0,8", help="Noise sigmas (gray levels)")
+    parser.add_argument('--samples', type=int, default=None,
+                        help="Evaluate this many random grid points instead of the full grid")
+    parser.add_argument('--workers', type=int, default=None, help="Processes (default: one per core)")
+    parser.add_argument('--max-ms', type=float, default=None, help="Only pick configurations this fast")
+    parser.add_argument('--out', default='detector_params.json',
+                        help="Where to save the best configuration (load with --detector-params)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    floats = lambda text: [float(v) for v in text.split(',')]
+    grid = scene_grid(floats(args.tilts), floats(args.distances), floats(args.blurs), floats(args.noises),
+                      seed=args.seed)
+    workers = args.workers or os.cpu_count() or 1
+    chunks = [grid[i::workers] for i in range(workers)]
+
+    names = list(PARAMETER_GRID)
+    configs = [dict(zip(names, combo)) for combo in itertools.product(*PARAMETER_GRID.values())]
+    if args.samples is not None and args.samples < len(configs):
+        rng = np.random.default_rng(args.seed)
+        configs = [configs[i] for i in sorted(rng.choice(len(configs), args.samples, replace=False))]
+    configs.insert(0, {})  # OpenCV defaults as the baseline
+
+    start = time.perf_counter()
+    with mp.get_context().Pool(workers) as pool:
+        frames = [f for chunk in pool.map(_render, chunks) for f in chunk]
+    strip_markers = len(CylinderScene().marker_points)
+    for _, label in frames:
+        label['strip_markers'] = strip_markers
+    render_s = time.perf_counter() - start
+    print(f"[TUNE] Rendered {len(frames)} labelled frames in {render_s:.1f}s on {workers} process(es)")
+
+    start = time.perf_counter()
+    with mp.get_context().Pool(workers, initializer=_init_worker, initargs=(frames,)) as pool:
+        results = pool.map(evaluate, configs, chunksize=max(1, len(configs) // (workers * 4)))
+    print(f"[TUNE] Evaluated {len(configs)} configurations in {time.perf_counter() - start:.1f}s")
+
+    baseline = results[0]
+    front = pareto_front(results)
+    best = pick_best(results, args.max_ms)
+    print(f"\n{'':<6}{'detect':>8}{'err deg':>9}{'ms/frm':>9}{'false':>7}{'errors':>7}  parameters")
+    _print_row('base', baseline)
+    print(f"--- Pareto front ({len(front)} of {len(results)}) ---")
+    for r in front:
+        _print_row('best' if r is best else '', r)
+    if best not in front:
+        _print_row('best', best)
+
+    save_parameters(args.out, best['parameters'],
+                    {k: best[k] for k in ('detection_rate', 'angle_error', 'false_ids', 'crashes', 'ms_per_frame')})
+    print(f"\n[TUNE] Saved {args.out} (load with: cylinder_fall_detection.py --detector-params {args.out})")
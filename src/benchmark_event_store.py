@@ -0,0 +1,139 @@
+import argparse
+import datetime
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from event_store import (INSERT_LOCAL_QUERY, LocalEventStore, connect, format_timestamp, import_legacy_log,
+                         recent_events, summarize)
+
+STAGES = [2, 60, 600, 3600]
+
+
+def populate(conn, rows, days=30, cameras=8, run_hours=12, seed=0, chunk=100000):
+    """
+    Bulk-inserts `rows` random events spread over the last `days` days, with
+    a new experiment every `run_hours` as the monitor does; returns rows/s.
+    """
+    rng = np.random.default_rng(seed)
+    now = datetime.datetime.now()
+    start = time.perf_counter()
+    for first in range(0, rows, chunk):
+        n = min(chunk, rows - first)
+        ages = np.sort(rng.uniform(0, days * 86400.0, n))[::-1]
+        cams = rng.integers(0, cameras, n)
+        stages = rng.choice(STAGES, n, p=[0.85, 0.1, 0.04, 0.01])
+        angles = rng.integers(45, 95, n)
+        batch = [(f"Cylinder_Cam_{c + 1:02d}", int(a), 'FALL_CONFIRMED',
+                  format_timestamp(now - datetime.timedelta(seconds=float(age))),
+                  f"EXP_{int(age // (run_hours * 3600)):03d}", int(s), None)
+                 for age, c, s, a in zip(ages, cams, stages, angles)]
+        with conn:
+            conn.executemany(INSERT_LOCAL_QUERY, batch)
+    return rows / (time.perf_counter() - start)
+
+
+def time_query(fn, repeats=5):
+    """Median wall time (ms) of fn() over `repeats` runs, and its last result."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000.0)
+    return statistics.median(times), result
+
+
+def bench_writer(path, events):
+    """Caller-side cost of LocalEventStore.log_event and submit-to-commit latency."""
+    store = LocalEventStore(path)
+    blocked = []
+    for i in range(events):
+        start = time.perf_counter()
+        store.log_event("Cylinder_Cam_01", 80, "FALL_CONFIRMED", "EXP_BENCH", stage=2)
+        blocked.append(time.perf_counter() - start)
+        if i % 100 == 99:
+            time.sleep(0.01)  # alerts arrive spread out, not all in one burst
+    store.close()
+    flush = sorted(store.writer.flush_latencies)
+    blocked.sort()
+    return {
+        'events': events,
+        'written': store.writer.stats['written'],
+        'batches': store.writer.stats['batches'],
+        'blocked_p50_us': blocked[len(blocked) // 2] * 1e6,
+        'blocked_p99_us': blocked[int(len(blocked) * 0.99)] * 1e6,
+        'flush_p50_ms': flush[len(flush) // 2] * 1000.0 if flush else 0.0,
+        'flush_p99_ms': flush[int(len(flush) * 0.99)] * 1000.0 if flush else 0.0,
+    }
+
+
+def write_legacy_log(path, lines, seed=0):
+    """A text log mixing the two historical line formats."""
+    rng = np.random.default_rng(seed)
+    ts = datetime.datetime(2026, 1, 1)
+    with open(path, 'w') as f:
+        for i in range(lines):
+            ts += datetime.timedelta(seconds=float(rng.uniform(1, 600)))
+            angle = int(rng.integers(45, 95))
+            if i < lines // 3:
+                f.write(f"{ts} - CONFIRMED FALL - {angle}deg\n")
+            else:
+                f.write(f"{ts} - CONFIRMED FALL ({int(rng.choice(STAGES))}s) - {angle}deg\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local event store: insert rate, writer latency, query times")
+    parser.add_argument('--rows', type=int, default=2000000, help="Events in the populated store")
+    parser.add_argument('--days', type=int, default=30, help="Time span of the populated events")
+    parser.add_argument('--events', type=int, default=5000, help="Events logged through the background writer")
+    parser.add_argument('--legacy-lines', type=int, default=100000, help="Lines in the generated legacy log")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, 'fall_events.db')
+        conn = connect(path)
+        rate = populate(conn, args.rows, days=args.days)
+        conn.execute("ANALYZE")
+        size_mb = sum(os.path.getsize(os.path.join(scratch, f)) for f in os.listdir(scratch)) / 1e6
+        print(f"[STORE] Inserted {args.rows} events at {rate:,.0f} rows/s ({size_mb:.0f}MB with indexes)")
+
+        # The rollup must give exactly what a scan of every event gives
+        week = datetime.datetime.now() - datetime.timedelta(days=7)
+        scan = conn.execute("SELECT CameraID, ExperimentID, COUNT(*), MAX(RiskAngle), MIN(Timestamp), "
+                            "MAX(Timestamp) FROM FallEvents WHERE Timestamp >= ? AND Status = 'FALL_CONFIRMED' "
+                            "GROUP BY CameraID, ExperimentID ORDER BY CameraID, ExperimentID", (week,)).fetchall()
+        assert summarize(conn, ('camera', 'experiment'), since=week)[1] == scan, "rollup differs from a full scan"
+
+        day = datetime.datetime.now() - datetime.timedelta(days=1)
+        queries = [
+            ("per camera+experiment, last 7d", lambda: summarize(conn, ('camera', 'experiment'), since=week)),
+            ("per camera+stage, last 7d", lambda: summarize(conn, ('camera', 'stage'), since=week)),
+            ("per day, all time", lambda: summarize(conn, ('day',))),
+            ("one camera per experiment, all", lambda: summarize(conn, ('experiment',), camera_id="Cylinder_Cam_03")),
+            ("one experiment per camera", lambda: summarize(conn, ('camera',), experiment_id="EXP_010")),
+            ("total, last 24h", lambda: summarize(conn, (), since=day)),
+            ("newest 50, one camera", lambda: recent_events(conn, 50, camera_id="Cylinder_Cam_05")),
+        ]
+        print(f"\n{'query':<34}{'median':>10}{'groups':>8}")
+        for label, fn in queries:
+            ms, (_, rows) = time_query(fn)
+            print(f"{label:<34}{ms:>8.1f}ms{len(rows):>8}")
+
+        # Live alerts into the populated store through the background writer
+        result = bench_writer(path, args.events)
+        print(f"\n[STORE] Logged {result['events']} events: {result['written']} written in {result['batches']} batches, "
+              f"caller blocked p50 {result['blocked_p50_us']:.1f}us / p99 {result['blocked_p99_us']:.1f}us, "
+              f"submit-to-commit p50 {result['flush_p50_ms']:.0f}ms / p99 {result['flush_p99_ms']:.0f}ms")
+
+        legacy = os.path.join(scratch, 'local_fall_log.txt')
+        write_legacy_log(legacy, args.legacy_lines)
+        start = time.perf_counter()
+        imported, skipped = import_legacy_log(conn, legacy)
+        elapsed = time.perf_counter() - start
+        again, _ = import_legacy_log(conn, legacy)
+        print(f"[STORE] Legacy import: {imported} lines in {elapsed:.2f}s ({imported / elapsed:,.0f} lines/s), "
+              f"{skipped} skipped, {again} on re-import")
+        conn.close()
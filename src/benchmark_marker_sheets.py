@@ -0,0 +1,89 @@
+import argparse
+import os
+import tempfile
+import time
+
+import cv2.aruco as aruco
+import numpy as np
+
+from generate_cylinder_marker import STRIP_DICTIONARY, marker_bitmap, render_strip, strip_layout
+from marker_sheets import build_sheets, cylinder
+
+# Stock tube diameters (mm) a site mostly has, plus one-off sizes
+CATALOGUE = [30, 40, 50, 60, 75, 80, 90, 100, 110, 125, 150, 160, 200, 250, 270, 300]
+
+
+def make_batch(count, seed=0, stock=0.7):
+    """`count` cylinders: `stock` of them catalogue diameters, the rest arbitrary 30-300 mm."""
+    rng = np.random.default_rng(seed)
+    cylinders = []
+    for i in range(count):
+        diameter = float(rng.choice(CATALOGUE)) if rng.random() < stock else float(rng.integers(30, 301))
+        size = 10.0 if diameter < 40 else 20.0 if diameter > 150 and rng.random() < 0.3 else 15.0
+        cylinders.append(cylinder(diameter, size, f"CYL-{i + 1:04d}"))
+    return cylinders
+
+
+def legacy_strip(diameter_mm, marker_size_mm, dpi=300):
+    """The strip as create_marker_strip built it before: one generateImageMarker call per marker."""
+    circumference_mm, num_markers, gap_mm = strip_layout(diameter_mm, marker_size_mm)
+    mm_to_px = dpi / 25.4
+    marker_px = int(marker_size_mm * mm_to_px)
+    gap_px = int(gap_mm * mm_to_px)
+    img = np.ones((int((marker_size_mm + 10) * mm_to_px), int(circumference_mm * mm_to_px)), dtype=np.uint8) * 255
+    aruco_dict = aruco.getPredefinedDictionary(STRIP_DICTIONARY)
+    x, y = gap_px // 2, (img.shape[0] - marker_px) // 2
+    for i in range(num_markers):
+        img[y:y + marker_px, x:x + marker_px] = aruco.generateImageMarker(aruco_dict, i, marker_px, borderBits=1)
+        x += marker_px + gap_px
+    return img
+
+
+def time_strips(cylinders, fn):
+    start = time.perf_counter()
+    for c in cylinders:
+        fn(c['diameter_mm'], c['marker_size_mm'])
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch marker sheet throughput: strips, PNG pieces and PDFs")
+    parser.add_argument('--cylinders', type=int, default=1000)
+    parser.add_argument('--workers', default=None, help="Comma-separated pool sizes (default: 1 and one per core)")
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    cylinders = make_batch(args.cylinders, args.seed)
+    markers = sum(c['markers'] for c in cylinders)
+    print(f"[SHEETS] {len(cylinders)} cylinders, {markers} strip markers, "
+          f"{len({(c['diameter_mm'], c['marker_size_mm']) for c in cylinders})} unique strips")
+
+    # Strip composition alone, every cylinder rendered (no de-duplication)
+    legacy_s = time_strips(cylinders, legacy_strip)
+    marker_bitmap.cache_clear()
+    cached_s = time_strips(cylinders, render_strip)
+    info = marker_bitmap.cache_info()
+    for c in cylinders[:50]:
+        assert np.array_equal(legacy_strip(c['diameter_mm'], c['marker_size_mm']),
+                              render_strip(c['diameter_mm'], c['marker_size_mm'])), "strip pixels differ"
+    print(f"\n{'strip composition':<28}{'total':>9}{'per strip':>12}{'strips/s':>10}")
+    for label, seconds in (("per-marker generate (old)", legacy_s), ("cached bitmaps + one blit", cached_s)):
+        print(f"{label:<28}{seconds:>8.2f}s{seconds / len(cylinders) * 1000:>10.2f}ms"
+              f"{len(cylinders) / seconds:>10.0f}")
+    print(f"  bitmap cache: {info.misses} generated, {info.hits} reused")
+
+    pools = [int(w) for w in args.workers.split(',')] if args.workers else sorted({1, os.cpu_count() or 1})
+    print(f"\n{'workers':>7}{'total':>9}{'render':>9}{'pdf':>8}{'cyl/s':>8}{'pieces':>8}{'pages':>7}"
+          f"{'files':>7}{'MB':>7}")
+    for workers in pools:
+        with tempfile.TemporaryDirectory() as out:
+            marker_bitmap.cache_clear()
+            start = time.perf_counter()
+            r = build_sheets(cylinders, out, dpi=args.dpi, workers=workers)
+            total = time.perf_counter() - start
+            size_mb = sum(os.path.getsize(p) for p in r['paths']) / 1e6
+        print(f"{workers:>7}{total:>8.2f}s{r['render_s']:>8.2f}s{r['pdf_s']:>7.2f}s{len(cylinders) / total:>8.0f}"
+              f"{r['pieces']:>8}{r['pages']:>7}{len(r['paths']):>7}{size_mb:>7.1f}")
+    print(f"\n({r['strips']} unique strips and {r['bottoms']} bottom markers rendered per run, "
+          f"{os.cpu_count()} core(s))")
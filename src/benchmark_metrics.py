@@ -0,0 +1,82 @@
+import argparse
+import time
+import urllib.request
+
+import numpy as np
+
+from benchmark import run_benchmark
+from instrumentation import FRAMES, MARKERS, REGISTRY, STAGE_SECONDS, Histogram, MetricsServer, Registry
+from stage_timer import StageTimer
+
+STAGES = ('capture', 'cvtColor', 'detectMarkers', 'estimatePose', 'calculate_angle', 'logging', 'overlay')
+
+
+def _frame_loop(timer, frames, count):
+    start = time.perf_counter()
+    for _ in range(frames):
+        for name in STAGES:
+            with timer.stage(name):
+                pass
+        if count:
+            FRAMES.inc()
+            MARKERS.inc(3)
+        timer.end_frame()
+    return (time.perf_counter() - start) / frames
+
+
+def bench_per_frame(frames):
+    """Instrumentation cost per frame: stage timing with histograms + counters vs stage timing alone."""
+    scratch = Histogram('bench_stage_seconds', "scratch", ['stage'], registry=Registry())
+    plain = min(_frame_loop(StageTimer(keep=False), frames, False) for _ in range(3))
+    instrumented = min(_frame_loop(StageTimer(keep=False, histogram=scratch), frames, True) for _ in range(3))
+    overhead_us = (instrumented - plain) * 1e6
+    print(f"[per-frame]   stage timing only {plain * 1e6:.2f} us | + histograms & counters "
+          f"{instrumented * 1e6:.2f} us | overhead {overhead_us:.2f} us/frame ({len(STAGES)} stages)")
+    return overhead_us
+
+
+def bench_end_to_end(source, repeats):
+    """Same replay with instrumentation on and off, interleaved to cancel drift."""
+    on, off = [], []
+    for _ in range(repeats):
+        off.append(run_benchmark(source, instrument=False)['fps'])
+        on.append(run_benchmark(source, instrument=True)['fps'])
+    fps_on, fps_off = np.median(on), np.median(off)
+    print(f"[end-to-end]  median FPS off {fps_off:.1f} | on {fps_on:.1f} | "
+          f"change {(fps_on / fps_off - 1) * 100:+.2f}% ({repeats} runs each, run-to-run spread "
+          f"{(max(off) - min(off)) / fps_off * 100:.1f}%)")
+    return fps_on, fps_off
+
+
+def bench_scrape(scrapes):
+    server = MetricsServer(port=0).start()
+    url = f"http://127.0.0.1:{server.port}/metrics"
+    render = []
+    for _ in range(scrapes):
+        t = time.perf_counter()
+        REGISTRY.render()
+        render.append(time.perf_counter() - t)
+    with urllib.request.urlopen(url, timeout=5) as response:
+        body = response.read().decode('utf-8')
+        content_type = response.headers['Content-Type']
+    server.close()
+    families = [line.split()[2] for line in body.splitlines() if line.startswith('# TYPE')]
+    ok = content_type.startswith('text/plain') and STAGE_SECONDS.name in families
+    print(f"[scrape]      render p50 {np.median(render) * 1000:.2f} ms, {len(body)} bytes, "
+          f"{len(families)} metric families, HTTP ok: {ok}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Overhead of the metrics instrumentation on the detection loop")
+    parser.add_argument('--source', default='synthetic:300')
+    parser.add_argument('--frames', type=int, default=20000, help="Frames for the per-frame micro benchmark")
+    parser.add_argument('--repeats', type=int, default=3, help="End-to-end replays per setting")
+    args = parser.parse_args()
+
+    overhead_us = bench_per_frame(args.frames)
+    fps_on, fps_off = bench_end_to_end(args.source, args.repeats)
+    bench_scrape(50)
+    frame_us = 1e6 / fps_off if fps_off else 0.0
+    print(f"\n[METRICS BENCH] {overhead_us:.2f} us of {frame_us:.0f} us per frame "
+          f"({overhead_us / frame_us * 100 if frame_us else 0:.3f}%)")
@@ -0,0 +1,75 @@
+import argparse
+import time
+
+from cylinder_fall_detection import CylinderMonitor
+from frame_sources import SyntheticSource, open_source
+
+
+def replay(source, motion_gate):
+    """
+    Runs every frame of source through one CylinderMonitor and returns the
+    CPU seconds spent in process(), the footage length and the alerts
+    [(threshold, seconds into the footage)].
+    """
+    alerts = []
+    now = {'ts': 0.0}
+
+    def alert_sink(camera_id, threshold, angle, experiment_id, event_key, clip_path=None):
+        alerts.append((threshold, round(now['ts'] - t0, 3)))
+
+    if not source.open():
+        raise RuntimeError("source did not open")
+    monitor = CylinderMonitor(source.width, source.height, None, "Bench_Cam",
+                              alert_sink=alert_sink, motion_gate=motion_gate)
+    cpu = 0.0
+    frames = 0
+    t0 = None
+    while True:
+        ret, frame, ts = source.read()
+        if not ret:
+            break
+        t0 = ts if t0 is None else t0
+        now['ts'] = ts
+        c = time.process_time()
+        monitor.process(frame, ts)
+        cpu += time.process_time() - c
+        frames += 1
+    source.release()
+    footage = frames / getattr(source, 'fps', 30.0)
+    return {'cpu': cpu, 'footage': footage, 'frames': frames, 'alerts': alerts,
+            'gate': monitor.gate.stats if monitor.gate is not None else None}
+
+
+def _source(args):
+    if args.source:
+        return open_source(args.source)
+    return SyntheticSource(num_frames=int(args.minutes * 60 * 30), fps=30.0,
+                           idle_s=args.idle, hold_s=args.hold, noise=args.noise)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU time per hour of footage with and without the motion gate")
+    parser.add_argument('--source', default=None, help="Recording to replay (default: mostly-static synthetic clip)")
+    parser.add_argument('--minutes', type=float, default=2.0, help="Length of the synthetic clip")
+    parser.add_argument('--idle', type=float, default=50.0, help="Static seconds before each synthetic fall")
+    parser.add_argument('--hold', type=float, default=10.0, help="Seconds the synthetic cylinder stays down")
+    parser.add_argument('--noise', type=float, default=2.0, help="Synthetic sensor noise (gray levels)")
+    parser.add_argument('--min-rate', type=float, default=1.0, help="Gate's minimum detections per second")
+    args = parser.parse_args()
+
+    results = {}
+    for label, gate in (('gate off', None), ('gate on', {'min_rate': args.min_rate})):
+        results[label] = r = replay(_source(args), gate)
+        per_hour = r['cpu'] / r['footage'] * 3600.0
+        detected = r['frames'] - (r['gate']['skipped'] if r['gate'] else 0)
+        print(f"[{label:<8}] {r['frames']} frames ({r['footage']:.0f}s footage): CPU {r['cpu']:.2f}s "
+              f"-> {per_hour / 60:.1f} CPU-min per hour of footage | detection on "
+              f"{detected / r['frames'] * 100:.1f}% of frames | {r['gate'] or ''}")
+
+    off, on = results['gate off'], results['gate on']
+    saving = 1.0 - on['cpu'] / off['cpu'] if off['cpu'] else 0.0
+    same = off['alerts'] == on['alerts']
+    print(f"\nCPU saving: {saving * 100:.1f}%")
+    print(f"alerts (threshold s, at footage s) off: {off['alerts']}")
+    print(f"                                    on: {on['alerts']}")
+    print(f"[MOTION GATE BENCH] alert timing identical: {same}")
@@ -0,0 +1,103 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+
+# Child process: a DB behind a firewall (connect stalls, then fails) and a
+# non-routable webhook host, configured through FALL_* environment overrides.
+# pyodbc is replaced by a stand-in so no ODBC driver is needed.
+CHILD = """
+import sys, time, types
+sys.path.insert(0, {src!r})
+pyodbc = types.ModuleType('pyodbc')
+pyodbc.drivers = lambda: ['ODBC Driver 18 for SQL Server']
+def connect(*args, **kwargs):
+    time.sleep({delay})
+    raise RuntimeError('Login timeout expired')
+pyodbc.connect = connect
+sys.modules['pyodbc'] = pyodbc
+import cylinder_fall_detection
+cylinder_fall_detection.main(source='synthetic:{frames}', headless=True, telemetry_dir=None,
+                             instrument=False, db_check={mode!r})
+"""
+
+HEAVY = ('requests', 'psutil', 'pyodbc')
+
+
+def import_cost(module):
+    """Cold import time (seconds) of one module, from -X importtime in a fresh interpreter."""
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                         cwd=SRC, capture_output=True, text=True)
+    for line in reversed(out.stderr.splitlines()):
+        m = re.match(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s*(\S+)$", line)
+        if m and m.group(2) == module:
+            return int(m.group(1)) / 1e6
+    return float('nan')
+
+
+def loaded_by_import(module):
+    """Which of HEAVY a fresh `import module` pulls in."""
+    code = f"import sys, {module}; print('LOADED=' + ','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, '-c', code], cwd=SRC, capture_output=True, text=True)
+    for line in out.stdout.splitlines():
+        if line.startswith('LOADED='):
+            return line[len('LOADED='):]
+    return "?"
+
+
+def time_to_first_frame(mode, delay, frames=60):
+    """
+    Launches the monitor in a fresh interpreter and returns (seconds from
+    launch to the first processed frame, seconds to exit, the monitor's own
+    report). None if no frame was processed.
+    """
+    env = dict(os.environ,
+               FALL_SQL_OCBC="Driver={ODBC Driver 18 for SQL Server};Server=tcp:10.255.255.1,1433;"
+                             "Database=falls;Pwd={your_password_here};",
+               FALL_SQL_PW="x",
+               FALL_LOGIC_APP_URL="https://10.255.255.1/workflows/fall")
+    code = CHILD.format(src=SRC, delay=delay, frames=frames, mode=mode)
+    with tempfile.TemporaryDirectory() as scratch:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, '-c', code], cwd=scratch, env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        first, reported = None, None
+        for line in proc.stdout:
+            m = re.search(r"First frame processed ([\d.]+)s", line)
+            if m and first is None:
+                first = time.perf_counter() - start
+                reported = float(m.group(1))
+        proc.wait()
+        total = time.perf_counter() - start
+    return first, total, reported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time to first frame with an unreachable DB / webhook")
+    parser.add_argument('--delay', type=float, default=5.0,
+                        help="Seconds the stand-in DB connect stalls before failing (login timeout)")
+    parser.add_argument('--frames', type=int, default=60, help="Frames the monitor runs before exiting")
+    parser.add_argument('--runs', type=int, default=3, help="Launches per mode (median reported)")
+    args = parser.parse_args()
+
+    print(f"{'module':<26}{'cold import':>12}")
+    for module in ('cylinder_fall_detection',) + HEAVY:
+        print(f"{module:<26}{import_cost(module) * 1000:>10.0f}ms")
+    print(f"heavy modules loaded by importing cylinder_fall_detection: "
+          f"{loaded_by_import('cylinder_fall_detection') or 'none'}")
+
+    print(f"\n{'db check':<12}{'first frame':>12}{'(in main)':>11}{'exit':>9}   "
+          f"(DB connect stalls {args.delay:.0f}s, webhook host non-routable)")
+    for mode in ('sync', 'background'):
+        runs = sorted((time_to_first_frame(mode, args.delay, args.frames) for _ in range(args.runs)),
+                      key=lambda r: float('inf') if r[0] is None else r[0])
+        first, total, reported = runs[len(runs) // 2]
+        if first is None:
+            print(f"{mode:<12}{'no frame':>12}")
+            continue
+        print(f"{mode:<12}{first:>11.2f}s{reported:>10.2f}s{total:>8.2f}s")
@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import multiprocessing as mp
+import socket
+import time
+
+import numpy as np
+
+from benchmark import NullDBLogger
+from cylinder_fall_detection import CylinderMonitor
+from frame_sources import open_source
+from stage_timer import StageTimer
+from status_stream import StatusServer
+
+HOST = '127.0.0.1'
+LAG_CLIENTS = 20  # subscribers that decode every message to measure capture-to-client lag
+
+
+class PacedSource:
+    """Replays a source at `fps` in real time with wall-clock capture times, like a live camera."""
+
+    def __init__(self, source, fps=30.0):
+        self.source = source
+        self.fps = fps
+        self._t0 = None
+        self._index = 0
+
+    def open(self):
+        if not self.source.open():
+            return False
+        self.width, self.height = self.source.width, self.source.height
+        self._t0 = time.perf_counter()
+        return True
+
+    def read(self):
+        delay = self._t0 + self._index / self.fps - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self._index += 1
+        ok, frame, _ = self.source.read()
+        return ok, frame, time.time()
+
+
+async def _client(port, path, deadline, decode, result, key='messages'):
+    for _ in range(200):
+        try:
+            reader, writer = await asyncio.open_connection(HOST, port)
+            break
+        except OSError:
+            await asyncio.sleep(0.05)
+    else:
+        result['failed'] += 1
+        return
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {HOST}\r\n\r\n".encode('ascii'))
+    result['connected'] += 1
+    messages = 0
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        while time.time() < deadline:
+            line = await asyncio.wait_for(reader.readline(), max(0.1, deadline - time.time()))
+            if not line:
+                break  # server closed
+            if path == '/preview':
+                messages += line.startswith(b"--frame")
+            elif line.startswith(b"data: "):
+                messages += 1
+                if decode:
+                    sent = float(line.split(b'"ts": ', 1)[1].split(b',', 1)[0])
+                    result['lags'].append(time.time() - sent)
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+    result[key].append(messages)
+
+
+def _stalled(port, path, sockets):
+    """A client that subscribes and then never reads (tiny receive buffer)."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.connect((HOST, port))
+    sock.sendall(f"GET {path} HTTP/1.1\r\nHost: {HOST}\r\n\r\n".encode('ascii'))
+    sockets.append(sock)
+
+
+def subscribe(port, subscribers, stalled, seconds, preview, connected, results):
+    """Subscriber process: opens all clients, then reads for `seconds` and reports."""
+    result = {'connected': 0, 'failed': 0, 'messages': [], 'lags': [], 'previews': []}
+    sockets = []
+    stall_path = '/preview' if preview else '/status'
+    for _ in range(stalled):
+        _stalled(port, stall_path, sockets)
+
+    async def run():
+        deadline = time.time() + seconds + 5.0  # until the main process stops the server
+        clients = [_client(port, '/status', deadline, i < LAG_CLIENTS, result) for i in range(subscribers)]
+        if preview:
+            clients.append(_client(port, '/preview', deadline, False, result, key='previews'))
+        tasks = [asyncio.create_task(c) for c in clients]
+        while result['connected'] + result['failed'] < len(clients):
+            await asyncio.sleep(0.05)
+        connected.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    for sock in sockets:
+        sock.close()
+    results.put(result)
+
+
+def run_trial(subscribers, seconds, fps=30.0, rate=10.0, preview_fps=0.0, stalled=0, stall_timeout=5.0):
+    """
+    Paced synthetic replay through CylinderMonitor.process() with `subscribers`
+    SSE clients (None = no status server) in another process. Returns the
+    per-frame process() latency plus server and client statistics.
+    """
+    source = PacedSource(open_source(f"synthetic:{int(seconds * fps) + 1}"), fps)
+    source.open()
+    server = None
+    if subscribers is not None:
+        server = StatusServer(port=0, rate=rate, preview_fps=preview_fps, stall_timeout=stall_timeout).start()
+        ctx = mp.get_context('spawn')
+        connected, results = ctx.Event(), ctx.Queue()
+        proc = ctx.Process(target=subscribe, args=(server.port, subscribers, stalled, seconds, preview_fps > 0,
+                                                   connected, results))
+        proc.start()
+        connected.wait(60.0)
+
+    timer = StageTimer()
+    monitor = CylinderMonitor(source.width, source.height, NullDBLogger(), timer=timer,
+                              alert_sink=lambda *args: None, status=server)
+    latencies = []
+    while True:
+        ok, frame, ts = source.read()
+        if not ok:
+            break
+        start = time.perf_counter()
+        monitor.process(frame, ts)
+        latencies.append(time.perf_counter() - start)
+        timer.end_frame()
+
+    result = {'frames': len(latencies), 'process_ms': np.percentile(np.array(latencies) * 1000.0, [50, 99, 100])}
+    publish = timer.summary().get('statusPublish')
+    result['publish_us'] = (publish['p50_ms'] * 1000.0, publish['p99_ms'] * 1000.0) if publish else (0.0, 0.0)
+    if server is not None:
+        server.close()
+        clients = results.get(timeout=60.0)
+        proc.join()
+        result['server'] = dict(server.stats)
+        result['clients'] = clients
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live status stream load test: detection latency vs subscribers")
+    parser.add_argument('--subscribers', default="0,100,300,500", help="Comma-separated SSE client counts")
+    parser.add_argument('--seconds', type=float, default=20.0, help="Replay length per trial")
+    parser.add_argument('--rate', type=float, default=10.0, help="Status updates per second")
+    parser.add_argument('--preview-fps', type=float, default=2.0, help="JPEG preview rate (0 = off)")
+    parser.add_argument('--stalled', type=int, default=20, help="Clients per trial that never read")
+    args = parser.parse_args()
+
+    trials = [('off', None)] + [(n, int(n)) for n in args.subscribers.split(',')]
+    rows = []
+    for label, n in trials:
+        print(f"[STATUS] Trial: {label} subscriber(s)...", flush=True)
+        rows.append((label, run_trial(n, args.seconds, rate=args.rate, preview_fps=args.preview_fps,
+                                      stalled=args.stalled if n else 0)))
+
+    print(f"\n{'subs':>5}{'conn':>6}{'proc p50':>10}{'p99':>8}{'max':>8}{'publish p50':>13}{'p99':>8}"
+          f"{'msg/s':>7}{'lag p50':>9}{'p99':>8}{'skipped':>9}{'dropped':>9}{'jpeg':>6}")
+    for label, r in rows:
+        p50, p99, worst = r['process_ms']
+        line = f"{label:>5}"
+        if 'clients' in r:
+            c, s = r['clients'], r['server']
+            rate = np.mean(c['messages']) / args.seconds if c['messages'] else 0.0
+            lag = np.percentile(np.array(c['lags']) * 1000.0, [50, 99]) if c['lags'] else (0.0, 0.0)
+            line += f"{c['connected']:>6}{p50:>8.2f}ms{p99:>6.2f}ms{worst:>6.1f}ms"
+            line += f"{r['publish_us'][0]:>11.1f}us{r['publish_us'][1]:>6.1f}us"
+            line += f"{rate:>7.1f}{lag[0]:>7.1f}ms{lag[1]:>6.1f}ms{s['skipped']:>9}{s['dropped']:>9}"
+            line += f"{sum(c['previews']):>6}"
+        else:
+            line += f"{'-':>6}{p50:>8.2f}ms{p99:>6.2f}ms{worst:>6.1f}ms"
+        print(line)
@@ -0,0 +1,162 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from cylinder_fall_detection import FALL_THRESHOLD, CylinderMonitor
+from frame_sources import FrameSource, SyntheticSource
+
+
+class DropoutSource(FrameSource):
+    """
+    Wraps a source and blurs random bursts of frames hard enough that no
+    marker is detected (motion blur, a hand in front of the strip).
+    A burst starts with probability `rate` per frame and lasts
+    burst_min..burst_max seconds; the rng is seeded so runs compare.
+    """
+
+    def __init__(self, source, rate=0.02, burst_min=0.1, burst_max=0.6, kernel=31, seed=1):
+        self.source = source
+        self.rate = rate
+        self.burst_min = burst_min
+        self.burst_max = burst_max
+        self.kernel = (kernel, kernel)
+        self._rng = np.random.default_rng(seed)
+        self._until = None
+        self.dropped = 0
+
+    def open(self):
+        ok = self.source.open()
+        self.width, self.height = self.source.width, self.source.height
+        self.fps = getattr(self.source, 'fps', 30.0)
+        return ok
+
+    def read(self):
+        ret, frame, ts = self.source.read()
+        if not ret:
+            return ret, frame, ts
+        if self._until is None and self._rng.random() < self.rate:
+            self._until = ts + self._rng.uniform(self.burst_min, self.burst_max)
+        if self._until is not None:
+            if ts < self._until:
+                frame = cv2.blur(frame, self.kernel)
+                self.dropped += 1
+            else:
+                self._until = None
+        return True, frame, ts
+
+    def release(self):
+        self.source.release()
+
+
+def truth_episodes(synthetic, frames, threshold):
+    """[(start, end)] footage seconds where the ground-truth tilt is above threshold."""
+    episodes, start = [], None
+    for i in range(frames):
+        t = i / synthetic.fps
+        above = synthetic.tilt_at(t) > threshold
+        if above and start is None:
+            start = t
+        elif not above and start is not None:
+            episodes.append((start, t))
+            start = None
+    if start is not None:
+        episodes.append((start, frames / synthetic.fps))
+    return episodes
+
+
+def replay(args, tilt_filter, detect_every):
+    """
+    Replays the dropout clip through one CylinderMonitor and scores the alert
+    path against the ground-truth tilt.
+    """
+    synthetic = SyntheticSource(num_frames=int(args.seconds * 30), fps=30.0,
+                                idle_s=args.idle, hold_s=args.down)
+    source = DropoutSource(synthetic, rate=args.dropout_rate, burst_max=args.burst, seed=args.seed)
+    alerts = []
+    now = {'t': 0.0}
+
+    def alert_sink(camera_id, threshold, angle, experiment_id, event_key, clip_path=None):
+        alerts.append((threshold, now['t']))
+
+    if not source.open():
+        raise RuntimeError("source did not open")
+    monitor = CylinderMonitor(source.width, source.height, None, "Bench_Cam", alert_sink=alert_sink,
+                              tilt_filter=tilt_filter, detect_every=detect_every)
+    cpu = 0.0
+    frames = 0
+    t0 = None
+    falling = []   # (footage t, fall_detected) per frame
+    predicted = 0
+    while True:
+        ret, frame, ts = source.read()
+        if not ret:
+            break
+        t0 = ts if t0 is None else t0
+        now['t'] = ts - t0
+        c = time.process_time()
+        result = monitor.process(frame, ts)
+        cpu += time.process_time() - c
+        frames += 1
+        falling.append((now['t'], result['fall_detected']))
+        predicted += result['fall_detected'] and result['confidence'] < 1.0
+    source.release()
+
+    # A fall timer reset inside a ground-truth fall (after it was first raised)
+    # restarts the alert stages: that is the instability being measured
+    first_stage = monitor.falls.stages[0]
+    episodes = truth_episodes(synthetic, frames, FALL_THRESHOLD + args.margin)
+    resets = 0
+    latencies = []
+    missed = 0
+    for start, end in episodes:
+        inside = [f for t, f in falling if start <= t < end]
+        raised = False
+        for f in inside:
+            if raised and not f:
+                resets += 1
+            raised = raised or f
+        first = [t for th, t in alerts if th == first_stage and start <= t <= end + first_stage]
+        if first:
+            latencies.append(first[0] - (start + first_stage))
+        else:
+            missed += 1
+    return {
+        'frames': frames,
+        'cpu_ms': cpu / frames * 1000.0 if frames else 0.0,
+        'dropped': source.dropped,
+        'episodes': len(episodes),
+        'first_alerts': sum(1 for th, _ in alerts if th == first_stage),
+        'resets': resets,
+        'missed': missed,
+        'latency': float(np.mean(latencies)) if latencies else float('nan'),
+        'predicted': predicted,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Alert stability vs detection rate, with and without the tilt filter")
+    parser.add_argument('--seconds', type=float, default=120.0, help="Length of the synthetic clip")
+    parser.add_argument('--idle', type=float, default=5.0, help="Upright seconds before each synthetic fall")
+    parser.add_argument('--down', type=float, default=8.0, help="Seconds the synthetic cylinder stays down")
+    parser.add_argument('--dropout-rate', type=float, default=0.02, help="Chance per frame that a blur burst starts")
+    parser.add_argument('--burst', type=float, default=0.6, help="Longest blur burst (seconds)")
+    parser.add_argument('--hold', type=float, default=1.0, help="Tilt filter hold-over window (seconds)")
+    parser.add_argument('--margin', type=float, default=5.0,
+                        help="Score only ground truth this many degrees past the fall threshold")
+    parser.add_argument('--every', default="1,2,3,5,10", help="Detection intervals to sweep (frames)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'detect':<8}{'filter':<8}{'CPU/frame':>10}{'episodes':>10}{'1st alerts':>11}"
+          f"{'resets':>8}{'missed':>8}{'latency':>9}{'predicted':>11}")
+    for every in [int(n) for n in args.every.split(',')]:
+        for label, tilt_filter in (('off', None), ('on', {'hold_s': args.hold})):
+            r = replay(args, tilt_filter, every)
+            print(f"{'1/' + str(every):<8}{label:<8}{r['cpu_ms']:>8.2f}ms{r['episodes']:>10}"
+                  f"{r['first_alerts']:>11}{r['resets']:>8}{r['missed']:>8}{r['latency']:>8.2f}s"
+                  f"{r['predicted']:>11}")
+    print(f"\n[TILT FILTER BENCH] {r['dropped']} of {r['frames']} frames blurred "
+          f"(resets / extra first alerts = fall timers restarted during a real fall)")
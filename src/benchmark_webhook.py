@@ -0,0 +1,139 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from webhook_dispatcher import WebhookDispatcher
+
+
+class StandInServer:
+    """
+    Local HTTP/1.1 keep-alive stand-in for the Logic App endpoint.
+    fail_first: number of requests answered with 503 before succeeding.
+    delay: seconds to sleep per request (a slow workflow).
+    """
+
+    def __init__(self, fail_first=0, delay=0.0):
+        self.fail_first = fail_first
+        self.delay = delay
+        self.requests = 0
+        self.received = []        # (idempotency key, payload) of accepted requests
+        self.connections = set()  # client (host, port) pairs = TCP connections used
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # header + body writes would otherwise wait on delayed ACK
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with server._lock:
+                    server.requests += 1
+                    server.connections.add(self.client_address)
+                    failing = server.requests <= server.fail_first
+                if server.delay:
+                    time.sleep(server.delay)
+                status, reply = (503, b"busy") if failing else (200, b"ok")
+                if not failing:
+                    with server._lock:
+                        server.received.append((self.headers.get('Idempotency-Key'), json.loads(body)))
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/workflow"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _payload(i):
+    return {"CameraID": "Bench_Cam", "RiskAngle": i, "Status": "FALL_CONFIRMED"}
+
+
+def bench_thread_per_alert(alerts):
+    """The previous behaviour: one new thread and one new connection per alert."""
+    server = StandInServer()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=lambda i=i: requests.post(server.url, json=_payload(i), timeout=30.0))
+               for i in range(alerts)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    print(f"[thread-per-alert] {alerts / elapsed:8.1f} alerts/s, {len(threads)} threads, "
+          f"{len(server.connections)} TCP connections")
+    server.close()
+
+
+def bench_dispatcher(alerts, workers):
+    server = StandInServer()
+    d = WebhookDispatcher(server.url, workers=workers, queue_size=alerts)
+    start = time.perf_counter()
+    for i in range(alerts):
+        d.send(_payload(i), dedupe_key=f"k{i}")
+    d.close(timeout=60.0)
+    elapsed = time.perf_counter() - start
+    print(f"[dispatcher]       {alerts / elapsed:8.1f} alerts/s, {workers} threads, "
+          f"{len(server.connections)} TCP connections, delivered {len(server.received)}/{alerts}")
+    server.close()
+
+
+def check_retries():
+    server = StandInServer(fail_first=3)
+    d = WebhookDispatcher(server.url, workers=1, backoff_base=0.05)
+    d.send(_payload(1), dedupe_key="retry-1")
+    d.close(timeout=10.0)
+    ok = len(server.received) == 1 and d.stats['retries'] == 3
+    print(f"[retry]            503 x3 then 200: delivered {len(server.received)}, retries {d.stats['retries']} -> {ok}")
+    server.close()
+    return ok
+
+
+def check_dedupe():
+    server = StandInServer()
+    d = WebhookDispatcher(server.url, workers=2)
+    for _ in range(5):
+        d.send(_payload(7), dedupe_key="EXP|Cam|123.000|2.0")
+    d.close(timeout=10.0)
+    ok = len(server.received) == 1 and d.stats['deduped'] == 4
+    print(f"[dedupe]           5 sends, 1 key: delivered {len(server.received)}, deduped {d.stats['deduped']} -> {ok}")
+    server.close()
+    return ok
+
+
+def check_backpressure_and_drain():
+    server = StandInServer(delay=0.05)
+    d = WebhookDispatcher(server.url, workers=2, queue_size=10)
+    accepted = sum(d.send(_payload(i), dedupe_key=f"bp{i}") for i in range(50))
+    d.close(timeout=30.0)
+    ok = len(server.received) == accepted and d.stats['overflow'] == 50 - accepted
+    print(f"[backpressure]     50 burst into queue of 10: accepted {accepted}, overflow {d.stats['overflow']}, "
+          f"high water {d.stats['high_water']}, drained on close {len(server.received)}/{accepted} -> {ok}")
+    server.close()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Webhook dispatcher benchmark against a local HTTP stand-in")
+    parser.add_argument('--alerts', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    bench_thread_per_alert(args.alerts)
+    bench_dispatcher(args.alerts, args.workers)
+    results = [check_retries(), check_dedupe(), check_backpressure_and_drain()]
+    print(f"\n[WEBHOOK BENCH] {'PASS' if all(results) else 'FAIL'}")
@@ -0,0 +1,220 @@
+import datetime
+import math
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from instrumentation import SINK_FAILURES
+
+
+class FrameRing:
+    """
+    The last `capacity` frames in one preallocated array, plus their capture
+    times. Frame number n lives in slot n % capacity; `seq` counts frames
+    written so far. The writer never waits: readers copy a frame out and then
+    check with intact(n) that it was not overwritten meanwhile.
+    """
+
+    def __init__(self, capacity, shape):
+        self.capacity = capacity
+        self.frames = np.empty((capacity,) + tuple(shape), dtype=np.uint8)
+        self.frames.fill(0)  # touch every page now, not on the first pass of the video loop
+        self.ts = np.zeros(capacity, dtype=np.float64)
+        self.seq = 0
+
+    @property
+    def nbytes(self):
+        return self.frames.nbytes + self.ts.nbytes
+
+    def next_slot(self):
+        """Writable view of the slot the next frame goes into."""
+        return self.frames[self.seq % self.capacity]
+
+    def commit(self, ts):
+        self.ts[self.seq % self.capacity] = ts
+        self.seq += 1
+
+    def oldest(self):
+        """Oldest frame number still safe to read (one slot of margin for the writer)."""
+        return max(0, self.seq - self.capacity + 1)
+
+    def intact(self, n):
+        return self.seq < n + self.capacity
+
+    def find(self, ts):
+        """Frame number of the first retained frame captured at or after ts."""
+        for n in range(self.oldest(), self.seq):
+            if self.ts[n % self.capacity] >= ts:
+                return n
+        return self.seq
+
+
+class ClipRecorder:
+    """
+    Keeps the last pre_s + post_s (+ slack_s) seconds of frames in a FrameRing
+    and, on trigger(), writes a clip from pre_s before to post_s after the
+    event to `directory` on a background thread.
+
+    - push() is one copy into a preallocated slot (resize / grayscale are
+      written straight into it), so the video loop never allocates or waits.
+    - grayscale=True and scale < 1 cut the ring's RAM (1/3 and scale^2).
+    - The export thread encodes the pre-event frames at once and then
+      follows the live frames until post_s has passed. Frames overwritten
+      before it got to them (encoder more than slack_s behind) are skipped
+      and counted, never waited for.
+    - trigger() returns the clip's path immediately, so it can go into the
+      DB row and webhook payload; the file is complete about post_s later.
+    - At most max_exports run at once; further triggers are dropped.
+    - The ring holds (pre_s + post_s + slack_s) * fps * headroom frames; pass
+      the source's frame rate as fps. If the frames come faster than that
+      and the ring spans less than pre_s + post_s, a warning is printed once
+      and counted (fall_sink_failures_total{sink="clip",reason="short_ring"}).
+    """
+
+    def __init__(self, directory='clips', pre_s=8.0, post_s=4.0, fps=30.0, grayscale=False, scale=0.5,
+                 slack_s=2.0, codec='mp4v', max_exports=2, headroom=1.25):
+        self.directory = directory
+        self.pre_s = pre_s
+        self.post_s = post_s
+        self.fps = fps
+        self.grayscale = grayscale
+        self.scale = scale
+        self.slack_s = slack_s
+        self.fourcc = cv2.VideoWriter_fourcc(*codec)
+        self.max_exports = max_exports
+        self.headroom = headroom
+        self.ring = None
+        self.stats = {'clips': 0, 'frames': 0, 'overrun': 0, 'busy': 0}
+        self._short = False   # ring found to span less than pre_s + post_s
+        self._size = None     # (w, h) when downscaling
+        self._small = None    # color scratch for downscale + grayscale
+        self._exports = []
+        self._lock = threading.Lock()
+        self._closing = threading.Event()
+
+    def _allocate(self, frame):
+        h, w = frame.shape[:2]
+        if self.scale != 1.0:
+            self._size = (max(1, round(w * self.scale)), max(1, round(h * self.scale)))
+            w, h = self._size
+            if self.grayscale:
+                self._small = np.empty((h, w, 3), dtype=np.uint8)
+        shape = (h, w) if self.grayscale else (h, w, 3)
+        capacity = math.ceil((self.pre_s + self.post_s + self.slack_s) * self.fps * self.headroom)
+        self.ring = FrameRing(capacity, shape)
+        print(f"[CLIP] Frame ring: {capacity} x {w}x{h}{' gray' if self.grayscale else ''} "
+              f"= {self.ring.nbytes / (1024 * 1024):.0f}MB")
+
+    def push(self, frame, ts):
+        """Copies one BGR frame into the ring (hot path)."""
+        if self.ring is None:
+            self._allocate(frame)
+        slot = self.ring.next_slot()
+        if self._size is not None:
+            if self.grayscale:
+                cv2.resize(frame, self._size, dst=self._small, interpolation=cv2.INTER_AREA)
+                cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=slot)
+            else:
+                cv2.resize(frame, self._size, dst=slot, interpolation=cv2.INTER_AREA)
+        elif self.grayscale:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=slot)
+        else:
+            np.copyto(slot, frame)
+        self.ring.commit(ts)
+        if self.ring.seq % self.ring.capacity == 0 and not self._short:
+            self._check_span()
+
+    def _check_span(self):
+        """Once per pass over the ring: does it still cover a whole clip at the actual frame rate?"""
+        ring = self.ring
+        span = ring.ts[(ring.seq - 1) % ring.capacity] - ring.ts[ring.seq % ring.capacity]
+        if 0 < span < self.pre_s + self.post_s:
+            self._short = True
+            SINK_FAILURES.labels('clip', 'short_ring').inc()
+            print(f"[CLIP ERROR] Frame ring holds only {span:.1f}s at {(ring.capacity - 1) / span:.0f} FPS "
+                  f"(sized for {self.fps:g} FPS); clips will start less than {self.pre_s:g}s before the alert.")
+
+    def trigger(self, event_ts, camera_id, threshold):
+        """Starts exporting the clip around event_ts; returns its path, or None if not recorded."""
+        if self.ring is None or self._closing.is_set():
+            return None
+        with self._lock:
+            self._exports = [t for t in self._exports if t.is_alive()]
+            if len(self._exports) >= self.max_exports:
+                self.stats['busy'] += 1
+                SINK_FAILURES.labels('clip', 'busy').inc()
+                print(f"[CLIP ERROR] {len(self._exports)} exports running, clip skipped.")
+                return None
+            stamp = datetime.datetime.fromtimestamp(event_ts).strftime('%Y%m%d_%H%M%S')
+            name = f"{camera_id.replace(':', '_')}_{stamp}_{threshold:g}s.mp4"
+            path = os.path.abspath(os.path.join(self.directory, name))
+            export = threading.Thread(target=self._export, name="clip-export", daemon=True,
+                                      args=(path, event_ts - self.pre_s, event_ts + self.post_s))
+            self._exports.append(export)
+        export.start()
+        return path
+
+    def close(self, timeout=None):
+        """Finishes running exports with the frames already buffered."""
+        self._closing.set()
+        with self._lock:
+            exports, self._exports = self._exports, []
+        for export in exports:
+            export.join(timeout)
+
+    def _export(self, path, start_ts, end_ts):
+        ring = self.ring
+        os.makedirs(self.directory, exist_ok=True)
+        buf = np.empty(ring.frames.shape[1:], dtype=np.uint8)
+        writer = None
+        written = overrun = 0
+        n = ring.find(start_ts)
+        try:
+            while True:
+                if n >= ring.seq:
+                    if self._closing.is_set():
+                        break
+                    time.sleep(0.5 / self.fps)
+                    continue
+                if n < ring.oldest():
+                    overrun += ring.oldest() - n
+                    n = ring.oldest()
+                    continue
+                ts = ring.ts[n % ring.capacity]
+                np.copyto(buf, ring.frames[n % ring.capacity])
+                if not ring.intact(n):
+                    continue  # overwritten while copying; re-checked against oldest()
+                if ts > end_ts:
+                    break
+                if writer is None:
+                    h, w = buf.shape[:2]
+                    writer = cv2.VideoWriter(path, self.fourcc, self._clip_fps(n), (w, h),
+                                             not self.grayscale)
+                writer.write(buf)
+                written += 1
+                n += 1
+        except Exception as e:
+            SINK_FAILURES.labels('clip', 'write').inc()
+            print(f"[CLIP ERROR] {path}: {e}")
+        finally:
+            if writer is not None:
+                writer.release()
+        with self._lock:
+            self.stats['clips'] += 1
+            self.stats['frames'] += written
+            self.stats['overrun'] += overrun
+        if overrun:
+            SINK_FAILURES.labels('clip', 'overrun').inc()
+        print(f"[CLIP] Saved {path} ({written} frames{f', {overrun} overwritten' if overrun else ''})")
+
+    def _clip_fps(self, n):
+        """Frame rate of the buffered frames from n on (capture times), else the nominal fps."""
+        ring = self.ring
+        last = ring.seq - 1
+        if last - n < 2:
+            return self.fps
+        span = ring.ts[last % ring.capacity] - ring.ts[n % ring.capacity]
+        return (last - n) / span if span > 0 else self.fps
@@ -0,0 +1,65 @@
+import os
+import threading
+
+# Where sql.env is looked for, in order (relative to the working directory)
+SEARCH_DIRS = ('', '..', 'c:\\workspace\\marker_dev')
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def find_env_file(env_path='sql.env'):
+    """First existing candidate path for env_path, or None."""
+    for d in SEARCH_DIRS:
+        p = os.path.join(d, env_path) if d else env_path
+        if os.path.exists(p):
+            return p
+    return None
+
+
+def parse_env_file(path):
+    """key=value lines (values optionally quoted) -> dict; the first occurrence of a key wins."""
+    values = {}
+    with open(path, 'r') as f:
+        for line in f:
+            if '=' not in line:
+                continue
+            k, v = line.split('=', 1)
+            values.setdefault(k.strip(), v.strip().strip('"').strip("'"))
+    return values
+
+
+def load_config(env_path='sql.env'):
+    """
+    Contents of env_path, read and parsed once per process and cached.
+    Environment variables override file values: a key is looked up as
+    FALL_<KEY> (e.g. FALL_SQL_PW, FALL_LOGIC_APP_URL) at get_config() time.
+    """
+    config = _cache.get(env_path)
+    if config is None:
+        with _lock:
+            config = _cache.get(env_path)
+            if config is None:
+                config = {}
+                path = find_env_file(env_path)
+                if path:
+                    try:
+                        config = parse_env_file(path)
+                    except Exception as e:
+                        print(f"[Config] Warning: Could not read {path}: {e}")
+                _cache[env_path] = config
+    return config
+
+
+def get_config(key, env_path='sql.env', default=None):
+    """Value of key: environment override first, then the cached env file, then default."""
+    value = os.environ.get(f"FALL_{key.upper()}")
+    if value is not None:
+        return value
+    return load_config(env_path).get(key, default)
+
+
+def reload_config():
+    """Drops the cache, so the next lookup re-reads the env file (e.g. after editing it)."""
+    with _lock:
+        _cache.clear()
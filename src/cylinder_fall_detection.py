@@ -1,18 +1,31 @@
 import cv2
 import cv2.aruco as aruco
 import numpy as np
-import psutil
-import os
 import time
 import datetime
-import requests
 import json
 import threading
-from collections import deque
-from db_logger import AzureDBLogger
+from config import get_config
+from event_store import LocalEventStore
+from frame_sources import CameraSource, open_source
+from clip_recorder import ClipRecorder
+from cylinder_pose import CylinderPoseEstimator
+from detector_params import detector_parameters
+from fall_tracker import FallTracker
+from marker_tracker import MarkerTracker
+from motion_gate import MotionGate
+from stage_timer import NullTimer, StageTimer
+from telemetry import TelemetryWriter
+from process_metrics import MetricsSampler
+from status_stream import StatusServer
+from instrumentation import (ALERTS, FRAMES, MARKERS, SINK_FAILURES, SINK_SECONDS, STAGE_SECONDS,
+                             STARTUP_SECONDS, MetricsServer)
+from webhook_dispatcher import WebhookDispatcher
 
-# Fetch Logic App URL from secure env file
-LOGIC_APP_URL = AzureDBLogger.get_config('logic_app_url', 'sql.env')
+# Fetch Logic App URL from secure env file (parsed once; FALL_LOGIC_APP_URL overrides)
+LOGIC_APP_URL = get_config('logic_app_url', 'sql.env')
+# Local SQLite copy of every alert (see event_store.py)
+LOCAL_STORE_PATH = get_config('local_store', 'sql.env', 'fall_events.db')
 if not LOGIC_APP_URL:
     print("[WARNING] 'logic_app_url' not found in sql.env. Webhook will likely fail.")
 
@@ -47,61 +60,230 @@ def calculate_angle(rvec):
         print(f"[ERROR] Logic error in angle calculation: {e}")
         return 0.0
 
-def main():
-    # --- Configuration ---
-    MARKER_SIZE = 0.015  # 1.5cm 
-    FALL_THRESHOLD = 45 # Degrees to consider as "Fallen"
-    LOG_COOLDOWN = 2.0 # Seconds between DB logs
-    CAMERA_ID = "Cylinder_Cam_01"
-    
-    # [NEW] Generate or Input Experiment ID at startup
-    # This groups all logs from this specific run
-    current_experiment_id = f"EXP_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}"
-    print(f"[INFO] Current Experiment ID: {current_experiment_id}")
+def calculate_angles(rvecs):
+    """
+    Vectorized calculate_angle for an (N,1,3) / (N,3) array of rotation vectors.
+    Only R[1,1] of each rotation matrix is needed (marker Y-axis dotted with
+    camera up = -R[1,1]), which Rodrigues' formula gives in closed form:
+    R[1,1] = cos(theta) + ky^2 * (1 - cos(theta)).
+    Returns an (N,) array of angles in degrees.
+    """
+    r = np.asarray(rvecs, dtype=np.float64).reshape(-1, 3)
+    theta = np.sqrt(np.einsum('ij,ij->i', r, r))
+    ky = np.divide(r[:, 1], theta, out=np.zeros_like(theta), where=theta > 1e-12)
+    c = np.cos(theta)
+    r11 = c + ky * ky * (1.0 - c)
+    return np.degrees(np.arccos(np.clip(-r11, -1.0, 1.0)))
 
-    # --- Database Setup ---
-    print("[INFO] Connecting to Database...")
-    db = AzureDBLogger()
-    last_log_time = 0
-    
-    # --- Stabilization ---
-    angle_buffer = deque(maxlen=5) # Averaging over 5 frames
+# --- Configuration ---
+MARKER_SIZE = 0.015  # 1.5cm 
+FALL_THRESHOLD = 45 # Degrees to consider as "Fallen"
+LOG_COOLDOWN = 2.0 # Seconds between DB logs
+CAMERA_ID = "Cylinder_Cam_01"
+STARTUP_BUDGET = 2.0 # Seconds from start to the first processed frame
+
+# REQUIREMENT: Notify at 2s, 1m(60s), 10m(600s), 1h(3600s)
+NOTIFICATION_THRESHOLDS = [2.0, 60.0, 600.0, 3600.0]
+
+_webhook = None
+_webhook_lock = threading.Lock()
+_event_store = None
+_event_store_lock = threading.Lock()
+
+
+def get_event_store():
+    """Process-wide local event store (created on first alert)."""
+    global _event_store
+    with _event_store_lock:
+        if _event_store is None:
+            _event_store = LocalEventStore(LOCAL_STORE_PATH)
+        return _event_store
+
+
+def close_event_store():
+    """Writes queued local events before exit."""
+    global _event_store
+    with _event_store_lock:
+        store, _event_store = _event_store, None
+    if store is not None:
+        store.close()
+
+
+def get_webhook_dispatcher():
+    """Process-wide Logic App dispatcher (created on first alert), or None without logic_app_url."""
+    global _webhook
+    if not LOGIC_APP_URL:
+        return None
+    with _webhook_lock:
+        if _webhook is None:
+            # Increased timeout to 30s as Logic App workflow might be slow for real events
+            _webhook = WebhookDispatcher(LOGIC_APP_URL, timeout=30.0)
+        return _webhook
+
+
+def check_webhook_ready():
+    """
+    Creates the dispatcher (imports requests, sets up the session) and checks
+    that the endpoint accepts connections, so the first alert pays neither.
+    Meant for a background thread at startup.
+    """
+    dispatcher = get_webhook_dispatcher()
+    if dispatcher is not None and dispatcher.check_reachable():
+        print("[WEBHOOK] Endpoint reachable.")
+
+
+def close_webhook_dispatcher(timeout=10.0):
+    """Delivers queued webhooks before exit."""
+    global _webhook
+    with _webhook_lock:
+        dispatcher, _webhook = _webhook, None
+    if dispatcher is not None:
+        dispatcher.close(timeout)
+
+
+def dispatch_alert(db, camera_id, threshold, log_angle, experiment_id=None, event_key=None, clip_path=None,
+                   store=None):
+    """
+    Fan-out for one fall alert stage: local event store, DB row and Logic App webhook.
+    store replaces the process-wide LocalEventStore (get_event_store()), e.g.
+    so replays and benchmarks stay out of the real event history.
+    event_key identifies this fall stage so a repeated alert is not re-sent.
+    clip_path (pre/post-event video, see clip_recorder.py) goes into the DB
+    row and the webhook payload ("ClipPath").
+    Each sink hand-off is timed into fall_sink_seconds{sink=...}.
+    """
+    final_angle_int = int(round(log_angle))
+    msg = f"[INFO] Fall Alert (Stage: {threshold}s). Logging to DB. Angle: {final_angle_int}deg"
+    print(msg)
+    ALERTS.labels(f"{threshold:g}").inc()
     
-    # --- Camera Setup ---
-    cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-    if not cap.isOpened():
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            print("[ERROR] Could not open webcam.")
-            return
-
-    # Set resolution
-    width, height = 640, 480
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    # --- Local Event Store (queued, written in batches off the video thread) ---
+    with SINK_SECONDS.time('local_log'):
+        store = store if store is not None else get_event_store()
+        store.log_event(camera_id, final_angle_int, "FALL_CONFIRMED", experiment_id,
+                        stage=threshold, clip_path=clip_path)
+        
+    # --- DB Logging ---
+    with SINK_SECONDS.time('db'):
+        db.log_event(camera_id, final_angle_int, "FALL_CONFIRMED", experiment_id, clip_path=clip_path)
     
-    # --- Approximate Calibration ---
-    focal_length = width 
-    center = (width/2, height/2)
-    camera_matrix = np.array(
-        [[focal_length, 0, center[0]],
-         [0, focal_length, center[1]],
-         [0, 0, 1]], dtype="double"
-    )
-    dist_coeffs = np.zeros((4,1)) 
+    # --- Logic App Webhook (Async) ---
+    payload = {
+        "Timestamp": datetime.datetime.utcnow().isoformat()[:-3] + 'Z',
+        "CameraID": camera_id,
+        "RiskAngle": final_angle_int,  # Rounded integer
+        "Status": "FALL_CONFIRMED",
+        "ExperimentID": experiment_id
+    }
+    if clip_path is not None:
+        payload["ClipPath"] = clip_path
     
-    # --- ArUco Setup ---
-    aruco_dict = aruco.getPredefinedDictionary(aruco.DICT_4X4_100)
-    parameters = aruco.DetectorParameters()
+    # Queued to the dispatcher's worker pool to avoid blocking the video feed
+    webhook = get_webhook_dispatcher()
+    if webhook is None:
+        SINK_FAILURES.labels('webhook', 'not_configured').inc()
+        print("[WEBHOOK ERROR] logic_app_url is not configured, alert not sent.")
+    else:
+        with SINK_SECONDS.time('webhook'):
+            webhook.send(payload, dedupe_key=event_key)
 
-    print(f"[INFO] Cylinder Monitor started. Target: Any marker in strip OR Bottom (ID 99). Press 'q' to quit.")
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-            
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+class CylinderMonitor:
+    """
+    Detection and fall logic for one camera, split from the display so it can
+    run on its own thread (see pipeline.py).
+    process() turns a captured frame into a result dict; draw() renders it.
+    Fall durations are measured on the capture timestamp of each frame, so
+    queueing or a slow stage never stretches or shrinks the alert timers.
+    alert_sink(camera_id, threshold, angle, experiment_id, event_key) replaces the
+    default dispatch_alert() fan-out, e.g. to forward alerts to a supervisor.
+    tracking enables ROI tracking (True, or a dict of MarkerTracker options).
+    cylinder_diameter (meters) enables the fused whole-cylinder pose from all
+    visible strip markers (see cylinder_pose.py).
+    cylinders lists the cylinders watched by this camera and their marker ID
+    ranges (see fall_tracker.FallTracker); by default one cylinder with strip
+    IDs 0..98 and bottom marker 99. With several cylinders, alerts are logged
+    as "<camera_id>:<cylinder name>".
+    telemetry (a telemetry.TelemetryWriter) receives one debug record per
+    frame with the timer's stage timings; None disables debug logging.
+    metrics (a process_metrics.MetricsSampler) supplies the RAM figure for
+    the overlay and heartbeat.
+    motion_gate (True, or a dict of MotionGate options) skips detection on
+    frames where the scene has not changed and reuses the last result.
+    tilt_filter (True, or a dict of TiltFilter options) filters each
+    cylinder's tilt and predicts it through short marker dropouts.
+    detect_every=N runs detection on every Nth frame only; the frames in
+    between carry no markers and rely on tilt_filter to bridge them. Without
+    a filter the fall timers are only stepped on detection frames, so the
+    gaps neither reset them nor raise alerts.
+    started_at (time.perf_counter()) reports the time to the first processed
+    frame, with a warning past startup_budget seconds.
+    clips (a ClipRecorder) buffers every frame and exports a clip per alert.
+    status (a status_stream.StatusServer) receives each frame's status and
+    the preview frames for the live streaming API.
+    detector_params: ArUco DetectorParameters overrides, as a dict or the
+    path of a JSON file saved by benchmark_detector_params.py (None = defaults).
+    store: local event store for dispatch_alert() (None = the process-wide one).
+    """
+
+    def __init__(self, width, height, db, camera_id=CAMERA_ID, experiment_id=None, timer=None,
+                 alert_sink=None, tracking=None, cylinder_diameter=None, cylinders=None, telemetry=None,
+                 metrics=None, motion_gate=None, tilt_filter=None, detect_every=1, started_at=None,
+                 startup_budget=STARTUP_BUDGET, clips=None, detector_params=None, status=None, store=None):
+        self.width = width
+        self.height = height
+        self.db = db
+        self.store = store
+        self.alert_sink = alert_sink
+        self.camera_id = camera_id
+        self.experiment_id = experiment_id
+        self.timer = timer or NullTimer()
+        self.telemetry = telemetry
+        self.metrics = metrics
+        self.started_at = started_at
+        self.startup_budget = startup_budget
+        self.clips = clips
+        self.status = status
+        self.last_log_time = 0
+        
+        # --- Fall State (per cylinder, 5-reading running average) ---
+        self.falls = FallTracker(cylinders, window=5, threshold=FALL_THRESHOLD,
+                                 stages=NOTIFICATION_THRESHOLDS, tilt_filter=tilt_filter)
+        self.last_debug_print = 0
+        
+        # --- Approximate Calibration ---
+        focal_length = width 
+        center = (width/2, height/2)
+        self.camera_matrix = np.array(
+            [[focal_length, 0, center[0]],
+             [0, focal_length, center[1]],
+             [0, 0, 1]], dtype="double"
+        )
+        self.dist_coeffs = np.zeros((4,1)) 
+        
+        # --- ArUco Setup ---
+        self.aruco_dict = aruco.getPredefinedDictionary(aruco.DICT_4X4_100)
+        self.parameters = detector_parameters(detector_params)
+        self.tracker = None
+        if tracking:
+            options = tracking if isinstance(tracking, dict) else {}
+            self.tracker = MarkerTracker(self.aruco_dict, self.parameters, **options)
+        self.gate = None
+        if motion_gate:
+            options = motion_gate if isinstance(motion_gate, dict) else {}
+            self.gate = MotionGate(**options)
+        self._last = None
+        self.detect_every = max(1, int(detect_every))
+        self._bridged = bool(tilt_filter)
+        self._frame_index = 0
+        self.cylinder_poses = []
+        if cylinder_diameter:
+            self.cylinder_poses = [CylinderPoseEstimator(cylinder_diameter, MARKER_SIZE, obj.first_id,
+                                                         last_id=obj.last_id)
+                                   for obj in self.falls.objects]
+
+    def process(self, frame, frame_ts):
+        timer = self.timer
         
         # Initialize Frame Variables
         fall_detected = False
@@ -109,150 +291,439 @@ def main():
         duration = 0.0
         max_angle = 0
         
-        # Detect Markers
-        corners, ids, rejected = aruco.detectMarkers(gray, aruco_dict, parameters=parameters)
+        if self.clips is not None:
+            with timer.stage('clipBuffer'):
+                self.clips.push(frame, frame_ts)
+
+        # Reduced detection rate: frames in between see no markers
+        scheduled = self._frame_index % self.detect_every == 0
+        self._frame_index += 1
         
-        if ids is not None:
-            rvecs, tvecs, _ = aruco.estimatePoseSingleMarkers(corners, MARKER_SIZE, camera_matrix, dist_coeffs)
-            
-            # Draw all markers first
-            cv2.aruco.drawDetectedMarkers(frame, corners)
+        # Static scene: reuse the last detection, so the fall timers keep
+        # running on capture time exactly as if the same markers were seen
+        run_detection = scheduled
+        if scheduled and self.gate is not None:
+            with timer.stage('motionGate'):
+                run_detection = self.gate.should_detect(frame, frame_ts)
+        if run_detection:
+            self._last = self._detect(frame)
+        if scheduled:
+            corners, ids, rvecs, tvecs, fused, bottoms, readings = self._last
+        else:
+            corners, ids, rvecs, tvecs, fused, bottoms, readings = (), None, None, None, [], [], []
+        
+        falls = self.falls
+        with timer.stage('calculate_angle'):
+            # Check for Bottom Marker (ID 99)
+            for index in bottoms:
+                falls.add_bottom(index)
             
-            for i in range(len(ids)):
-                detected_id = ids[i][0]
-                
-                # Draw Axis (Short length to avoid warnings)
-                cv2.drawFrameAxes(frame, camera_matrix, dist_coeffs, rvecs[i], tvecs[i], 0.01)
-                
-                # Check for Bottom Marker (ID 99)
-                if detected_id == 99:
-                    fall_detected = True
-                    bottom_detected = True
-                    cv2.putText(frame, "BOTTOM DETECTED", (int(corners[i][0][0][0]), int(corners[i][0][0][1])), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,255), 2)
-                    continue 
-                
-                # Check tilt for normal markers
-                angle = calculate_angle(rvecs[i])
-                
-                # --- Stabilization Logic ---
-                angle_buffer.append(angle)
-                avg_angle = sum(angle_buffer) / len(angle_buffer)
-                
+            # --- Stabilization Logic ---
+            for index, angle in readings:
+                avg_angle = falls.add_angle(index, angle)
                 max_angle = max(max_angle, avg_angle)
-                
-                if avg_angle > FALL_THRESHOLD:
-                    fall_detected = True
             
         # --- Fall Duration & Logging Logic ---
-        # --- Fall Duration & Logging Logic ---
-        if fall_detected:
-            if getattr(main, 'fall_start_time', None) is None:
-                main.fall_start_time = time.time()
-                main.notified_stages = set() # Track which alerts were sent
-            
-            duration = time.time() - main.fall_start_time
+        log_t0 = time.perf_counter()
+        # Without a tilt filter an empty in-between frame would reset every fall timer
+        for obj, threshold, log_angle in (falls.step(frame_ts) if scheduled or self._bridged else ()):
+            self._notify(obj, threshold, log_angle)
+            self.last_log_time = time.time()
+
+        # Display the cylinder that has been down the longest
+        falling = falls.falling()
+        angle, confidence = max_angle, 1.0
+        if falling:
+            worst = max(falling, key=lambda o: o.duration)
+            fall_detected = True
+            bottom_detected = worst.bottom
+            duration = worst.duration
+            angle, confidence = worst.angle, worst.confidence
+            name = f"{worst.name}: " if len(falls.objects) > 1 else ""
             
             if bottom_detected:
-               status = f"FALL (Bottom, {duration:.1f}s)"
-               log_angle = 90.0
+               status = f"{name}FALL (Bottom, {duration:.1f}s)"
             else:
-               status = f"FALLING ({duration:.1f}s)"
-               log_angle = max_angle
+               status = f"{name}FALLING ({duration:.1f}s)"
+            if confidence < 1.0:
+               status += f" [predicted {confidence:.0%}]"
 
             color = (0, 0, 255) # Red
-            
-            # REQUIREMENT: Notify at 2s, 1m(60s), 10m(600s), 1h(3600s)
-            NOTIFICATION_THRESHOLDS = [2.0, 60.0, 600.0, 3600.0]
-
-            for threshold in NOTIFICATION_THRESHOLDS:
-                if (duration >= threshold) and (threshold not in main.notified_stages):
-                    final_angle_int = int(round(log_angle))
-                    msg = f"[INFO] Fall Alert (Stage: {threshold}s). Logging to DB. Angle: {final_angle_int}deg"
-                    print(msg)
-                    
-                    # --- Local File Logging ---
-                    try:
-                        with open("local_fall_log.txt", "a") as f:
-                            f.write(f"{datetime.datetime.now()} - CONFIRMED FALL ({int(threshold)}s) - {final_angle_int}deg\n")
-                        print(f"[LOCAL] Saved to local_fall_log.txt")
-                    except Exception as e:
-                        print(f"[LOCAL ERROR] {e}")
-                        
-                    # --- DB Logging ---
-                    db.log_event(CAMERA_ID, final_angle_int, "FALL_CONFIRMED", current_experiment_id)
-                    
-                    # --- Logic App Webhook (Async) ---
-                    def send_webhook_async(payload):
-                        try:
-                            headers = {'Content-Type': 'application/json'}
-                            # Increased timeout to 30s as Logic App workflow might be slow for real events
-                            response = requests.post(LOGIC_APP_URL, json=payload, headers=headers, timeout=30.0)
-                            print(f"[WEBHOOK] Sent. Status: {response.status_code} | Body: {response.text}")
-                        except Exception as e:
-                            print(f"[WEBHOOK ERROR] {e}")
-
-                    payload = {
-                        "Timestamp": datetime.datetime.utcnow().isoformat()[:-3] + 'Z',
-                        "CameraID": CAMERA_ID,
-                        "RiskAngle": final_angle_int,  # Rounded integer
-                        "Status": "FALL_CONFIRMED",
-                        "ExperimentID": current_experiment_id
-                    }
-                    
-                    # Run in a separate thread to avoid blocking the video feed
-                    threading.Thread(target=send_webhook_async, args=(payload,), daemon=True).start()
-                        
-                    main.notified_stages.add(threshold)
-                    last_log_time = time.time()
         else:
-            main.fall_start_time = None
-            main.notified_stages = set()
             status = "Standing"
             color = (0, 255, 0) # Green
             
-        # --- High-Frequency Debug Logging (0.1s interval) ---
-        if time.time() - getattr(main, 'last_csv_log', 0) > 0.1:
-            d_detected = 1 if fall_detected else 0
+        timer.record('logging', time.perf_counter() - log_t0)
+
+        # --- Counters for the metrics endpoint ---
+        n_markers = len(ids) if ids is not None else 0
+        FRAMES.inc()
+        MARKERS.inc(n_markers)
+
+        # --- High-Frequency Debug Telemetry (every frame, flushed in the background) ---
+        if self.telemetry is not None:
+            self.telemetry.record(frame_ts, n_markers, max_angle, fall_detected,
+                                  duration, [timer.elapsed(name) for name in self.telemetry.stages])
+
+        # [DEBUG] Heartbeat (Unconditional)
+        if time.time() - self.last_debug_print > 1.0:
             d_markers = len(ids) if ids is not None else 0
-            d_raw = int(max_angle)
-            
-            log_line = f"{datetime.datetime.now().strftime('%H:%M:%S.%f')},{d_markers},{d_raw},{d_detected},{duration:.2f}\n"
+            ram = f", RAM: {self.metrics.rss_mb:.0f}MB" if self.metrics is not None else ""
+            print(f"[STATUS] Markers: {d_markers}, MaxAngle: {int(max_angle)}, FallDetected: {fall_detected}, Timer: {duration:.1f}s{ram}", flush=True)
+            self.last_debug_print = time.time()
+
+        if self.started_at is not None:
+            self._report_startup()
+
+        # --- Live status stream (latest-value slot, never waits on subscribers) ---
+        if self.status is not None:
+            with timer.stage('statusPublish'):
+                self.status.offer_frame(frame, frame_ts)
+                self.status.publish({
+                    'camera': self.camera_id,
+                    'experiment': self.experiment_id,
+                    'ts': frame_ts,
+                    'markers': n_markers,
+                    'ids': ids.ravel().tolist() if ids is not None else [],
+                    'angle': round(float(angle), 1),
+                    'max_angle': round(float(max_angle), 1),
+                    'confidence': round(confidence, 2),
+                    'fall': fall_detected,
+                    'bottom': bottom_detected,
+                    'duration': round(duration, 2),
+                    'status': status,
+                    'cylinders': [{'name': obj.name, 'angle': round(float(obj.angle), 1),
+                                   'falling': obj in falling, 'duration': round(obj.duration, 2),
+                                   'confidence': round(obj.confidence, 2)} for obj in falls.objects],
+                })
+
+        return {
+            'frame_ts': frame_ts,
+            'corners': corners,
+            'ids': ids,
+            'rvecs': rvecs,
+            'tvecs': tvecs,
+            'cylinder_poses': [pose for _, pose in fused],
+            'max_angle': max_angle,
+            'angle': angle,
+            'confidence': confidence,
+            'fall_detected': fall_detected,
+            'bottom_detected': bottom_detected,
+            'duration': duration,
+            'status': status,
+            'color': color,
+        }
+
+    def _detect(self, frame):
+        """
+        Marker detection, pose and raw tilt for one frame.
+        Returns (corners, ids, rvecs, tvecs, fused poses, bottom cylinder
+        indices, [(cylinder index, angle), ...]).
+        """
+        timer = self.timer
+        with timer.stage('cvtColor'):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        rvecs, tvecs = None, None
+        fused, bottoms, readings = [], [], []
+        
+        # Detect Markers
+        with timer.stage('detectMarkers'):
+            if self.tracker is not None:
+                corners, ids, rejected = self.tracker.detect(gray)
+            else:
+                corners, ids, rejected = aruco.detectMarkers(gray, self.aruco_dict, parameters=self.parameters)
+        
+        if ids is not None:
+            owner, is_bottom = self.falls.lookup(ids)
+            with timer.stage('estimatePose'):
+                # One fused PnP per cylinder when the strip geometry is known;
+                # per-marker poses for cylinders with too few strip markers
+                fused_owner = set()
+                for est, obj in zip(self.cylinder_poses, self.falls.objects):
+                    pose = est.estimate(corners, ids, self.camera_matrix, self.dist_coeffs)
+                    if pose is not None:
+                        fused.append((obj.index, pose))
+                        fused_owner.add(obj.index)
+                single = (owner >= 0) & ~is_bottom
+                if fused_owner:
+                    single &= ~np.isin(owner, list(fused_owner))
+                if single.any() or not self.cylinder_poses:
+                    rvecs, tvecs, _ = aruco.estimatePoseSingleMarkers(corners, MARKER_SIZE, self.camera_matrix, self.dist_coeffs)
             
-            try:
-                with open("debug_stream.csv", "a") as f:
-                    if os.path.getsize("debug_stream.csv") == 0:
-                        f.write("Time,Markers,Angle,FallDetected,Duration\n")
-                    f.write(log_line)
-            except:
-                pass
-            main.last_csv_log = time.time()
-
-        # --- Status Display ---
-        cv2.putText(frame,f"Status: {status} (Angle: {int(max_angle)})", (20, 40),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+            with timer.stage('calculate_angle'):
+                bottoms = owner[is_bottom].tolist()
+                
+                # Check tilt for normal markers (all markers in one vectorized call)
+                if single.any():
+                    readings.extend(zip(owner[single].tolist(), calculate_angles(rvecs[single]).tolist()))
+                for index, pose in fused:
+                    readings.append((index, float(calculate_angles(pose[0])[0])))
         
-        # [DEBUG] Heartbeat (Unconditional)
-        if time.time() - getattr(main, 'last_debug_print', 0) > 1.0:
-            d_markers = len(ids) if ids is not None else 0
-            print(f"[STATUS] Markers: {d_markers}, MaxAngle: {int(max_angle)}, FallDetected: {fall_detected}, Timer: {duration:.1f}s", flush=True)
-            main.last_debug_print = time.time()
+        return corners, ids, rvecs, tvecs, fused, bottoms, readings
+
+    def _notify(self, obj, threshold, log_angle):
+        camera_id = self.camera_id
+        if len(self.falls.objects) > 1:
+            camera_id = f"{camera_id}:{obj.name}"
+        # Same fall + same stage => same key, whichever path delivers it
+        event_key = f"{self.experiment_id}|{camera_id}|{obj.fall_start:.3f}|{threshold}"
+        clip_path = None
+        if self.clips is not None:
+            clip_path = self.clips.trigger(obj.fall_start + threshold, camera_id, threshold)
+        if self.alert_sink is not None:
+            self.alert_sink(camera_id, threshold, log_angle, self.experiment_id, event_key, clip_path)
+        else:
+            dispatch_alert(self.db, camera_id, threshold, log_angle, self.experiment_id, event_key, clip_path,
+                           store=self.store)
+
+    def _report_startup(self):
+        elapsed = time.perf_counter() - self.started_at
+        self.started_at = None
+        STARTUP_SECONDS.set(elapsed)
+        print(f"[INFO] First frame processed {elapsed:.2f}s after start.", flush=True)
+        if elapsed > self.startup_budget:
+            print(f"[WARNING] Startup took longer than the {self.startup_budget:.1f}s budget.")
+
+    def draw(self, frame, result, timer=None):
+        """
+        Renders markers, axes, status and RAM usage onto frame in place.
+        timer overrides self.timer when drawing runs on another thread.
+        """
+        corners, ids = result['corners'], result['ids']
+        with (timer or self.timer).stage('overlay'):
+            if ids is not None:
+                # Draw all markers first
+                cv2.aruco.drawDetectedMarkers(frame, corners)
+                
+                for rvec, tvec, _ in result['cylinder_poses']:
+                    cv2.drawFrameAxes(frame, self.camera_matrix, self.dist_coeffs, rvec, tvec, 0.03)
+                
+                for i in range(len(ids)):
+                    # Draw Axis (Short length to avoid warnings)
+                    if result['rvecs'] is not None:
+                        cv2.drawFrameAxes(frame, self.camera_matrix, self.dist_coeffs, result['rvecs'][i], result['tvecs'][i], 0.01)
+                    if ids[i][0] == 99:
+                        cv2.putText(frame, "BOTTOM DETECTED", (int(corners[i][0][0][0]), int(corners[i][0][0][1])), 
+                                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,255), 2)
+
+            # --- Status Display ---
+            cv2.putText(frame,f"Status: {result['status']} (Angle: {int(result['max_angle'])})", (20, 40),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, result['color'], 2)
             
-        # Monitor RAM Usage
-        process = psutil.Process(os.getpid())
-        ram_usage_mb = process.memory_info().rss / (1024 * 1024)
-        ram_text = f"RAM: {ram_usage_mb:.1f} MB"
-        text_size = cv2.getTextSize(ram_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-        text_x = width - text_size[0] - 10
-        text_y = height - 10
-        cv2.putText(frame, ram_text, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-        cv2.imshow("Cylinder Fall Detection", frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+            # Monitor RAM Usage (last sample from the background sampler)
+            if self.metrics is not None:
+                ram_text = f"RAM: {self.metrics.rss_mb:.1f} MB"
+                text_size = cv2.getTextSize(ram_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+                text_x = self.width - text_size[0] - 10
+                text_y = self.height - 10
+                cv2.putText(frame, ram_text, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+
+def main(source=0, headless=False, db=None, timer=None, max_frames=None,
+         pipelined=True, drop_policy='latest', tracking=None, cylinder_diameter=None, cylinders=None,
+         telemetry_dir='telemetry', preview_every=1, instrument=True, metrics_port=None, motion_gate=None,
+         tilt_filter=None, detect_every=1, db_check='background', startup_budget=STARTUP_BUDGET,
+         clips=None, detector_params=None, status=None, store=None):
+    """
+    Runs the fall monitor on a frame source (camera index, video file, image
+    directory or "synthetic", see frame_sources.open_source).
+    headless skips all rendering (overlay, imshow, waitKey) for server runs;
+    otherwise preview_every=N draws and shows only every Nth frame.
+    db, timer and store (the local event store) can be injected for replays.
+    pipelined runs capture / detection / display on separate threads linked by
+    bounded queues (drop_policy 'latest' keeps only the newest frame, 'block'
+    is lossless for offline replays); otherwise everything runs in sequence.
+    tracking, cylinder_diameter, cylinders, motion_gate, tilt_filter,
+    detect_every and detector_params are passed to CylinderMonitor.
+    telemetry_dir receives the binary per-frame debug telemetry (None = off).
+    instrument feeds per-stage latency histograms (instrumentation.py);
+    metrics_port serves them with all counters at http://127.0.0.1:<port>/metrics.
+    db_check: 'background' (default) checks the DB connection and the webhook
+    endpoint off the startup path, 'sync' waits for both before opening the
+    source, None skips them. The time to the first processed frame is
+    reported against startup_budget seconds.
+    clips (a dict of ClipRecorder options, e.g. {'directory': 'clips'})
+    records a pre/post-event clip for every alert stage.
+    status (a dict of StatusServer options, e.g. {'port': 9110}) streams the
+    live per-frame status over SSE, plus an optional JPEG preview.
+    """
+    started_at = time.perf_counter()
+    # [NEW] Generate or Input Experiment ID at startup
+    # This groups all logs from this specific run
+    current_experiment_id = f"EXP_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}"
+    print(f"[INFO] Current Experiment ID: {current_experiment_id}")
+
+    # --- Database Setup ---
+    if db is None:
+        from db_logger import AzureDBLogger
+        print(f"[INFO] Starting database logger (connection check: {db_check or 'off'})...")
+        db = AzureDBLogger(check_connection=db_check)
+    if db_check == 'background':
+        threading.Thread(target=check_webhook_ready, name="webhook-check", daemon=True).start()
+    elif db_check:
+        check_webhook_ready()
+    
+    # --- Frame Source Setup ---
+    cap = open_source(source)
+    if not cap.open():
+        return
+
+    telemetry = TelemetryWriter(telemetry_dir) if telemetry_dir else None
+    if timer is None and (telemetry is not None or instrument):
+        # Stage timings for telemetry records / histograms, without keeping samples
+        timer = StageTimer(keep=False)
+    timer = timer or NullTimer()
+    if instrument and isinstance(timer, StageTimer):
+        timer.histogram = STAGE_SECONDS
+    server = MetricsServer(metrics_port).start() if metrics_port else None
+    recorder = ClipRecorder(**dict({'fps': cap.fps} if cap.fps else {}, **clips)) if clips else None
+    status_server = StatusServer(**status).start() if status else None
+
+    print(f"[INFO] Cylinder Monitor started. Target: Any marker in strip OR Bottom (ID 99). Press 'q' to quit.")
+
+    metrics = MetricsSampler().start()
+    if pipelined:
+        from pipeline import run_pipeline
+        monitor = CylinderMonitor(cap.width, cap.height, db, CAMERA_ID, current_experiment_id, timer.fork(),
+                                  tracking=tracking, cylinder_diameter=cylinder_diameter, cylinders=cylinders,
+                                  telemetry=telemetry, metrics=metrics, motion_gate=motion_gate,
+                                  tilt_filter=tilt_filter, detect_every=detect_every,
+                                  started_at=started_at, startup_budget=startup_budget, clips=recorder,
+                                  detector_params=detector_params, status=status_server, store=store)
+        run_pipeline(cap, monitor, headless=headless, timer=timer, max_frames=max_frames,
+                     drop_policy=drop_policy, preview_every=preview_every)
+    else:
+        monitor = CylinderMonitor(cap.width, cap.height, db, CAMERA_ID, current_experiment_id, timer,
+                                  tracking=tracking, cylinder_diameter=cylinder_diameter, cylinders=cylinders,
+                                  telemetry=telemetry, metrics=metrics, motion_gate=motion_gate,
+                                  tilt_filter=tilt_filter, detect_every=detect_every,
+                                  started_at=started_at, startup_budget=startup_budget, clips=recorder,
+                                  detector_params=detector_params, status=status_server, store=store)
+        _run_sequential(cap, monitor, headless, timer, max_frames, preview_every)
+
+    metrics.stop()
+    if server is not None:
+        server.close()
+    if status_server is not None:
+        status_server.close()
+    if recorder is not None:
+        recorder.close()
+    if telemetry is not None:
+        telemetry.close()
+    db.close()
+    close_event_store()
+    close_webhook_dispatcher()
+
+
+def _run_sequential(cap, monitor, headless, timer, max_frames, preview_every):
+    frame_count = 0
+    while max_frames is None or frame_count < max_frames:
+        with timer.stage('capture'):
+            ret, frame, frame_ts = cap.read()
+        if not ret:
+            break
+        frame_count += 1
+
+        result = monitor.process(frame, frame_ts)
+
+        # Headless: no overlay, window or key polling at all
+        if headless or frame_count % preview_every:
+            timer.end_frame()
+            continue
+        monitor.draw(frame, result)
+        with timer.stage('display'):
+            cv2.imshow("Cylinder Fall Detection", frame)
+            key = cv2.waitKey(1) & 0xFF
+        timer.end_frame()
+        if key == ord('q'):
             break
 
     cap.release()
-    cv2.destroyAllWindows()
+    if not headless:
+        cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Cylinder fall detection monitor")
+    parser.add_argument('--source', default='0',
+                        help="Camera index, video file, image directory or 'synthetic[:N]'")
+    parser.add_argument('--headless', action='store_true',
+                        help="Server mode: no preview window and no overlay rendering")
+    parser.add_argument('--preview-every', type=int, default=1, metavar='N',
+                        help="Render and show only every Nth frame in the preview window")
+    parser.add_argument('--sequential', action='store_true',
+                        help="Run capture, detection and display in one thread")
+    parser.add_argument('--drop-policy', default='latest', choices=['latest', 'block'],
+                        help="'latest' drops stale frames when a stage falls behind, 'block' never drops")
+    parser.add_argument('--resolution', default='640x480',
+                        help="Camera capture size WxH; higher resolutions suit smaller markers with --track")
+    parser.add_argument('--track', action='store_true',
+                        help="Search only around last frame's markers, with periodic full rescans")
+    parser.add_argument('--rescan', type=int, default=15, help="Frames between full-frame rescans with --track")
+    parser.add_argument('--pyramid', type=int, default=0,
+                        help="Pyramid levels to search first on full rescans with --track (0 = off)")
+    parser.add_argument('--cylinder-pose', type=float, default=None, metavar='DIAMETER_MM',
+                        help="Fuse all strip markers into one cylinder pose (strip printed for this diameter)")
+    parser.add_argument('--cylinders', default=None, metavar='JSON|PATH',
+                        help="Cylinders in view, inline or as a JSON file: "
+                             "[{\"name\": ..., \"first_id\": 0, \"last_id\": 9, \"bottom_id\": 99}, ...]")
+    parser.add_argument('--telemetry-dir', default='telemetry',
+                        help="Directory for binary per-frame debug telemetry (see telemetry.py)")
+    parser.add_argument('--no-telemetry', action='store_true', help="Disable debug telemetry")
+    parser.add_argument('--motion-gate', action='store_true',
+                        help="Skip marker detection while the scene is static (reuses the last result)")
+    parser.add_argument('--min-detect-rate', type=float, default=1.0,
+                        help="Detections per second kept up on a static scene with --motion-gate")
+    parser.add_argument('--tilt-filter', action='store_true',
+                        help="Filter each cylinder's tilt and bridge marker dropouts up to --hold seconds")
+    parser.add_argument('--hold', type=float, default=1.0, help="Dropout hold-over window for --tilt-filter")
+    parser.add_argument('--detect-every', type=int, default=1, metavar='N',
+                        help="Run marker detection on every Nth frame only; --tilt-filter predicts the "
+                             "frames in between, otherwise fall timers only advance on detection frames")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument('--status-port', type=int, default=None,
+                        help="Stream live status as SSE on http://127.0.0.1:PORT/status")
+    parser.add_argument('--status-rate', type=float, default=10.0, help="Status updates per second on the stream")
+    parser.add_argument('--preview-fps', type=float, default=0.0,
+                        help="JPEG preview frames per second on /preview with --status-port (0 = off)")
+    parser.add_argument('--detector-params', default=None, metavar='JSON',
+                        help="ArUco detector parameters saved by benchmark_detector_params.py")
+    parser.add_argument('--clips', default=None, metavar='DIR',
+                        help="Save a pre/post-event video clip per fall alert to DIR")
+    parser.add_argument('--clip-pre', type=float, default=8.0, help="Seconds of video before the alert")
+    parser.add_argument('--clip-post', type=float, default=4.0, help="Seconds of video after the alert")
+    parser.add_argument('--clip-gray', action='store_true', help="Buffer and save clips in grayscale")
+    parser.add_argument('--clip-scale', type=float, default=0.5, help="Scale of buffered clip frames (1.0 = full size)")
+    parser.add_argument('--db-check', default='background', choices=['background', 'sync', 'off'],
+                        help="DB / webhook readiness check at startup (default: background, never delays frames)")
+    parser.add_argument('--startup-budget', type=float, default=STARTUP_BUDGET,
+                        help="Warn if the first frame takes longer than this many seconds")
+    args = parser.parse_args()
+
+    source = args.source
+    if source.isdigit():
+        w, h = (int(v) for v in args.resolution.lower().split('x'))
+        source = CameraSource(int(source), w, h)
+    tracking = None
+    if args.track:
+        tracking = {'rescan_interval': args.rescan, 'pyramid_levels': args.pyramid}
+    cylinders = None
+    if args.cylinders and args.cylinders.lstrip().startswith('['):
+        cylinders = json.loads(args.cylinders)
+    elif args.cylinders:
+        with open(args.cylinders, 'r') as f:
+            cylinders = json.load(f)
+    main(source=source, headless=args.headless, preview_every=max(1, args.preview_every),
+         pipelined=not args.sequential, drop_policy=args.drop_policy, tracking=tracking,
+         cylinder_diameter=args.cylinder_pose / 1000.0 if args.cylinder_pose else None,
+         cylinders=cylinders, telemetry_dir=None if args.no_telemetry else args.telemetry_dir,
+         metrics_port=args.metrics_port,
+         motion_gate={'min_rate': args.min_detect_rate} if args.motion_gate else None,
+         tilt_filter={'hold_s': args.hold} if args.tilt_filter else None, detect_every=args.detect_every,
+         db_check=None if args.db_check == 'off' else args.db_check, startup_budget=args.startup_budget,
+         clips={'directory': args.clips, 'pre_s': args.clip_pre, 'post_s': args.clip_post,
+                'grayscale': args.clip_gray, 'scale': args.clip_scale} if args.clips else None,
+         detector_params=args.detector_params,
+         status={'port': args.status_port, 'rate': args.status_rate,
+                 'preview_fps': args.preview_fps} if args.status_port else None)
@@ -0,0 +1,83 @@
+import cv2
+import numpy as np
+
+from generate_cylinder_marker import strip_layout
+
+
+def strip_object_points(diameter_m, marker_size_m, first_id=0):
+    """
+    3D corners of every strip marker in the cylinder frame, using the same
+    layout as generate_cylinder_marker.create_marker_strip.
+    Cylinder frame: Y along the cylinder axis (up), origin on the axis at the
+    strip's centre line, marker 0's left edge at angle 0 around the axis.
+    Each marker is treated as flat (chord), which is accurate for markers
+    small relative to the diameter.
+    Returns {first_id + i: (4, 3) float32} in ArUco corner order
+    (top-left, top-right, bottom-right, bottom-left).
+    """
+    _, num_markers, gap_mm = strip_layout(diameter_m * 1000.0, marker_size_m * 1000.0)
+    radius = diameter_m / 2.0
+    gap = gap_mm / 1000.0
+    h = marker_size_m / 2.0
+    up = np.array([0.0, 1.0, 0.0])
+
+    points = {}
+    for i in range(num_markers):
+        arc = gap / 2.0 + i * (marker_size_m + gap) + h
+        phi = arc / radius
+        normal = np.array([np.sin(phi), 0.0, np.cos(phi)])
+        tangent = np.array([np.cos(phi), 0.0, -np.sin(phi)])  # marker +x; tangent x up = normal
+        # Flat marker sits on the chord, so its centre is slightly inside the surface
+        centre = normal * np.sqrt(radius * radius - h * h)
+        points[first_id + i] = np.array([
+            centre - h * tangent + h * up,
+            centre + h * tangent + h * up,
+            centre + h * tangent - h * up,
+            centre - h * tangent - h * up,
+        ], dtype=np.float32)
+    return points
+
+
+class CylinderPoseEstimator:
+    """
+    Fuses the corners of every visible strip marker into one solvePnP, giving
+    a single cylinder pose instead of one noisy pose per marker. The previous
+    solution seeds the next solve (useExtrinsicGuess) while it keeps tracking.
+    The cylinder frame's Y-axis is the cylinder axis, so its tilt is computed
+    exactly like a single marker's (calculate_angles).
+    last_id: the cylinder's last strip ID; a strip with more markers than
+    first_id..last_id has the rest ignored, so another cylinder's markers
+    are never fused in.
+    """
+
+    def __init__(self, diameter_m, marker_size_m, first_id=0, min_markers=2, last_id=None):
+        points = strip_object_points(diameter_m, marker_size_m, first_id)
+        self.object_points = {k: v for k, v in points.items() if last_id is None or k <= last_id}
+        self.min_markers = min_markers
+        self._rvec = None
+        self._tvec = None
+
+    def estimate(self, corners, ids, camera_matrix, dist_coeffs):
+        """Returns (rvec, tvec, markers_used) or None if too few strip markers are visible."""
+        obj, img = [], []
+        for c, marker_id in zip(corners, ids.ravel()):
+            pts = self.object_points.get(int(marker_id))
+            if pts is not None:
+                obj.append(pts)
+                img.append(c.reshape(4, 2))
+        if len(obj) < self.min_markers:
+            self._rvec = None
+            return None
+
+        obj = np.concatenate(obj)
+        img = np.concatenate(img).astype(np.float32)
+        use_guess = self._rvec is not None
+        ok, rvec, tvec = cv2.solvePnP(obj, img, camera_matrix, dist_coeffs,
+                                      self._rvec.copy() if use_guess else None,
+                                      self._tvec.copy() if use_guess else None,
+                                      useExtrinsicGuess=use_guess, flags=cv2.SOLVEPNP_ITERATIVE)
+        if not ok:
+            self._rvec = None
+            return None
+        self._rvec, self._tvec = rvec, tvec
+        return rvec, tvec, len(obj) // 4
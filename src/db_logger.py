@@ -1,46 +1,394 @@
-import pyodbc
 import datetime
+import json
 import os
+import queue
+import threading
+import time
+from collections import deque
+
+import config
+from instrumentation import DB_FLUSH_SECONDS, SINK_FAILURES
+
+# VerificationStatus is handled by DB DEFAULT
+INSERT_EVENT_QUERY = """
+INSERT INTO FallEvents (CameraID, RiskAngle, Status, Timestamp, ExperimentID)
+VALUES (?, ?, ?, ?, ?)
+"""
+
+# With the optional clip column: ALTER TABLE FallEvents ADD ClipPath NVARCHAR(260) NULL
+INSERT_EVENT_CLIP_QUERY = """
+INSERT INTO FallEvents (CameraID, RiskAngle, Status, Timestamp, ExperimentID, ClipPath)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+def _is_data_error(e):
+    """DB-API errors caused by the rows or the statement, which no retry can fix (pyodbc and sqlite3 alike)."""
+    return any(c.__name__ in ('DataError', 'IntegrityError', 'ProgrammingError', 'NotSupportedError')
+               for c in type(e).__mro__)
+
+
+class BatchEventWriter:
+    """
+    Background writer for FallEvents rows so the video loop never waits on
+    the database.
+
+    - One persistent connection (from `connect`, any DB-API 2.0 factory) is
+      reused and checked with SELECT 1 after `health_check_interval` idle.
+    - submit() only enqueues; the writer thread flushes with executemany when
+      `batch_size` rows are waiting or `flush_interval` seconds have passed.
+    - If the DB is unreachable, batches are appended to an append-only JSONL
+      spool file. While the spool is non-empty every new row goes behind it,
+      and it is replayed in order (progress kept in <spool>.offset) once a
+      connection succeeds, so events are never reordered or lost on restart.
+      A spool line that does not decode (cut off by a crash mid-append) is
+      moved to <spool>.bad and counted in stats['bad'] instead of stopping
+      the replay.
+    - Only connection errors are retried. When the DB rejects a batch for
+      its data (DataError, IntegrityError, ProgrammingError), its rows are
+      retried one at a time and the ones that still fail go to <spool>.bad
+      (stats['rejected']), so one bad row cannot hold up every later event.
+    - name prefixes the log lines, sink labels fall_sink_failures_total and
+      flush_seconds (None to skip) receives the submit-to-commit latencies.
+    """
+
+    def __init__(self, connect, query=INSERT_EVENT_QUERY, batch_size=50, flush_interval=1.0,
+                 queue_size=10000, spool_path='db_spool.jsonl', retry_interval=5.0,
+                 health_check_interval=30.0, name='DB', sink='db', flush_seconds=DB_FLUSH_SECONDS):
+        self.connect = connect
+        self.query = query
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.offset_path = spool_path + '.offset'
+        self.bad_path = spool_path + '.bad'
+        self.retry_interval = retry_interval
+        self.health_check_interval = health_check_interval
+        self.name = name
+        self.sink = sink
+        self.flush_seconds = flush_seconds
+        self.stats = {'submitted': 0, 'written': 0, 'spooled': 0, 'replayed': 0,
+                      'batches': 0, 'failures': 0, 'bad': 0, 'rejected': 0}
+        self.flush_latencies = deque(maxlen=10000)  # submit -> commit, seconds
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._spool_lock = threading.Lock()
+        self._conn = None
+        self._last_used = 0.0
+        self._next_retry = 0.0
+        self._closing = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"{sink}-writer", daemon=True)
+        self._thread.start()
+
+    # --- Producer side ---
+    def submit(self, row):
+        """Queues one (CameraID, RiskAngle, Status, Timestamp, ExperimentID[, ClipPath]) row without blocking."""
+        self.stats['submitted'] += 1
+        try:
+            self._queue.put_nowait((row, time.perf_counter()))
+        except queue.Full:
+            # Never block the video loop: overflow goes straight to the spool
+            print(f"[{self.name}] Writer queue full, spooling event to disk.")
+            SINK_FAILURES.labels(self.sink, 'queue_full').inc()
+            self._spool([row])
+
+    def close(self, timeout=10.0):
+        """Flushes everything still queued (to the DB or the spool) and stops the thread."""
+        self._closing.set()
+        self._thread.join(timeout)
+
+    # --- Writer thread ---
+    def _run(self):
+        while True:
+            batch = []
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = self.flush_interval if deadline is None else deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=min(timeout, 0.1))
+                except queue.Empty:
+                    if self._closing.is_set() and self._queue.empty():
+                        break
+                    if deadline is None and self._spool_pending():
+                        break  # idle: use the time to retry the spool
+                    continue
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.perf_counter() + self.flush_interval
+            try:
+                self._flush(batch)
+            except Exception as e:
+                # Keep the thread alive: a writer that dies leaves the queue to fill up unread
+                print(f"[{self.name} Error] Writer flush failed: {e!r}")
+                SINK_FAILURES.labels(self.sink, 'writer').inc()
+                self._next_retry = time.monotonic() + self.retry_interval
+            if self._closing.is_set() and self._queue.empty():
+                self._drop_connection()
+                return
+
+    def _flush(self, batch):
+        rows = [row for row, _ in batch]
+        if not rows and time.monotonic() < self._next_retry:
+            return
+        if self._spool_pending():
+            # Keep order: new rows queue up behind the spool, then try to drain it
+            if rows:
+                self._spool(rows)
+            self._replay_spool()
+            return
+        if not rows:
+            return
+        rejected = self.stats['rejected']
+        done = self._write(rows)
+        written = done - (self.stats['rejected'] - rejected)
+        if written:
+            now = time.perf_counter()
+            latencies = [now - t for _, t in batch[:done]]
+            self.flush_latencies.extend(latencies)
+            if self.flush_seconds is not None:
+                for latency in latencies:
+                    self.flush_seconds.observe(latency)
+            self.stats['written'] += written
+            print(f"[{self.name} Success] Saved {written} event(s).")
+        if done < len(rows):
+            self._spool(rows[done:])
+
+    def _write(self, rows):
+        """
+        Writes rows in one transaction. Returns how many of them, from the
+        front, are done with: committed, or rejected by the DB and set aside.
+        Fewer than len(rows) means the connection failed and the rest waits
+        for the next retry.
+        """
+        if time.monotonic() < self._next_retry:
+            return 0
+        try:
+            self._execute(rows)
+            return len(rows)
+        except Exception as e:
+            if not _is_data_error(e):
+                self._write_failed(len(rows), e)
+                return 0
+            print(f"[{self.name} Error] {len(rows)} event(s) rejected ({e}), retrying one at a time.")
+            self._rollback()
+        # A row the DB will never take must not hold up the ones behind it
+        done = 0
+        for row in rows:
+            try:
+                self._execute([row])
+            except Exception as e:
+                if not _is_data_error(e):
+                    self._write_failed(1, e)
+                    return done
+                self._rollback()
+                self._set_aside([(self._encode(row), e)], 'rejected')
+            done += 1
+        return done
+
+    def _execute(self, rows):
+        conn = self._connection()
+        cursor = conn.cursor()
+        if hasattr(cursor, 'fast_executemany'):
+            cursor.fast_executemany = True
+        cursor.executemany(self.query, rows)
+        conn.commit()
+        self._last_used = time.monotonic()
+        self.stats['batches'] += 1
+
+    def _write_failed(self, count, e):
+        print(f"[{self.name} Error] Failed to write {count} event(s): {e}")
+        self.stats['failures'] += 1
+        SINK_FAILURES.labels(self.sink, 'write').inc()
+        self._drop_connection()
+        self._next_retry = time.monotonic() + self.retry_interval
+
+    def _rollback(self):
+        try:
+            self._conn.rollback()
+        except Exception:
+            self._drop_connection()
+
+    def _connection(self):
+        if self._conn is not None and time.monotonic() - self._last_used > self.health_check_interval:
+            try:
+                cursor = self._conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            except Exception:
+                self._drop_connection()
+        if self._conn is None:
+            self._conn = self.connect()
+        return self._conn
+
+    def _drop_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+
+    # --- Spool ---
+    def _spool_pending(self):
+        return os.path.exists(self.spool_path)
+
+    def _spool(self, rows):
+        with self._spool_lock:
+            try:
+                with open(self.spool_path, 'a+b') as f:
+                    if f.seek(0, os.SEEK_END):
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b"\n":
+                            f.write(b"\n")  # last line cut short by a crash: keep it on its own line
+                    f.write("".join(self._encode(row) for row in rows).encode('utf-8'))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.stats['spooled'] += len(rows)
+            except Exception as e:
+                print(f"[{self.name} Error] Could not write spool {self.spool_path}: {e}")
+                SINK_FAILURES.labels(self.sink, 'spool').inc()
+
+    def _replay_spool(self):
+        # The lock only covers reading the spool and removing it: submit() may
+        # append while the rows go to the DB, and such lines are replayed next time.
+        with self._spool_lock:
+            try:
+                with open(self.spool_path, 'r', encoding='utf-8', errors='replace') as f:
+                    lines = f.readlines()
+                    size = os.fstat(f.fileno()).st_size
+            except FileNotFoundError:
+                return
+        done = 0
+        if os.path.exists(self.offset_path):
+            with open(self.offset_path, 'r') as f:
+                done = int(f.read().strip() or 0)
+
+        while done < len(lines):
+            end = min(done + self.batch_size, len(lines))
+            chunk, positions, bad = [], [], []
+            for i in range(done, end):
+                try:
+                    chunk.append(self._decode(lines[i]))
+                    positions.append(i)
+                except (ValueError, TypeError, IndexError) as e:
+                    bad.append((i, lines[i], e))
+            written = self._write(chunk) if chunk else 0
+            if written < len(chunk):
+                end = positions[written]  # resume at the first row not yet committed
+            self._set_aside([(line, e) for i, line, e in bad if i < end], 'spool_corrupt')
+            self.stats['replayed'] += written
+            if end > done:
+                done = end
+                with open(self.offset_path, 'w') as f:
+                    f.write(str(done))
+            if written < len(chunk):
+                return
+
+        with self._spool_lock:
+            if os.path.getsize(self.spool_path) != size:
+                return
+            os.remove(self.spool_path)
+            if os.path.exists(self.offset_path):
+                os.remove(self.offset_path)
+        print(f"[{self.name} Success] Replayed {done} spooled event(s).")
+
+    def _set_aside(self, bad, reason):
+        """
+        Appends [(spool line, error)] to <spool>.bad: lines that do not decode
+        (reason 'spool_corrupt') or rows the DB rejects ('rejected').
+        """
+        if not bad:
+            return
+        for line, e in bad:
+            print(f"[{self.name} Error] Event set aside in {self.bad_path} ({reason}): {e}")
+        try:
+            with open(self.bad_path, 'a') as f:
+                f.writelines(line if line.endswith("\n") else line + "\n" for line, _ in bad)
+        except OSError as e:
+            print(f"[{self.name} Error] Could not write {self.bad_path}: {e}")
+        self.stats['bad' if reason == 'spool_corrupt' else 'rejected'] += len(bad)
+        SINK_FAILURES.labels(self.sink, reason).inc(len(bad))
+
+    @staticmethod
+    def _encode(row):
+        return json.dumps([v.isoformat() if isinstance(v, datetime.datetime) else v for v in row]) + "\n"
+
+    @staticmethod
+    def _decode(line):
+        row = json.loads(line)
+        row[3] = datetime.datetime.fromisoformat(row[3])
+        return tuple(row)
+
 
 class AzureDBLogger:
-    def __init__(self, env_path='sql.env'):
-        self.conn_str = self._get_connection_string(env_path)
+    """
+    FallEvents logger for Azure SQL.
+
+    Startup never waits on the network: pyodbc is imported, the ODBC drivers
+    enumerated and the test connection made on a background thread
+    (check_connection='background'; 'sync' blocks as before, None skips the
+    check). `ready` is set once the check has finished, `connected` holds its
+    outcome. Events logged meanwhile are queued by the writer as usual.
+
+    clip_column: store each event's clip path in FallEvents.ClipPath (the
+    column has to be added first, see INSERT_EVENT_CLIP_QUERY); None reads
+    it from the `clip_column` config key (1 / true).
+    """
+
+    def __init__(self, env_path='sql.env', async_writes=True, spool_path='db_spool.jsonl',
+                 check_connection='background', clip_column=None):
+        self.env_path = env_path
+        if clip_column is None:
+            clip_column = str(config.get_config('clip_column', env_path, '')).lower() in ('1', 'true', 'yes')
+        self.clip_column = clip_column
+        self.query = INSERT_EVENT_CLIP_QUERY if clip_column else INSERT_EVENT_QUERY
         self.connected = False
+        self.ready = threading.Event()
+        self._conn_str = None
+        self._conn_str_lock = threading.Lock()
+        if check_connection == 'background':
+            threading.Thread(target=self.check_connection, name="db-check", daemon=True).start()
+        elif check_connection:
+            self.check_connection()
+        else:
+            self.ready.set()
+
+        # Events are written by a background thread over one persistent connection
+        self.writer = None
+        if async_writes:
+            self.writer = BatchEventWriter(self._connect, query=self.query, spool_path=spool_path)
+
+    @property
+    def conn_str(self):
+        """Connection string, built on first use (driver enumeration needs pyodbc)."""
+        with self._conn_str_lock:
+            if self._conn_str is None:
+                self._conn_str = self._get_connection_string(self.env_path)
+            return self._conn_str
+
+    def _connect(self):
+        import pyodbc
+        return pyodbc.connect(self.conn_str)
+
+    def check_connection(self):
+        """Test connection; sets self.connected and self.ready, returns connected."""
         try:
-             # Test connection
-            with pyodbc.connect(self.conn_str) as conn:
+            with self._connect():
                 self.connected = True
                 print("[DB] Connection check successful.")
         except Exception as e:
             print(f"[DB] Initial connection check failed: {e}")
             print("Make sure your IP is allowed in Azure SQL Server Firewall rules.")
+        finally:
+            self.ready.set()
+        return self.connected
 
     @staticmethod
     def get_config(key, env_path='sql.env'):
-        # 1. Try to read from file
-        paths_to_check = [env_path, os.path.join('..', env_path), os.path.join('c:\\workspace\\marker_dev', env_path)]
-        
-        found_path = None
-        for p in paths_to_check:
-            if os.path.exists(p):
-                found_path = p
-                break
-        
-        val = None
-        if found_path:
-            try:
-                with open(found_path, 'r') as f:
-                    for line in f:
-                        if '=' in line:
-                            parts = line.split('=', 1)
-                            k = parts[0].strip()
-                            v = parts[1].strip().strip('"').strip("'")
-                            if k == key:
-                                val = v
-                                break
-            except Exception as e:
-                print(f"[Config] Warning: Could not read {found_path}: {e}")
-        return val
+        """Cached sql.env value with FALL_<KEY> environment override (see config.get_config)."""
+        return config.get_config(key, env_path)
 
     def _get_connection_string(self, env_path):
         # 1. Get props from file
@@ -102,29 +450,34 @@ class AzureDBLogger:
 
         return conn_str
 
-    def log_event(self, camera_id, angle, status, experiment_id=None):
+    def log_event(self, camera_id, angle, status, experiment_id=None, clip_path=None):
+        current_time = datetime.datetime.now()
+        # Pass experiment_id (can be None, resulting in NULL in DB)
+        row = (camera_id, angle, status, current_time, experiment_id)
+        if self.clip_column:
+            row += (clip_path,)
+        if self.writer is not None:
+            self.writer.submit(row)
+            return
+
         try:
-            with pyodbc.connect(self.conn_str) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
-                # Updated Query to include ExperimentID
-                # Note: VerificationStatus is handled by DB DEFAULT
-                query = """
-                INSERT INTO FallEvents (CameraID, RiskAngle, Status, Timestamp, ExperimentID)
-                VALUES (?, ?, ?, ?, ?)
-                """
-                current_time = datetime.datetime.now()
-                
-                # Pass experiment_id (can be None, resulting in NULL in DB)
-                cursor.execute(query, (camera_id, angle, status, current_time, experiment_id))
+                cursor.execute(self.query, row)
                 conn.commit()
                 print(f"[DB Success] Event Saved: {status} ({int(angle)}deg)")
                 
         except Exception as e:
             print(f"[DB Error] Failed to log event: {e}")
-            # Optional: Attempt simpler reconnect or logging logic here
+
+    def close(self):
+        """Flushes pending events; call once on shutdown."""
+        if self.writer is not None:
+            self.writer.close()
 
 if __name__ == "__main__":
     # Test
     logger = AzureDBLogger()
     logger.log_event("TEST_CAM", 10.0, "TEST_MSG")
+    logger.close()
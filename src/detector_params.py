@@ -0,0 +1,49 @@
+import json
+
+import cv2.aruco as aruco
+
+# Enum-valued DetectorParameters fields are stored by name in JSON
+CORNER_REFINEMENT = {
+    'NONE': aruco.CORNER_REFINE_NONE,
+    'SUBPIX': aruco.CORNER_REFINE_SUBPIX,
+    'CONTOUR': aruco.CORNER_REFINE_CONTOUR,
+    'APRILTAG': aruco.CORNER_REFINE_APRILTAG,
+}
+
+# Search space of benchmark_detector_params.py (OpenCV defaults included)
+PARAMETER_GRID = {
+    'adaptiveThreshWinSizeMin': [3, 5],
+    'adaptiveThreshWinSizeMax': [15, 23, 35],
+    'adaptiveThreshWinSizeStep': [4, 10],
+    'minMarkerPerimeterRate': [0.01, 0.02, 0.03],
+    'polygonalApproxAccuracyRate': [0.03, 0.05],
+    'cornerRefinementMethod': ['NONE', 'SUBPIX', 'CONTOUR'],
+}
+
+
+def make_parameters(values=None):
+    """aruco.DetectorParameters with the given {field: value} overrides (OpenCV defaults otherwise)."""
+    params = aruco.DetectorParameters()
+    for name, value in (values or {}).items():
+        if name == 'cornerRefinementMethod' and isinstance(value, str):
+            value = CORNER_REFINEMENT[value]
+        setattr(params, name, value)
+    return params
+
+
+def save_parameters(path, values, metrics=None):
+    with open(path, 'w') as f:
+        json.dump({'parameters': values, 'metrics': metrics or {}}, f, indent=2)
+
+
+def load_parameters(path):
+    """{field: value} saved by save_parameters (the tuning benchmark's best configuration)."""
+    with open(path, 'r') as f:
+        return json.load(f)['parameters']
+
+
+def detector_parameters(spec):
+    """DetectorParameters from None (defaults), a {field: value} dict or a saved JSON path."""
+    if isinstance(spec, str):
+        spec = load_parameters(spec)
+    return make_parameters(spec)
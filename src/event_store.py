@@ -0,0 +1,300 @@
+import argparse
+import datetime
+import os
+import re
+import sqlite3
+import time
+
+from db_logger import BatchEventWriter
+
+# FallEvents as in Azure SQL, plus the alert stage (seconds) and clip path
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS FallEvents (
+    EventID INTEGER PRIMARY KEY,
+    CameraID TEXT NOT NULL,
+    RiskAngle INTEGER,
+    Status TEXT NOT NULL,
+    Timestamp TEXT NOT NULL,
+    ExperimentID TEXT,
+    Stage INTEGER,
+    ClipPath TEXT
+);
+-- Covers the time-window aggregations without touching the table
+CREATE INDEX IF NOT EXISTS ix_events_time
+    ON FallEvents (Timestamp, Status, CameraID, ExperimentID, Stage, RiskAngle);
+CREATE INDEX IF NOT EXISTS ix_events_camera ON FallEvents (CameraID, Timestamp);
+CREATE INDEX IF NOT EXISTS ix_events_experiment ON FallEvents (ExperimentID, Timestamp);
+-- Hourly rollup kept by a trigger, so summaries over long windows read a few
+-- rows per hour instead of every event ('' / -1 stand for a NULL experiment / stage)
+CREATE TABLE IF NOT EXISTS EventHours (
+    Hour TEXT NOT NULL,
+    CameraID TEXT NOT NULL,
+    ExperimentID TEXT NOT NULL,
+    Stage INTEGER NOT NULL,
+    Status TEXT NOT NULL,
+    Events INTEGER NOT NULL,
+    MaxAngle INTEGER,
+    First TEXT NOT NULL,
+    Last TEXT NOT NULL,
+    PRIMARY KEY (Hour, CameraID, ExperimentID, Stage, Status)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_hours_camera ON EventHours (CameraID, Hour);
+CREATE INDEX IF NOT EXISTS ix_hours_experiment ON EventHours (ExperimentID, Hour);
+CREATE TRIGGER IF NOT EXISTS tr_events_hours AFTER INSERT ON FallEvents BEGIN
+    INSERT INTO EventHours (Hour, CameraID, ExperimentID, Stage, Status, Events, MaxAngle, First, Last)
+    VALUES (substr(NEW.Timestamp, 1, 13), NEW.CameraID, IFNULL(NEW.ExperimentID, ''), IFNULL(NEW.Stage, -1),
+            NEW.Status, 1, NEW.RiskAngle, NEW.Timestamp, NEW.Timestamp)
+    ON CONFLICT (Hour, CameraID, ExperimentID, Stage, Status) DO UPDATE SET
+        Events = Events + 1,
+        MaxAngle = max(IFNULL(MaxAngle, excluded.MaxAngle), IFNULL(excluded.MaxAngle, MaxAngle)),
+        First = min(First, excluded.First),
+        Last = max(Last, excluded.Last);
+END;
+-- Byte offset up to which each legacy text log has been imported
+CREATE TABLE IF NOT EXISTS ImportedLogs (
+    Path TEXT PRIMARY KEY,
+    Offset INTEGER NOT NULL
+);
+"""
+
+INSERT_LOCAL_QUERY = """
+INSERT INTO FallEvents (CameraID, RiskAngle, Status, Timestamp, ExperimentID, Stage, ClipPath)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# local_fall_log.txt lines, with and without the stage:
+#   2026-01-28 15:21:27.600933 - CONFIRMED FALL - 86deg
+#   2026-01-28 15:21:27.600933 - CONFIRMED FALL (2s) - 86deg
+LEGACY_LINE = re.compile(r'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:\.\d+)?) - CONFIRMED FALL(?: \((\d+)s\))? - (-?\d+)deg\s*$')
+LEGACY_CAMERA_ID = "Cylinder_Cam_01"  # the single-camera monitor that wrote the text log
+
+# --by choices of summarize(): (FallEvents expression, EventHours expression)
+GROUP_COLUMNS = {
+    'camera': ('CameraID', 'CameraID'),
+    'experiment': ('ExperimentID', "NULLIF(ExperimentID, '')"),
+    'stage': ('Stage', 'NULLIF(Stage, -1)'),
+    'status': ('Status', 'Status'),
+    'day': ('substr(Timestamp, 1, 10)', 'substr(Hour, 1, 10)'),
+    'hour': ('substr(Timestamp, 1, 13)', 'Hour'),
+}
+
+
+def format_timestamp(ts):
+    """Fixed-width text timestamp, so string order is time order in the index."""
+    return ts.isoformat(sep=' ', timespec='microseconds')
+
+
+sqlite3.register_adapter(datetime.datetime, format_timestamp)
+
+
+def connect(path='fall_events.db', timeout=5.0):
+    """SQLite connection in WAL mode (readers never block the writer) with the schema created."""
+    conn = sqlite3.connect(path, timeout=timeout)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class LocalEventStore:
+    """
+    Local copy of every fall alert in a SQLite file, replacing the free-text
+    local_fall_log.txt.
+
+    Rows go through a BatchEventWriter, so log_event() only enqueues and the
+    writer thread inserts them in batches over its own connection. Queries
+    (see summarize() and the CLI) can run from other processes at the same
+    time thanks to WAL mode.
+    """
+
+    def __init__(self, path='fall_events.db', batch_size=50, flush_interval=1.0):
+        self.path = path
+        self.writer = BatchEventWriter(lambda: connect(path), query=INSERT_LOCAL_QUERY, batch_size=batch_size,
+                                       flush_interval=flush_interval, spool_path=path + '.spool.jsonl',
+                                       name='LOCAL', sink='local_log', flush_seconds=None)
+
+    def log_event(self, camera_id, angle, status, experiment_id=None, stage=None, clip_path=None):
+        self.writer.submit((camera_id, angle, status, datetime.datetime.now(), experiment_id,
+                            None if stage is None else int(stage), clip_path))
+
+    def close(self):
+        """Flushes pending events; call once on shutdown."""
+        self.writer.close()
+
+
+def import_legacy_log(conn, path, camera_id=LEGACY_CAMERA_ID, experiment_id=None):
+    """
+    Imports the CONFIRMED FALL lines of a legacy text log. Lines without a
+    stage get Stage NULL. Only the part of the file not imported before is
+    read, so running it again picks up just the new lines.
+    Returns (imported, skipped) line counts.
+    """
+    key = os.path.abspath(path)
+    row = conn.execute("SELECT Offset FROM ImportedLogs WHERE Path = ?", (key,)).fetchone()
+    offset = row[0] if row else 0
+    if offset > os.path.getsize(path):
+        offset = 0  # file was truncated / replaced
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b'\n') + 1  # a partly written last line waits for the next import
+
+    rows = []
+    skipped = 0
+    for line in data[:end].decode('utf-8', errors='replace').splitlines():
+        match = LEGACY_LINE.match(line)
+        if match is None:
+            skipped += bool(line.strip())
+            continue
+        ts, stage, angle = match.groups()
+        rows.append((camera_id, int(angle), 'FALL_CONFIRMED', datetime.datetime.fromisoformat(ts),
+                     experiment_id, None if stage is None else int(stage), None))
+    with conn:
+        conn.executemany(INSERT_LOCAL_QUERY, rows)
+        conn.execute("INSERT OR REPLACE INTO ImportedLogs (Path, Offset) VALUES (?, ?)", (key, offset + end))
+    return len(rows), skipped
+
+
+def parse_time(text, now=None):
+    """'7d', '12h', '30m' before now, or an ISO date / datetime."""
+    if text is None:
+        return None
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([dhm])', text.strip())
+    if match:
+        unit = {'d': 'days', 'h': 'hours', 'm': 'minutes'}[match.group(2)]
+        return (now or datetime.datetime.now()) - datetime.timedelta(**{unit: float(match.group(1))})
+    return datetime.datetime.fromisoformat(text)
+
+
+def _hour(ts):
+    return ts.strftime('%Y-%m-%d %H')
+
+
+def _filters(since=None, until=None, status=None, camera_id=None, experiment_id=None, column='Timestamp'):
+    clauses, params = [], []
+    if since is not None:
+        clauses.append(f"{column} >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append(f"{column} < ?")
+        params.append(until)
+    for column, value in (('Status', status), ('CameraID', camera_id), ('ExperimentID', experiment_id)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def summarize(conn, by=('camera', 'experiment'), since=None, until=None, status='FALL_CONFIRMED',
+              camera_id=None, experiment_id=None):
+    """
+    Event counts grouped by the GROUP_COLUMNS keys in `by`. Returns
+    (header, rows); each row is the group values followed by count, max
+    angle, first and last timestamp.
+
+    Whole hours inside [since, until) are read from the EventHours rollup;
+    only the partial hours at either end are aggregated from FallEvents.
+    """
+    raw = [GROUP_COLUMNS[b][0] for b in by]
+    hourly = [GROUP_COLUMNS[b][1] for b in by]
+    lo = None if since is None else since.replace(minute=0, second=0, microsecond=0)
+    if lo is not None and lo < since:
+        lo += datetime.timedelta(hours=1)
+    hi = None if until is None else until.replace(minute=0, second=0, microsecond=0)
+
+    parts = []  # (table, group expressions, aggregates, where, params)
+    aggregates = ['COUNT(*)', 'MAX(RiskAngle)', 'MIN(Timestamp)', 'MAX(Timestamp)']
+    if lo is not None and hi is not None and lo >= hi:
+        parts.append(('FallEvents', raw, aggregates, *_filters(since, until, status, camera_id, experiment_id)))
+    else:
+        if lo is not None and since < lo:
+            parts.append(('FallEvents', raw, aggregates, *_filters(since, lo, status, camera_id, experiment_id)))
+        if hi is not None and hi < until:
+            parts.append(('FallEvents', raw, aggregates, *_filters(hi, until, status, camera_id, experiment_id)))
+        parts.append(('EventHours', hourly, ['SUM(Events)', 'MAX(MaxAngle)', 'MIN(First)', 'MAX(Last)'],
+                      *_filters(None if lo is None else _hour(lo), None if hi is None else _hour(hi),
+                                status, camera_id, experiment_id, column='Hour')))
+
+    groups = {}
+    for table, columns, funcs, where, params in parts:
+        sql = f"SELECT {', '.join(columns + funcs)} FROM {table}{where}"
+        if columns:
+            sql += f" GROUP BY {', '.join(columns)}"
+        for row in conn.execute(sql, params):
+            key, (count, angle, first, last) = row[:len(columns)], row[len(columns):]
+            if not count:
+                continue  # total over no rows
+            if key in groups:
+                c, a, f, l = groups[key]
+                count, first, last = count + c, min(first, f), max(last, l)
+                angle = a if angle is None else angle if a is None else max(angle, a)
+            groups[key] = (count, angle, first, last)
+
+    header = list(by) + ['events', 'max_angle', 'first', 'last']
+    order = sorted(groups, key=lambda key: [(v is not None, v) for v in key])
+    return header, [key + groups[key] for key in order]
+
+
+def recent_events(conn, limit=20, since=None, until=None, status=None, camera_id=None, experiment_id=None):
+    """The newest `limit` events matching the filters. Returns (header, rows)."""
+    where, params = _filters(since, until, status, camera_id, experiment_id)
+    header = ['timestamp', 'camera', 'angle', 'status', 'experiment', 'stage', 'clip']
+    rows = conn.execute(f"SELECT Timestamp, CameraID, RiskAngle, Status, ExperimentID, Stage, ClipPath "
+                        f"FROM FallEvents{where} ORDER BY Timestamp DESC LIMIT ?", params + [limit]).fetchall()
+    return header, rows
+
+
+def print_table(header, rows):
+    cells = [header] + [["" if v is None else str(v) for v in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(header))]
+    for row in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)).rstrip())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fall event store: import legacy logs and query events")
+    parser.add_argument('--db', default='fall_events.db', help="SQLite file (default: fall_events.db)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    importer = commands.add_parser('import', help="Import legacy local_fall_log.txt files")
+    importer.add_argument('logs', nargs='+')
+    importer.add_argument('--camera', default=LEGACY_CAMERA_ID, help="CameraID for the imported rows")
+    importer.add_argument('--experiment', default=None, help="ExperimentID for the imported rows")
+
+    for name, text in (('summary', "Event counts per group"), ('events', "Newest events")):
+        query = commands.add_parser(name, help=text)
+        query.add_argument('--since', default=None, help="'7d', '12h', '30m' or an ISO date")
+        query.add_argument('--until', default=None, help="Same formats as --since")
+        query.add_argument('--camera', default=None)
+        query.add_argument('--experiment', default=None)
+        if name == 'summary':
+            query.add_argument('--by', default='camera,experiment',
+                               help=f"Comma-separated groups from {', '.join(GROUP_COLUMNS)} (empty for a total)")
+            query.add_argument('--status', default='FALL_CONFIRMED', help="'all' for every status")
+        else:
+            query.add_argument('--status', default='all')
+            query.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.command == 'import':
+        for path in args.logs:
+            imported, skipped = import_legacy_log(conn, path, args.camera, args.experiment)
+            print(f"[STORE] {path}: imported {imported} event(s), skipped {skipped} unrecognized line(s).")
+    else:
+        filters = dict(since=parse_time(args.since), until=parse_time(args.until),
+                       status=None if args.status == 'all' else args.status,
+                       camera_id=args.camera, experiment_id=args.experiment)
+        start = time.perf_counter()
+        if args.command == 'summary':
+            by = [b for b in args.by.split(',') if b]
+            unknown = [b for b in by if b not in GROUP_COLUMNS]
+            if unknown:
+                parser.error(f"unknown --by group(s): {', '.join(unknown)}")
+            header, rows = summarize(conn, by, **filters)
+        else:
+            header, rows = recent_events(conn, args.limit, **filters)
+        elapsed = time.perf_counter() - start
+        print_table(header, rows)
+        print(f"[STORE] {len(rows)} row(s) in {elapsed * 1000:.1f}ms")
+    conn.close()
@@ -0,0 +1,193 @@
+import numpy as np
+
+from tilt_filter import TiltFilter
+
+# Per-cylinder fall states
+STANDING = 0    # upright, no timer running
+FALLING = 1     # fall condition holding, first alert stage not reached yet
+CONFIRMED = 2   # at least one alert stage sent for this fall
+STATE_NAMES = ('STANDING', 'FALLING', 'CONFIRMED')
+
+# One cylinder with the default strip (IDs 0..98) and bottom marker 99
+DEFAULT_CYLINDERS = [{'name': 'Cylinder', 'first_id': 0, 'last_id': 98, 'bottom_id': 99}]
+
+
+class CylinderState:
+    """
+    Compact per-cylinder record. The smoothing window is a fixed ring with a
+    running sum, so each reading costs O(1) regardless of window size.
+    """
+    __slots__ = ('index', 'name', 'first_id', 'last_id', 'window', 'win_sum', 'win_count', 'win_pos',
+                 'frame_max', 'frame_readings', 'frame_bottom', 'frame_seen', 'state', 'fall_start',
+                 'next_stage', 'duration', 'log_angle', 'bottom', 'angle', 'confidence', 'filter')
+
+    def __init__(self, index, name, first_id, window, tilt_filter=None, last_id=None):
+        self.index = index
+        self.name = name
+        self.first_id = first_id
+        self.last_id = last_id
+        self.window = [0.0] * window
+        self.win_sum = 0.0
+        self.win_count = 0
+        self.win_pos = 0
+        self.frame_max = 0.0
+        self.frame_readings = 0
+        self.frame_bottom = False
+        self.frame_seen = False
+        self.state = STANDING
+        self.fall_start = None
+        self.next_stage = 0
+        self.duration = 0.0
+        self.log_angle = 0.0
+        self.bottom = False
+        self.angle = 0.0        # tilt used by the fall logic (filtered when a filter is set)
+        self.confidence = 0.0   # 1.0 = measured this frame, lower = predicted
+        self.filter = tilt_filter
+
+    def push(self, angle):
+        """Adds one tilt reading; returns the running average over the window."""
+        size = len(self.window)
+        if self.win_count == size:
+            self.win_sum -= self.window[self.win_pos]
+        else:
+            self.win_count += 1
+        self.window[self.win_pos] = angle
+        self.win_sum += angle
+        self.win_pos += 1
+        if self.win_pos == size:
+            self.win_pos = 0
+            # Re-sum once per lap so floating-point drift cannot accumulate
+            self.win_sum = sum(self.window[:self.win_count])
+        return self.win_sum / self.win_count
+
+
+class FallTracker:
+    """
+    Fall state for every cylinder seen by one camera.
+
+    cylinders: list of {'name', 'first_id', 'last_id', 'bottom_id'}; marker IDs
+    first_id..last_id belong to that cylinder's strip. Marker IDs are mapped
+    to cylinders through a lookup array, and only cylinders seen this frame
+    or currently falling are visited in step(), so per-frame cost grows with
+    the number of visible markers, not with the number of cylinders.
+
+    Per frame:  add_angle()/add_bottom() for each marker, then step(ts), which
+    returns the alerts due: [(CylinderState, threshold, log_angle), ...].
+
+    tilt_filter (True, or a dict of TiltFilter options) gives every cylinder
+    an alpha-beta filter: a falling cylinder whose markers drop out keeps its
+    predicted tilt (and bottom flag) for hold_s seconds instead of resetting
+    the fall timer, so short dropouts and reduced detection rates do not
+    restart the alert stages. obj.angle / obj.confidence expose the result.
+    """
+
+    def __init__(self, cylinders=None, window=5, threshold=45, stages=(2.0, 60.0, 600.0, 3600.0),
+                 max_marker_id=99, tilt_filter=None):
+        self.threshold = threshold
+        self.stages = tuple(stages)
+        self.objects = []
+        # id -> cylinder index (-1: not ours); bottom flag per id
+        self.id_map = np.full(max_marker_id + 1, -1, dtype=np.int32)
+        self.bottom_map = np.zeros(max_marker_id + 1, dtype=bool)
+
+        for i, cyl in enumerate(cylinders or DEFAULT_CYLINDERS):
+            ids = list(range(cyl['first_id'], cyl['last_id'] + 1))
+            if cyl.get('bottom_id') is not None:
+                ids.append(cyl['bottom_id'])
+                self.bottom_map[cyl['bottom_id']] = True
+            for marker_id in ids:
+                if self.id_map[marker_id] != -1:
+                    raise ValueError(f"Marker ID {marker_id} assigned to more than one cylinder")
+                self.id_map[marker_id] = i
+            self.objects.append(CylinderState(i, cyl.get('name', f"Cylinder_{i + 1}"),
+                                              cyl['first_id'], window, self._make_filter(tilt_filter),
+                                              cyl['last_id']))
+
+        self._touched = []
+        self._falling = set()
+
+    @staticmethod
+    def _make_filter(tilt_filter):
+        if not tilt_filter:
+            return None
+        return TiltFilter(**(tilt_filter if isinstance(tilt_filter, dict) else {}))
+
+    def lookup(self, marker_ids):
+        """Vectorized marker ID -> (cylinder index array, is_bottom array); -1 for unknown IDs."""
+        marker_ids = np.asarray(marker_ids).ravel()
+        valid = (marker_ids >= 0) & (marker_ids < self.id_map.size)
+        safe = np.where(valid, marker_ids, 0)
+        return np.where(valid, self.id_map[safe], -1), valid & self.bottom_map[safe]
+
+    def _touch(self, obj):
+        if not obj.frame_seen:
+            obj.frame_seen = True
+            self._touched.append(obj)
+
+    def add_angle(self, index, angle):
+        obj = self.objects[index]
+        self._touch(obj)
+        avg = obj.push(angle)
+        obj.frame_readings += 1
+        if avg > obj.frame_max:
+            obj.frame_max = avg
+        return avg
+
+    def add_bottom(self, index):
+        obj = self.objects[index]
+        self._touch(obj)
+        obj.frame_bottom = True
+
+    def step(self, ts):
+        """Advances every seen or falling cylinder to capture time ts and returns due alerts."""
+        alerts = []
+        visit = self._touched
+        for index in self._falling:
+            obj = self.objects[index]
+            if not obj.frame_seen:
+                visit.append(obj)
+
+        for obj in visit:
+            f = obj.filter
+            if f is None:
+                obj.angle = obj.frame_max
+                obj.confidence = 1.0 if obj.frame_seen else 0.0
+                obj.bottom = obj.frame_bottom
+            else:
+                if obj.frame_readings:
+                    obj.angle, obj.confidence = f.update(obj.frame_max, ts)
+                else:
+                    obj.angle, obj.confidence = f.predict(ts)
+                obj.bottom = f.bottom(obj.frame_bottom, ts)
+                if obj.frame_bottom:
+                    obj.confidence = 1.0
+
+            if obj.bottom or obj.angle > self.threshold:
+                if obj.state == STANDING:
+                    obj.state = FALLING
+                    obj.fall_start = ts
+                    obj.next_stage = 0
+                    self._falling.add(obj.index)
+                obj.duration = ts - obj.fall_start
+                obj.log_angle = 90.0 if obj.bottom else obj.angle
+                while obj.next_stage < len(self.stages) and obj.duration >= self.stages[obj.next_stage]:
+                    alerts.append((obj, self.stages[obj.next_stage], obj.log_angle))
+                    obj.next_stage += 1
+                    obj.state = CONFIRMED
+            elif obj.state != STANDING:
+                obj.state = STANDING
+                obj.fall_start = None
+                obj.duration = 0.0
+                self._falling.discard(obj.index)
+
+        self._touched = []
+        for obj in visit:
+            obj.frame_max = 0.0
+            obj.frame_readings = 0
+            obj.frame_bottom = False
+            obj.frame_seen = False
+        return alerts
+
+    def falling(self):
+        """Cylinders currently in FALLING or CONFIRMED state."""
+        return [self.objects[i] for i in self._falling]
@@ -0,0 +1,260 @@
+import cv2
+import cv2.aruco as aruco
+import numpy as np
+import os
+import time
+
+
+class FrameSource:
+    """
+    Base class for anything the detection loop can pull frames from.
+    read() returns (ok, frame, timestamp) where timestamp is the capture
+    time in seconds (wall clock for live cameras, media clock for replays).
+    fps is the nominal frame rate once opened (None if the source has none).
+    """
+    width = 640
+    height = 480
+    fps = None
+
+    def open(self):
+        return True
+
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class CameraSource(FrameSource):
+    """Live webcam (DirectShow first, then the default backend)."""
+
+    def __init__(self, index=0, width=640, height=480):
+        self.index = index
+        self.width = width
+        self.height = height
+        self.cap = None
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.index, cv2.CAP_DSHOW)
+        if not self.cap.isOpened():
+            self.cap = cv2.VideoCapture(self.index)
+            if not self.cap.isOpened():
+                print("[ERROR] Could not open webcam.")
+                return False
+
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or None  # as reported by the driver; 0 if unknown
+        return True
+
+    def read(self):
+        ret, frame = self.cap.read()
+        return ret, frame, time.time()
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class VideoFileSource(FrameSource):
+    """
+    Recorded video replay. Frames are returned as fast as they can be decoded
+    unless realtime=True, which paces them at the file's frame rate.
+    """
+
+    def __init__(self, path, loop=False, realtime=False):
+        self.path = path
+        self.loop = loop
+        self.realtime = realtime
+        self.cap = None
+        self.fps = 30.0
+        self._t0 = 0.0
+        self._offset = 0.0
+        self._index = 0
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            print(f"[ERROR] Could not open video file: {self.path}")
+            return False
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self._t0 = time.time()
+        return True
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop and self._index > 0:
+            self._offset += self._index / self.fps
+            self._index = 0
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        if not ret:
+            return False, None, None
+
+        # Media clock: frame index over fps is more reliable than POS_MSEC across backends
+        ts = self._t0 + self._offset + self._index / self.fps
+        self._index += 1
+        if self.realtime:
+            delay = ts - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        return True, frame, ts
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class ImageDirSource(FrameSource):
+    """Sorted directory of still images replayed as a clip at a fixed fps."""
+
+    EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+    def __init__(self, path, fps=30.0, loop=False):
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+        self.files = []
+        self._t0 = 0.0
+        self._index = 0
+
+    def open(self):
+        self.files = sorted(
+            os.path.join(self.path, f) for f in os.listdir(self.path)
+            if f.lower().endswith(self.EXTENSIONS)
+        )
+        if not self.files:
+            print(f"[ERROR] No images found in {self.path}")
+            return False
+        # Size from the first readable image; unreadable ones before it are skipped
+        for i, path in enumerate(self.files):
+            first = cv2.imread(path)
+            if first is not None:
+                break
+            print(f"[WARNING] Skipping unreadable image {path}")
+        else:
+            print(f"[ERROR] No readable images in {self.path}")
+            return False
+        self.files = self.files[i:]
+        self.height, self.width = first.shape[:2]
+        self._t0 = time.time()
+        return True
+
+    def read(self):
+        if self._index >= len(self.files) and not self.loop:
+            return False, None, None
+        frame = cv2.imread(self.files[self._index % len(self.files)])
+        ts = self._t0 + self._index / self.fps
+        self._index += 1
+        if frame is None:
+            return False, None, None
+        return True, frame, ts
+
+
+class SyntheticSource(FrameSource):
+    """
+    Generated frames for CI boxes without a camera or recordings.
+    A row of strip markers (IDs 0..N-1) is rotated in the image plane, sweeping
+    the tilt from upright to past the fall threshold and back, so the full
+    detection and alert path is exercised.
+    idle_s keeps the row upright (static) for that long before each sweep and
+    hold_s keeps it at max_tilt mid-sweep, for mostly-static footage;
+    noise adds Gaussian sensor noise with that standard deviation.
+    """
+
+    def __init__(self, num_frames=900, width=640, height=480, fps=30.0,
+                 num_markers=3, marker_px=90, period_s=10.0, max_tilt=80.0,
+                 idle_s=0.0, hold_s=0.0, noise=0.0):
+        self.num_frames = num_frames
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.num_markers = num_markers
+        self.marker_px = marker_px
+        self.period_s = period_s
+        self.max_tilt = max_tilt
+        self.idle_s = idle_s
+        self.hold_s = hold_s
+        self.noise = noise
+        self._rng = np.random.default_rng(0)
+        self._base = None
+        self._t0 = 0.0
+        self._index = 0
+
+    def open(self):
+        aruco_dict = aruco.getPredefinedDictionary(aruco.DICT_4X4_100)
+        gap = self.marker_px // 3
+        base = np.full((self.height, self.width, 3), 200, dtype=np.uint8)
+        row_w = self.num_markers * self.marker_px + (self.num_markers - 1) * gap
+        x = (self.width - row_w) // 2
+        y = (self.height - self.marker_px) // 2
+        for i in range(self.num_markers):
+            marker = aruco.generateImageMarker(aruco_dict, i, self.marker_px)
+            # White quiet zone so the marker border is always separable from the background
+            pad = self.marker_px // 8
+            base[y - pad:y + self.marker_px + pad, x - pad:x + self.marker_px + pad] = 255
+            base[y:y + self.marker_px, x:x + self.marker_px] = marker[:, :, None]
+            x += self.marker_px + gap
+        self._base = base
+        self._t0 = time.time()
+        return True
+
+    def tilt_at(self, t):
+        """Ground-truth in-plane tilt (degrees) at media time t."""
+        u = t % (self.idle_s + self.period_s + self.hold_s) - self.idle_s
+        half = self.period_s / 2.0
+        if u < 0:
+            return 0.0
+        if u < half:
+            return self.max_tilt * u / half
+        if u < half + self.hold_s:
+            return self.max_tilt
+        return self.max_tilt * max(0.0, 1.0 - (u - half - self.hold_s) / half)
+
+    def read(self):
+        if self.num_frames is not None and self._index >= self.num_frames:
+            return False, None, None
+        t = self._index / self.fps
+        center = (self.width / 2, self.height / 2)
+        M = cv2.getRotationMatrix2D(center, self.tilt_at(t), 1.0)
+        frame = cv2.warpAffine(self._base, M, (self.width, self.height),
+                               borderValue=(200, 200, 200))
+        if self.noise > 0:
+            noise = self._rng.normal(0.0, self.noise, frame.shape)
+            frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+        self._index += 1
+        return True, frame, self._t0 + t
+
+
+def open_source(spec, **kwargs):
+    """
+    Builds a FrameSource from a CLI-style spec:
+      0, "1"             -> CameraSource
+      "synthetic[:N]"    -> SyntheticSource with N frames
+      path to directory  -> ImageDirSource
+      path to a file     -> VideoFileSource
+    """
+    if isinstance(spec, FrameSource):
+        return spec
+    if spec is None:
+        spec = 0
+    if isinstance(spec, int) or str(spec).isdigit():
+        return CameraSource(int(spec), **kwargs)
+    if str(spec).startswith("synthetic"):
+        _, _, n = str(spec).partition(":")
+        if n:
+            kwargs.setdefault('num_frames', int(n))
+        return SyntheticSource(**kwargs)
+    if os.path.isdir(spec):
+        return ImageDirSource(spec, **kwargs)
+    return VideoFileSource(spec, **kwargs)
@@ -2,6 +2,16 @@ import cv2
 import cv2.aruco as aruco
 import numpy as np
 
+def bottom_marker_image(marker_id=99, marker_size_px=200, border_size=50):
+    """Bottom marker (DICT_4X4_100) with a white quiet zone, as printed by generate_bottom_marker()."""
+    aruco_dict = aruco.getPredefinedDictionary(aruco.DICT_4X4_100)
+    img = aruco.generateImageMarker(aruco_dict, marker_id, marker_size_px)
+    
+    # Add White Border (Quiet Zone)
+    img = cv2.copyMakeBorder(img, border_size, border_size, border_size, border_size, 
+                             cv2.BORDER_CONSTANT, value=255) # White
+    return img
+
 def generate_bottom_marker():
     """Generates the Bottom Marker (ID 99)."""
     # Define dictionary
@@ -19,14 +29,7 @@ def generate_bottom_marker():
     aruco_dict = aruco.getPredefinedDictionary(aruco.DICT_4X4_100)
     
     marker_id = 99
-    marker_size_px = 200
-    
-    img = aruco.generateImageMarker(aruco_dict, marker_id, marker_size_px)
-    
-    # Add White Border (Quiet Zone)
-    border_size = 50
-    img = cv2.copyMakeBorder(img, border_size, border_size, border_size, border_size, 
-                             cv2.BORDER_CONSTANT, value=255) # White
+    img = bottom_marker_image(marker_id)
 
     save_path = f"marker_bottom_id{marker_id}.png"
     cv2.imwrite(save_path, img)
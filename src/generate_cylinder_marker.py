@@ -1,15 +1,34 @@
+import functools
+
 import cv2
 import cv2.aruco as aruco
 import numpy as np
 
-def create_marker_strip(diameter_mm, marker_size_mm, dpi=300):
+# 띠 마커 사전. DICT_4X4_100 의 ID 0~49 비트맵은 DICT_4X4_50 과 동일하므로
+# 기존에 인쇄한 띠와 같은 이미지가 나오고, ID 98 까지 쓸 수 있습니다 (99 는 바닥 마커).
+STRIP_DICTIONARY = aruco.DICT_4X4_100
+MAX_STRIP_ID = 98
+
+@functools.lru_cache(maxsize=4096)
+def marker_bitmap(dictionary, marker_id, side_px):
     """
-    원통의 지름에 맞춰 ArUco 마커 띠를 생성하는 함수
-    :param diameter_mm: 원통의 지름 (밀리미터)
-    :param marker_size_mm: 개별 마커의 한 변 길이 (밀리미터)
-    :param dpi: 인쇄 해상도 (보통 300)
+    (사전, ID, 픽셀 크기) 별로 한 번만 생성하는 마커 비트맵 (프로세스 단위 캐시).
+    공유되는 배열이므로 읽기 전용입니다.
+    """
+    marker = aruco.generateImageMarker(aruco.getPredefinedDictionary(dictionary), marker_id, side_px, borderBits=1)
+    marker.setflags(write=False)
+    return marker
+
+def default_marker_size(diameter_mm):
+    """기본 마커 크기 15mm, 지름 40mm 미만의 얇은 원통은 10mm"""
+    return 10 if diameter_mm < 40 else 15
+
+def strip_layout(diameter_mm, marker_size_mm):
+    """
+    띠의 물리적 배치 계산 (검출 쪽 cylinder_pose 에서도 사용)
+    :return: (원주 mm, 마커 개수, 마커 사이 간격 mm)
+    마커 i 의 왼쪽 끝 위치는 gap/2 + i * (marker_size + gap) 입니다.
     """
-    # 1. 물리적 수치 계산
     circumference_mm = np.pi * diameter_mm
     
     # 마커 사이의 최소 간격 (마커 크기의 20%로 설정)
@@ -19,47 +38,61 @@ def create_marker_strip(diameter_mm, marker_size_mm, dpi=300):
     # (마커크기 + 간격) * 개수 <= 원주
     num_markers = int(circumference_mm / (marker_size_mm + min_gap_mm))
     
-    if num_markers < 3:
-        print("경고: 원통이 너무 얇거나 마커가 너무 큽니다. 최소 3개 이상의 마커가 권장됩니다.")
-    
     # 실제 적용될 간격 재계산 (남는 공간을 균등 분배)
     total_gap_mm = circumference_mm - (num_markers * marker_size_mm)
     gap_mm = total_gap_mm / num_markers
-    
-    print(f"설계 정보: 지름 {diameter_mm}mm 원통에 {marker_size_mm}mm 마커 {num_markers}개를 배치합니다.")
-    print(f"마커 간격: {gap_mm:.2f}mm")
+    return circumference_mm, num_markers, gap_mm
 
-    # 2. 픽셀 단위 변환 (mm -> pixel)
+def strip_geometry(diameter_mm, marker_size_mm, dpi=300):
+    """
+    띠 이미지의 픽셀 배치
+    :return: (마커 개수, 마커 px, 마커 간 보폭 px, 첫 마커 x, 마커 y, 띠 폭 px, 띠 높이 px)
+    """
+    circumference_mm, num_markers, gap_mm = strip_layout(diameter_mm, marker_size_mm)
     mm_to_px = dpi / 25.4
     marker_px = int(marker_size_mm * mm_to_px)
     gap_px = int(gap_mm * mm_to_px)
     strip_width_px = int(circumference_mm * mm_to_px)
     strip_height_px = int((marker_size_mm + 10) * mm_to_px) # 위아래 여백 5mm씩
+    return (num_markers, marker_px, marker_px + gap_px, gap_px // 2, (strip_height_px - marker_px) // 2,
+            strip_width_px, strip_height_px)
 
-    # 3. 빈 이미지 생성 (흰색 배경)
-    strip_img = np.ones((strip_height_px, strip_width_px), dtype=np.uint8) * 255
-    
-    # ArUco 사전 로드
-    aruco_dict = aruco.getPredefinedDictionary(aruco.DICT_4X4_50)
+def render_strip(diameter_mm, marker_size_mm, dpi=300, first_id=0, dictionary=STRIP_DICTIONARY):
+    """
+    create_marker_strip 과 같은 띠 이미지를 출력 없이 생성 (배치 생성용).
+    마커는 캐시된 비트맵을 쓰고, 전체 마커를 한 번의 NumPy 대입으로 붙입니다.
+    """
+    num_markers, marker_px, stride, x0, y0, width, height = strip_geometry(diameter_mm, marker_size_mm, dpi)
+    if first_id + num_markers - 1 > MAX_STRIP_ID:
+        raise ValueError(f"마커 ID {first_id}~{first_id + num_markers - 1} 가 {MAX_STRIP_ID} 를 넘습니다 "
+                         f"(지름 {diameter_mm}mm, 마커 {marker_size_mm}mm).")
+    markers = np.stack([marker_bitmap(dictionary, first_id + i, marker_px) for i in range(num_markers)])
+
+    # 마지막 간격이 띠 끝을 넘을 수 있으므로 여유 폭을 두고 그린 뒤 자릅니다
+    canvas = np.full((height, max(width, x0 + num_markers * stride)), 255, dtype=np.uint8)
+    # 마커 행 영역을 (행, 마커, 보폭) 칸으로 보고 모든 마커를 한 번에 대입
+    band = canvas[y0:y0 + marker_px, x0:x0 + num_markers * stride].reshape(marker_px, num_markers, stride)
+    band[:, :, :marker_px] = markers.transpose(1, 0, 2)
+    return canvas[:, :width]
+
+def create_marker_strip(diameter_mm, marker_size_mm, dpi=300):
+    """
+    원통의 지름에 맞춰 ArUco 마커 띠를 생성하는 함수
+    :param diameter_mm: 원통의 지름 (밀리미터)
+    :param marker_size_mm: 개별 마커의 한 변 길이 (밀리미터)
+    :param dpi: 인쇄 해상도 (보통 300)
+    """
+    # 1. 물리적 수치 계산
+    circumference_mm, num_markers, gap_mm = strip_layout(diameter_mm, marker_size_mm)
     
-    # 4. 마커 생성 및 배치
-    current_x = gap_px // 2 # 첫 번째 마커 시작 위치 (간격의 절반)
+    if num_markers < 3:
+        print("경고: 원통이 너무 얇거나 마커가 너무 큽니다. 최소 3개 이상의 마커가 권장됩니다.")
     
-    # 상하 중앙 정렬을 위한 Y 좌표
-    y_offset = (strip_height_px - marker_px) // 2
+    print(f"설계 정보: 지름 {diameter_mm}mm 원통에 {marker_size_mm}mm 마커 {num_markers}개를 배치합니다.")
+    print(f"마커 간격: {gap_mm:.2f}mm")
 
-    for i in range(num_markers):
-        # 마커 이미지 생성 (ID는 0부터 순차 증가)
-        # borderBits=1 은 마커 테두리 두께
-        marker = aruco.generateImageMarker(aruco_dict, id=i, sidePixels=marker_px, borderBits=1)
-        
-        # 띠 이미지에 마커 붙여넣기
-        strip_img[y_offset : y_offset+marker_px, current_x : current_x+marker_px] = marker
-        
-        # 다음 위치로 이동
-        current_x += marker_px + gap_px
-        
-    return strip_img
+    # 2. 캐시된 마커 비트맵으로 띠 이미지 생성 (ID는 0부터 순차 증가)
+    return render_strip(diameter_mm, marker_size_mm, dpi)
 
 if __name__ == "__main__":
     # --- 실행 설정 ---
@@ -70,9 +103,7 @@ if __name__ == "__main__":
         
         # 마커 크기는 지름의 약 25% 정도로 자동 제안하거나 입력받을 수 있음.
         # 여기서는 기본값 15mm 사용하되, 지름이 너무 작으면 줄임.
-        default_size = 15
-        if CYLINDER_DIAMETER < 40:
-             default_size = 10
+        default_size = default_marker_size(CYLINDER_DIAMETER)
         
         size_input = input(f"마커 한 변의 크기를 입력하세요 (mm단위, 엔터치면 기본값 {default_size}mm): ")
         if size_input.strip() == "":
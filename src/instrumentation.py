@@ -0,0 +1,253 @@
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets (seconds): sub-millisecond stages up to slow DB / webhook round trips
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=(), registry=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()  # exported as 0 before the first update
+        (REGISTRY if registry is None else registry).register(self)
+
+    def labels(self, *values, **kwargs):
+        """Child for one label set. Call sites on hot paths should keep the child."""
+        if kwargs:
+            values = tuple(kwargs[n] for n in self.labelnames)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonic count, optionally per label set (Prometheus 'counter')."""
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _samples(self):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+                for values, child in sorted(self._children.items())]
+
+
+class Gauge(_Metric):
+    """Current value read at scrape time from fn() (e.g. a queue depth), or set()."""
+    kind = 'gauge'
+
+    def __init__(self, name, help, fn=None, registry=None):
+        super().__init__(name, help, (), registry)
+        self.fn = fn
+        self.value = 0.0
+
+    def _new_child(self):
+        return None
+
+    def set(self, value):
+        self.value = value
+
+    def _samples(self):
+        value = self.value
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception:
+                return []
+        if value is None:
+            return []
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot: +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket latency histogram (Prometheus 'histogram'). observe() is a
+    bisect plus two additions under an uncontended lock, so it is cheap
+    enough for every frame; quantiles are computed by the scraper.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self, *label_values):
+        """Context manager observing the duration of its block."""
+        return _HistogramTimer(self.labels(*label_values))
+
+    def _samples(self):
+        lines = []
+        for values, child in sorted(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, values, [f'le="{_format_value(bound)}"'])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _HistogramTimer:
+    __slots__ = ('child', '_start')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        return "\n".join(m.render() for m in self.metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- Detection loop ---
+STAGE_SECONDS = Histogram('fall_stage_seconds', "Time per frame spent in each detection loop stage.",
+                          ['stage'])
+FRAMES = Counter('fall_frames_total', "Frames processed by the detector.")
+FRAMES_DROPPED = Counter('fall_frames_dropped_total', "Frames discarded by a pipeline queue.", ['queue'])
+MARKERS = Counter('fall_markers_detected_total', "ArUco markers detected, summed over frames.")
+
+# --- Alert path ---
+ALERTS = Counter('fall_alerts_total', "Fall alerts fired, per notification stage (seconds).", ['threshold'])
+SINK_SECONDS = Histogram('fall_sink_seconds',
+                         "Time the alert path spends handing an alert to each sink (local log, DB queue, "
+                         "webhook queue).", ['sink'])
+SINK_FAILURES = Counter('fall_sink_failures_total', "Failures per alert sink and reason.", ['sink', 'reason'])
+DB_FLUSH_SECONDS = Histogram('fall_db_flush_seconds', "Submit-to-commit latency of DB event rows.")
+WEBHOOK_SECONDS = Histogram('fall_webhook_request_seconds', "Logic App webhook HTTP round trip.", ['outcome'])
+
+# --- Process (set by process_metrics.MetricsSampler) ---
+RSS_BYTES = Gauge('fall_process_resident_memory_bytes', "Resident set size of the monitor process.")
+THREADS = Gauge('fall_process_threads', "Threads in the monitor process.")
+STARTUP_SECONDS = Gauge('fall_startup_seconds', "Seconds from monitor start to the first processed frame.")
+
+# --- Live status stream (set by status_stream.StatusServer) ---
+STATUS_SUBSCRIBERS = Gauge('fall_status_subscribers', "Clients connected to the live status / preview streams.")
+STATUS_DROPPED = Counter('fall_status_dropped_total',
+                         "Status stream clients disconnected for not reading within the stall timeout.")
+
+
+class MetricsServer:
+    """Serves REGISTRY on http://host:port/metrics from a daemon thread."""
+
+    def __init__(self, port=9108, host='127.0.0.1', registry=None):
+        registry = registry or REGISTRY
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        print(f"[INFO] Metrics on http://{self.httpd.server_address[0]}:{self.port}/metrics")
+        return self
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,326 @@
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import struct
+import tempfile
+import time
+import zlib
+
+import cv2
+import numpy as np
+
+from generate_cylinder_marker import (MAX_STRIP_ID, STRIP_DICTIONARY, default_marker_size, marker_bitmap,
+                                      render_strip, strip_geometry)
+
+BOTTOM_MARKER_ID = 99
+BOTTOM_MAX_MM = 100.0  # printed bottom marker side (with quiet zone) is 0.65 x diameter, at most this
+PAGE_SIZES = {'A4': (210.0, 297.0), 'A3': (297.0, 420.0), 'Letter': (215.9, 279.4)}
+MARGIN_MM = 10.0
+SPACING_MM = 4.0  # between pieces, room to cut
+LABEL_MM = 3.5
+FOOTER_MM = 8.0
+SCALE_BAR_MM = 50.0
+
+
+def _latin1(text):
+    return str(text).encode('latin-1', 'replace').decode('latin-1')
+
+
+def _column(row, key, cast, default):
+    """An optional column: missing or empty (not 0) gives the default."""
+    value = row.get(key)
+    return default if value is None or value == '' else cast(value)
+
+
+def load_cylinders(path):
+    """
+    Reads the cylinders to outfit from a CSV (header row) or JSON list of
+    objects with diameter_mm and optional name, marker_size_mm (default as in
+    the interactive generator), count (copies, default 1), first_id (ID of
+    the first strip marker, default 0) and bottom_id (default 99), matching
+    the detector's --cylinders ranges.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = json.load(f) if path.lower().endswith('.json') else list(csv.DictReader(f))
+    cylinders = []
+    for line, row in enumerate(rows, 1):
+        try:
+            diameter = float(row['diameter_mm'])
+            size = _column(row, 'marker_size_mm', float, None)
+            size = default_marker_size(diameter) if size is None else size
+            count = _column(row, 'count', int, 1)
+            first_id = _column(row, 'first_id', int, 0)
+            bottom_id = _column(row, 'bottom_id', int, BOTTOM_MARKER_ID)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"{path}: row {line}: {e}") from None
+        name = row.get('name') or f"D{diameter:g}"
+        for copy in range(count):
+            cylinders.append(cylinder(diameter, size, f"{name}-{copy + 1}" if count > 1 else name, first_id,
+                                      bottom_id))
+    return cylinders
+
+
+def cylinder(diameter_mm, marker_size_mm=None, name=None, first_id=0, bottom_id=BOTTOM_MARKER_ID):
+    """One cylinder to outfit, validated so a bad row fails before any rendering."""
+    if marker_size_mm is None:
+        marker_size_mm = default_marker_size(diameter_mm)
+    if diameter_mm <= 0 or marker_size_mm <= 0 or diameter_mm * 3.14159 < marker_size_mm * 1.2:
+        raise ValueError(f"{name or diameter_mm}: no {marker_size_mm}mm marker fits a {diameter_mm}mm diameter")
+    num_markers = strip_geometry(diameter_mm, marker_size_mm)[0]
+    if first_id < 0 or first_id + num_markers - 1 > MAX_STRIP_ID:
+        raise ValueError(f"{name or diameter_mm}: strip IDs {first_id}-{first_id + num_markers - 1} "
+                         f"are outside 0-{MAX_STRIP_ID}")
+    if not 0 <= bottom_id <= BOTTOM_MARKER_ID or first_id <= bottom_id < first_id + num_markers:
+        raise ValueError(f"{name or diameter_mm}: bottom ID {bottom_id} is not a free 4x4_100 ID")
+    return {'name': name or f"D{diameter_mm:g}", 'diameter_mm': float(diameter_mm),
+            'marker_size_mm': float(marker_size_mm), 'first_id': first_id, 'bottom_id': bottom_id,
+            'markers': num_markers}
+
+
+def bottom_size_mm(diameter_mm):
+    """Printed side (quiet zone included) of a bottom marker that fits inside the cylinder's base."""
+    return min(0.65 * diameter_mm, BOTTOM_MAX_MM)
+
+
+def split_points(width_px, num_markers, marker_px, stride, x0, max_px):
+    """
+    Where to cut a strip wider than the page: in the middle of the gaps
+    between markers, so pieces taped end to end keep the spacing.
+    """
+    gaps = [x0 + i * stride + marker_px + (stride - marker_px) // 2 for i in range(num_markers - 1)]
+    cuts = [0]
+    while width_px - cuts[-1] > max_px:
+        fit = [c for c in gaps if cuts[-1] < c <= cuts[-1] + max_px]
+        if not fit:
+            raise ValueError(f"a {marker_px}px marker is wider than the printable page")
+        cuts.append(fit[-1])
+    return cuts + [width_px]
+
+
+def write_bilevel_png(path, img, level=6):
+    """
+    Writes a black/white image as a 1-bit PNG with no row filters. Markers
+    need nothing more, and skipping imwrite's 8-bit filter search makes this
+    about 10x faster with smaller files; fpdf embeds the data as is.
+    """
+    h, w = img.shape
+    rows = np.packbits(img > 127, axis=1)
+    raw = np.hstack([np.zeros((h, 1), np.uint8), rows]).tobytes()  # filter byte 0 per row
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', w, h, 1, 0, 0, 0, 0))
+                + chunk(b'IDAT', zlib.compress(raw, level)) + chunk(b'IEND', b''))
+
+
+def render_job(job):
+    """
+    Renders one unique strip or bottom marker and writes it as PNG piece(s)
+    no wider than max_px. Runs in pool workers; each keeps its own bitmap cache.
+    Returns (key, [(path, width_px, height_px), ...]).
+    """
+    key, out_dir, max_px = job
+    if key[0] == 'bottom':
+        _, bottom_id, side_px, dpi = key
+        marker_px = round(side_px / 1.5)  # quiet zone of a quarter marker on each side, as generate_bottom_marker
+        border = (side_px - marker_px) // 2
+        img = cv2.copyMakeBorder(marker_bitmap(STRIP_DICTIONARY, bottom_id, marker_px),
+                                 border, border, border, border, cv2.BORDER_CONSTANT, value=255)
+        cuts = [0, img.shape[1]]
+    else:
+        _, diameter, size, first_id, dpi = key
+        img = render_strip(diameter, size, dpi, first_id)
+        num_markers, marker_px, stride, x0, _, width, _ = strip_geometry(diameter, size, dpi)
+        cuts = split_points(width, num_markers, marker_px, stride, x0, max_px)
+    stem = "_".join(f"{v:g}" if isinstance(v, float) else str(v) for v in key)
+    pieces = []
+    for i, (a, b) in enumerate(zip(cuts, cuts[1:])):
+        path = os.path.join(out_dir, f"{stem}_{i}.png")
+        write_bilevel_png(path, img[:, a:b])
+        pieces.append((path, b - a, img.shape[0]))
+    return key, pieces
+
+
+def render_all(keys, out_dir, max_px, workers=1):
+    """Renders every unique key, across a process pool when workers > 1."""
+    jobs = [(key, out_dir, max_px) for key in keys]
+    if workers <= 1:
+        return dict(map(render_job, jobs))
+    with mp.get_context().Pool(workers) as pool:
+        return dict(pool.imap_unordered(render_job, jobs, chunksize=max(1, len(jobs) // (workers * 8))))
+
+
+def shelf_pack(items, width, height):
+    """
+    Places (w, h) boxes in order, left to right in rows, rows top to bottom,
+    starting a new page when a row does not fit. Returns pages of (x, y, index).
+    """
+    pages, page = [], []
+    x = y = row_h = 0.0
+    for i, (w, h) in enumerate(items):
+        if w > width or h > height:
+            raise ValueError(f"a {w:.0f}x{h:.0f}mm piece does not fit a {width:.0f}x{height:.0f}mm page")
+        if x > 0 and x + w > width:
+            x, y, row_h = 0.0, y + row_h + SPACING_MM, 0.0
+        if y + h > height:
+            pages.append(page)
+            page, x, y, row_h = [], 0.0, 0.0, 0.0
+        page.append((x, y, i))
+        x += w + SPACING_MM
+        row_h = max(row_h, h)
+    if page:
+        pages.append(page)
+    return pages
+
+
+def _start_page(pdf, page_w, page_h, number):
+    pdf.add_page()
+    pdf.set_font('Helvetica', '', 7)
+    pdf.set_text_color(0)
+    pdf.set_draw_color(0)
+    pdf.set_line_width(0.3)
+    # Scale check: measure this bar after printing
+    y = page_h - MARGIN_MM + 1.0
+    pdf.line(MARGIN_MM, y, MARGIN_MM + SCALE_BAR_MM, y)
+    for x in (MARGIN_MM, MARGIN_MM + SCALE_BAR_MM):
+        pdf.line(x, y - 1.5, x, y + 1.5)
+    pdf.text(MARGIN_MM + SCALE_BAR_MM + 3.0, y + 1.0,
+             f"= {SCALE_BAR_MM:g} mm. Print at 100% / actual size, no fit-to-page. Page {number}")
+
+
+def write_pdfs(placed, pieces, out_dir, prefix, page_size, landscape, max_pages):
+    """
+    Draws the packed pages into PDFs of at most max_pages pages each. Images
+    are placed at their physical size (px / dpi), and fpdf embeds a repeated
+    image once, so identical cylinders cost no extra file size.
+    """
+    from fpdf import FPDF
+
+    short, long_ = PAGE_SIZES[page_size]
+    page_w, page_h = (long_, short) if landscape else (short, long_)
+    paths = []
+    pdf = None
+    for number, page in enumerate(placed, 1):
+        if pdf is None:
+            pdf = FPDF('L' if landscape else 'P', 'mm', (short, long_))
+            pdf.set_auto_page_break(False)
+            pdf.set_title(_latin1(prefix))
+            first_page = number
+        _start_page(pdf, page_w, page_h, number)
+        for x, y, index in page:
+            path, w, h, label = pieces[index]
+            x += MARGIN_MM
+            y += MARGIN_MM
+            pdf.set_draw_color(170)
+            pdf.set_line_width(0.1)
+            pdf.text(x, y + LABEL_MM - 1.0, _latin1(label))
+            pdf.image(path, x, y + LABEL_MM, w, h)
+            pdf.rect(x, y + LABEL_MM, w, h)  # cut line
+        if number - first_page + 1 == max_pages or number == len(placed):
+            path = os.path.join(out_dir, f"{prefix}_{len(paths) + 1:03d}.pdf")
+            pdf.output(path, 'F')
+            paths.append(path)
+            pdf = None
+    return paths
+
+
+def build_sheets(cylinders, out_dir, dpi=300, page_size='A4', landscape=True, workers=1, max_pages=200,
+                 prefix='marker_sheets', png_dir=None):
+    """
+    Renders strips and bottom markers for `cylinders` (see cylinder()) and
+    packs them into print-ready PDFs in out_dir. Each unique (diameter,
+    marker size, first ID) strip and bottom marker size is rendered once;
+    strips wider than the page are split between markers. PNG pieces go to
+    png_dir (kept) or a temporary directory. Returns the PDF paths and timings.
+    """
+    short, long_ = PAGE_SIZES[page_size]
+    page_w, page_h = (long_, short) if landscape else (short, long_)
+    usable_w = page_w - 2 * MARGIN_MM
+    usable_h = page_h - 2 * MARGIN_MM - FOOTER_MM
+    os.makedirs(out_dir, exist_ok=True)
+    scratch = None
+    if png_dir is None:
+        scratch = tempfile.TemporaryDirectory()
+        png_dir = scratch.name
+    else:
+        os.makedirs(png_dir, exist_ok=True)
+
+    mm = 25.4 / dpi
+    strip_key = lambda c: ('strip', c['diameter_mm'], c['marker_size_mm'], c['first_id'], dpi)
+    bottom_key = lambda c: ('bottom', c['bottom_id'], int(bottom_size_mm(c['diameter_mm']) / mm), dpi)
+    keys = list(dict.fromkeys([strip_key(c) for c in cylinders] + [bottom_key(c) for c in cylinders]))
+    try:
+        start = time.perf_counter()
+        rendered = render_all(keys, png_dir, int(usable_w / mm), workers)
+        render_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        # Strips first in input order (pieces of one strip stay together), then the bottom markers
+        pieces = []
+        for c in cylinders:
+            parts = rendered[strip_key(c)]
+            last_id = c['first_id'] + c['markers'] - 1
+            for i, (path, w, h) in enumerate(parts, 1):
+                part = f" [{i}/{len(parts)}]" if len(parts) > 1 else ""
+                pieces.append((path, w * mm, h * mm, f"{c['name']}  D{c['diameter_mm']:g}mm  "
+                               f"{c['marker_size_mm']:g}mm IDs {c['first_id']}-{last_id}{part}"))
+        for c in cylinders:
+            path, w, h = rendered[bottom_key(c)][0]
+            pieces.append((path, w * mm, h * mm, f"{c['name']} bottom ID {c['bottom_id']}"))
+        placed = shelf_pack([(w, h + LABEL_MM) for _, w, h, _ in pieces], usable_w, usable_h)
+        paths = write_pdfs(placed, pieces, out_dir, prefix, page_size, landscape, max_pages)
+        pdf_s = time.perf_counter() - start
+    finally:
+        if scratch is not None:
+            scratch.cleanup()
+    return {
+        'paths': paths,
+        'cylinders': len(cylinders),
+        'strips': sum(k[0] == 'strip' for k in keys),
+        'bottoms': sum(k[0] == 'bottom' for k in keys),
+        'pieces': len(pieces),
+        'pages': len(placed),
+        'render_s': render_s,
+        'pdf_s': pdf_s,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch-generate printable marker strip and bottom marker sheets")
+    parser.add_argument('cylinders', nargs='?', help="CSV or JSON list: name, diameter_mm, marker_size_mm, "
+                                                     "count, first_id, bottom_id")
+    parser.add_argument('--diameters', help="Comma-separated diameters (mm), instead of a list file")
+    parser.add_argument('--marker-size', type=float, default=None, help="Marker side (mm) for --diameters")
+    parser.add_argument('--out', default='marker_sheets', help="Output directory for the PDFs")
+    parser.add_argument('--prefix', default='marker_sheets', help="PDF file name prefix")
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--page', choices=sorted(PAGE_SIZES), default='A4')
+    parser.add_argument('--portrait', action='store_true', help="Portrait pages (default landscape)")
+    parser.add_argument('--max-pages', type=int, default=200, help="Pages per PDF file")
+    parser.add_argument('--workers', type=int, default=None, help="Render processes (default: one per core)")
+    parser.add_argument('--png-dir', default=None, help="Also keep the rendered PNG pieces here")
+    args = parser.parse_args()
+
+    if args.diameters:
+        cylinders = [cylinder(float(d), args.marker_size) for d in args.diameters.split(',')]
+    elif args.cylinders:
+        cylinders = load_cylinders(args.cylinders)
+    else:
+        parser.error("give a cylinder list file or --diameters")
+    start = time.perf_counter()
+    result = build_sheets(cylinders, args.out, dpi=args.dpi, page_size=args.page, landscape=not args.portrait,
+                          workers=args.workers or os.cpu_count() or 1, max_pages=args.max_pages,
+                          prefix=args.prefix, png_dir=args.png_dir)
+    elapsed = time.perf_counter() - start
+    few = sum(c['markers'] < 3 for c in cylinders)
+    if few:
+        print(f"[WARN] {few} cylinder(s) get fewer than 3 markers; a smaller marker size is recommended.")
+    print(f"[SHEETS] {result['cylinders']} cylinders: {result['strips']} unique strips, {result['bottoms']} bottom "
+          f"markers, {result['pieces']} pieces on {result['pages']} pages in {elapsed:.1f}s "
+          f"(render {result['render_s']:.1f}s, PDF {result['pdf_s']:.1f}s)")
+    for path in result['paths']:
+        print(f"[SUCCESS] {path}")
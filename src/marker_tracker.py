@@ -0,0 +1,92 @@
+import cv2
+import cv2.aruco as aruco
+import numpy as np
+
+
+class MarkerTracker:
+    """
+    Drop-in replacement for aruco.detectMarkers on a video stream.
+
+    After a successful detection only a padded region of interest around the
+    previous frame's marker corners is searched; corners found in the ROI are
+    shifted back to full-frame coordinates. A full-frame rescan runs every
+    `rescan_interval` frames (to pick up markers that entered elsewhere, such
+    as the bottom marker) and immediately whenever the ROI comes back empty.
+
+    pyramid_levels > 0 searches a cv2.pyrDown'd copy of the frame first on
+    full scans; markers found there only seed the ROI, and the final corners
+    always come from the full-resolution image so pose accuracy is unchanged.
+    """
+
+    def __init__(self, aruco_dict, parameters, pad=0.5, min_pad_px=16, rescan_interval=15,
+                 pyramid_levels=0):
+        self.aruco_dict = aruco_dict
+        self.parameters = parameters
+        self.pad = pad
+        self.min_pad_px = min_pad_px
+        self.rescan_interval = rescan_interval
+        self.pyramid_levels = pyramid_levels
+        self.roi = None
+        self._since_scan = 0
+        self.stats = {'full': 0, 'roi': 0, 'pyramid': 0, 'lost': 0}
+
+    def reset(self):
+        self.roi = None
+
+    def detect(self, gray):
+        """Returns (corners, ids, rejected) like aruco.detectMarkers, in full-frame coordinates."""
+        self._since_scan += 1
+        if self.roi is not None and self._since_scan < self.rescan_interval:
+            corners, ids, rejected = self._detect_roi(gray, self.roi)
+            if ids is not None:
+                self.stats['roi'] += 1
+                self.roi = self._roi_from(corners, gray.shape)
+                return corners, ids, rejected
+            self.stats['lost'] += 1
+
+        self._since_scan = 0
+        corners, ids, rejected = None, None, None
+        if self.pyramid_levels > 0:
+            seed = self._detect_pyramid(gray)
+            if seed is not None:
+                self.stats['pyramid'] += 1
+                corners, ids, rejected = self._detect_roi(gray, self._roi_from(seed, gray.shape))
+        if ids is None:
+            self.stats['full'] += 1
+            corners, ids, rejected = aruco.detectMarkers(gray, self.aruco_dict, parameters=self.parameters)
+
+        self.roi = self._roi_from(corners, gray.shape) if ids is not None else None
+        return corners, ids, rejected
+
+    def _detect_roi(self, gray, roi):
+        x0, y0, x1, y1 = roi
+        corners, ids, rejected = aruco.detectMarkers(gray[y0:y1, x0:x1], self.aruco_dict,
+                                                     parameters=self.parameters)
+        if x0 or y0:
+            offset = np.array([x0, y0], dtype=np.float32)
+            corners = tuple(c + offset for c in corners)
+            rejected = tuple(r + offset for r in rejected)
+        return corners, ids, rejected
+
+    def _detect_pyramid(self, gray):
+        small = gray
+        for _ in range(self.pyramid_levels):
+            small = cv2.pyrDown(small)
+        corners, ids, _ = aruco.detectMarkers(small, self.aruco_dict, parameters=self.parameters)
+        if ids is None:
+            return None
+        scale = float(2 ** self.pyramid_levels)
+        return tuple(c * scale for c in corners)
+
+    def _roi_from(self, corners, shape):
+        pts = np.concatenate([c.reshape(-1, 2) for c in corners])
+        x_min, y_min = pts.min(axis=0)
+        x_max, y_max = pts.max(axis=0)
+        pad_x = max(self.min_pad_px, self.pad * (x_max - x_min))
+        pad_y = max(self.min_pad_px, self.pad * (y_max - y_min))
+        h, w = shape[:2]
+        x0 = max(0, int(x_min - pad_x))
+        y0 = max(0, int(y_min - pad_y))
+        x1 = min(w, int(np.ceil(x_max + pad_x)))
+        y1 = min(h, int(np.ceil(y_max + pad_y)))
+        return x0, y0, x1, y1
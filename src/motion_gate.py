@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Decides per frame whether marker detection has to run, from a small
+    grayscale thumbnail of the frame.
+
+    The thumbnail is compared with the one taken at the last detection (not
+    the previous frame, so slow drift still adds up). Detection runs when:
+      - more than min_changed (fraction) of thumbnail pixels differ by more
+        than pixel_threshold gray levels (motion, lighting change),
+      - motion was seen within the last active_hold seconds (full rate while
+        something moves, so no frame of a fall is skipped), or
+      - 1 / min_rate seconds passed since the last detection (refresh).
+    Otherwise the caller reuses the previous detection result.
+    Timestamps are capture times, like the fall timers.
+    """
+
+    def __init__(self, thumb_width=80, pixel_threshold=10, min_changed=0.002, min_rate=1.0,
+                 active_hold=1.0):
+        self.thumb_width = thumb_width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.max_interval = 1.0 / min_rate if min_rate > 0 else float('inf')
+        self.active_hold = active_hold
+        self._reference = None
+        self._last_detect = None
+        self._last_motion = None
+        self._diff = None
+        self.stats = {'motion': 0, 'active': 0, 'refresh': 0, 'skipped': 0}
+
+    def reset(self):
+        self._reference = None
+
+    def _thumbnail(self, frame):
+        h, w = frame.shape[:2]
+        size = (self.thumb_width, max(1, round(h * self.thumb_width / w)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def should_detect(self, frame, ts):
+        """True if detection must run on this frame (BGR or grayscale)."""
+        thumb = self._thumbnail(frame)
+        reason = None
+        if self._reference is None or self._reference.shape != thumb.shape:
+            reason = 'refresh'
+        else:
+            self._diff = cv2.absdiff(thumb, self._reference, self._diff)
+            changed = np.count_nonzero(self._diff > self.pixel_threshold)
+            if changed > self.min_changed * thumb.size:
+                reason = 'motion'
+                self._last_motion = ts
+            elif self._last_motion is not None and ts - self._last_motion < self.active_hold:
+                reason = 'active'
+            elif ts - self._last_detect >= self.max_interval:
+                reason = 'refresh'
+
+        if reason is None:
+            self.stats['skipped'] += 1
+            return False
+        self.stats[reason] += 1
+        self._reference = thumb
+        self._last_detect = ts
+        return True
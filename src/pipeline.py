@@ -0,0 +1,155 @@
+import cv2
+import threading
+import time
+from collections import deque
+
+from instrumentation import FRAMES_DROPPED
+from stage_timer import NullTimer
+
+
+class FrameQueue:
+    """
+    Bounded hand-off between two pipeline stages.
+    policy='latest': a put() on a full queue discards the oldest item, so the
+                     consumer always works on the freshest frame and latency
+                     stays bounded when it falls behind.
+    policy='block':  a put() waits for room (lossless, for offline replays).
+    Drops are also counted in fall_frames_dropped_total{queue=name}.
+    """
+
+    def __init__(self, maxsize=1, policy='latest', name='queue'):
+        if policy not in ('latest', 'block'):
+            raise ValueError(f"Unknown drop policy: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self._dropped_metric = FRAMES_DROPPED.labels(name)
+        self._items = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            if self.policy == 'block':
+                while len(self._items) >= self.maxsize and not self._closed:
+                    self._cond.wait()
+            elif len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+                self._dropped_metric.inc()
+            if self._closed:
+                return False
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """Returns the next item, or None once the queue is closed and drained."""
+        with self._cond:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._items:
+                if self._closed:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+def _capture_loop(source, out_q, stop, timer, max_frames):
+    count = 0
+    try:
+        while not stop.is_set() and (max_frames is None or count < max_frames):
+            with timer.stage('capture'):
+                ret, frame, frame_ts = source.read()
+            if not ret:
+                break
+            count += 1
+            out_q.put((frame, frame_ts, time.perf_counter()))
+            timer.end_frame()
+    finally:
+        out_q.close()
+
+
+def _detect_loop(monitor, in_q, out_q, stop, timer):
+    try:
+        while not stop.is_set():
+            item = in_q.get()
+            if item is None:
+                break
+            frame, frame_ts, t_capture = item
+            result = monitor.process(frame, frame_ts)
+            out_q.put((frame, result, t_capture))
+            timer.end_frame()
+    finally:
+        out_q.close()
+
+
+def run_pipeline(source, monitor, headless=False, timer=None, max_frames=None,
+                 drop_policy='latest', queue_size=1, preview_every=1):
+    """
+    Runs capture and detection (monitor.process) on worker threads and
+    rendering/UI on the calling thread (OpenCV's HighGUI must stay on the
+    main thread).
+      capture --[FrameQueue]--> detect --[FrameQueue]--> render
+    monitor.timer must not be shared with another thread (use timer.fork()).
+    headless skips rendering entirely; otherwise only every preview_every-th
+    frame is drawn and shown.
+    'latency' in the timer is capture-to-render wall time per displayed frame.
+    Returns the number of frames dropped by the queues.
+    """
+    timer = timer or NullTimer()
+    capture_q = FrameQueue(queue_size, drop_policy, 'capture')
+    render_q = FrameQueue(queue_size, drop_policy, 'render')
+    stop = threading.Event()
+
+    workers = [
+        threading.Thread(target=_capture_loop, name="capture",
+                         args=(source, capture_q, stop, timer.fork(), max_frames), daemon=True),
+        threading.Thread(target=_detect_loop, name="detect",
+                         args=(monitor, capture_q, render_q, stop, monitor.timer), daemon=True),
+    ]
+    for w in workers:
+        w.start()
+
+    try:
+        received = 0
+        while True:
+            item = render_q.get()
+            if item is None:
+                break
+            frame, result, t_capture = item
+            received += 1
+            if not headless and received % preview_every == 0:
+                monitor.draw(frame, result, timer)
+                with timer.stage('display'):
+                    cv2.imshow("Cylinder Fall Detection", frame)
+                    key = cv2.waitKey(1) & 0xFF
+                if key == ord('q'):
+                    stop.set()
+            timer.record('latency', time.perf_counter() - t_capture)
+            timer.end_frame()
+            if stop.is_set():
+                break
+    finally:
+        stop.set()
+        capture_q.close()
+        render_q.close()
+        for w in workers:
+            w.join(timeout=5.0)
+        source.release()
+        if not headless:
+            cv2.destroyAllWindows()
+
+    dropped = capture_q.dropped + render_q.dropped
+    if dropped:
+        print(f"[PIPELINE] Dropped {dropped} stale frames (capture: {capture_q.dropped}, render: {render_q.dropped})")
+    return dropped
@@ -0,0 +1,68 @@
+import threading
+import time
+
+from instrumentation import RSS_BYTES, THREADS
+
+
+class MetricsSampler:
+    """
+    Samples this process's RSS, CPU and thread count on its own thread every
+    `interval` seconds through one reused psutil.Process handle, so the
+    video loop only reads the last sample (self.latest) instead of querying
+    the OS every frame. Samples also update the RSS / thread gauges of the
+    metrics endpoint. psutil is imported on construction, not with this module.
+    """
+
+    def __init__(self, interval=1.0, pid=None):
+        import psutil
+        self.interval = interval
+        self._process = psutil.Process(pid)
+        self._error = psutil.Error
+        self.latest = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1.0)
+
+    def sample(self):
+        """Takes one sample now; the dict is replaced whole, so readers never see a partial one."""
+        p = self._process
+        with p.oneshot():
+            rss = p.memory_info().rss
+            threads = p.num_threads()
+            self.latest = {
+                'rss_mb': rss / (1024 * 1024),
+                'cpu_percent': p.cpu_percent(None),
+                'threads': threads,
+                'sampled_at': time.time(),
+            }
+        RSS_BYTES.set(rss)
+        THREADS.set(threads)
+        return self.latest
+
+    @property
+    def rss_mb(self):
+        return self.latest.get('rss_mb', 0.0)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except self._error as e:
+                print(f"[METRICS ERROR] {e}")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
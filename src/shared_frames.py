@@ -0,0 +1,118 @@
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+# Header layout (int64): [write_seq, read_seq, closed]
+_HEADER = 3
+_WRITE, _READ, _CLOSED = 0, 1, 2
+
+
+class SharedFrameRing:
+    """
+    Single-producer / single-consumer ring of fixed-size frames in one
+    multiprocessing.shared_memory block, so frames cross process boundaries
+    without pickling.
+
+    Layout: int64 header | int64 seq per slot | float64 ts per slot | frames.
+    The writer fills slot (seq % slots), stamps the slot's seq and timestamp,
+    then publishes write_seq. Readers copy a slot out and re-check its seq
+    afterwards (seqlock), so a frame overwritten mid-copy is rejected instead
+    of being processed torn.
+
+    lossless=True makes the writer wait for the reader (replays); otherwise
+    the reader always jumps to the newest frame and older ones are dropped.
+    """
+
+    def __init__(self, shape, slots=4, name=None, create=True, lossless=False):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.lossless = lossless
+        frame_bytes = int(np.prod(self.shape))
+        meta_bytes = 8 * (_HEADER + 2 * slots)
+        size = meta_bytes + frame_bytes * slots
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            # Workers share the creator's resource tracker, so attaching does
+            # not transfer ownership; only the creator unlinks (see release()).
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._owner = create
+
+        buf = self.shm.buf
+        self.header = np.ndarray((_HEADER,), dtype=np.int64, buffer=buf, offset=0)
+        self.slot_seq = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=8 * _HEADER)
+        self.slot_ts = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=8 * (_HEADER + slots))
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=buf, offset=meta_bytes)
+        if create:
+            self.header[:] = 0
+            self.slot_seq[:] = -1
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def spec(self):
+        """Picklable description used by workers to attach()."""
+        return {'name': self.name, 'shape': self.shape, 'slots': self.slots, 'lossless': self.lossless}
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec['shape'], spec['slots'], name=spec['name'], create=False,
+                   lossless=spec['lossless'])
+
+    # --- Producer side ---
+    def write(self, frame, ts):
+        seq = int(self.header[_WRITE])
+        if self.lossless:
+            while seq - int(self.header[_READ]) >= self.slots:
+                if self.header[_CLOSED]:
+                    return False
+                time.sleep(0.0005)
+        slot = seq % self.slots
+        self.slot_seq[slot] = -1  # mark in-progress
+        np.copyto(self.frames[slot], frame)
+        self.slot_ts[slot] = ts
+        self.slot_seq[slot] = seq
+        self.header[_WRITE] = seq + 1
+        return True
+
+    def close(self):
+        self.header[_CLOSED] = 1
+
+    # --- Consumer side ---
+    @property
+    def closed(self):
+        return bool(self.header[_CLOSED])
+
+    def read(self, out):
+        """
+        Copies the next frame into out (shape == self.shape).
+        Returns (seq, ts, skipped) or None when nothing new is available.
+        skipped counts frames the reader never saw (drops).
+        """
+        write_seq = int(self.header[_WRITE])
+        read_seq = int(self.header[_READ])
+        if write_seq <= read_seq:
+            return None
+        seq = read_seq if self.lossless else write_seq - 1
+        slot = seq % self.slots
+        if self.slot_seq[slot] != seq:
+            return None
+        ts = float(self.slot_ts[slot])
+        np.copyto(out, self.frames[slot])
+        if self.slot_seq[slot] != seq:
+            # Overwritten while copying; the next call picks up a newer frame
+            return None
+        self.header[_READ] = seq + 1
+        return seq, ts, seq - read_seq
+
+    def exhausted(self):
+        return self.closed and int(self.header[_READ]) >= int(self.header[_WRITE])
+
+    def release(self):
+        # Drop numpy views before closing the mapping
+        self.header = self.slot_seq = self.slot_ts = self.frames = None
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
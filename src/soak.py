@@ -0,0 +1,492 @@
+import argparse
+import contextlib
+import datetime
+import json
+import multiprocessing as mp
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from benchmark_db import SCHEMA, SlowConnection
+from db_logger import AzureDBLogger
+from frame_sources import FrameSource, SyntheticSource, open_source
+from instrumentation import ALERTS, FRAMES
+from stage_timer import StageTimer
+
+# Drift budgets: floor growth (min of the last window minus min of the first window after warm-up)
+DEFAULT_BUDGETS = {
+    'rss_mb_per_day': 16.0,    # resident memory, per simulated day
+    'heap_mb_per_day': 4.0,    # Python heap (tracemalloc), per simulated day
+    'slack_mb': 8.0,           # added to both memory budgets, so short runs are not judged on noise
+    'threads': 0,              # extra threads that never go away
+    'open_files': 0,           # extra file descriptors / handles that never go away
+    'latency_ratio': 1.5,      # last-window p99 of a stage vs its first-window p99 ...
+    'latency_slack_ms': 1.0,   # ... plus this much
+}
+MIN_STAGE_SAMPLES = 100
+
+
+def _say(message):
+    """Harness progress, printed even while the monitor's output goes to the log."""
+    print(message, file=sys.__stdout__, flush=True)
+
+
+class AcceleratedSource(FrameSource):
+    """
+    Replays `source` on a simulated clock: frame n gets capture time
+    start + n * step_s, and frames come as fast as the pipeline takes them,
+    so fall timers, alert stages and clip windows see hours pass in minutes.
+    Stops after `frames` frames and calls on_end() first, while the pipeline
+    is still up.
+    """
+
+    def __init__(self, source, step_s, frames, on_end=None):
+        self.source = source
+        self.step_s = step_s
+        self.frames = frames
+        self.on_end = on_end
+        self.index = 0
+        self.finished = False
+        self._t0 = 0.0
+
+    def open(self):
+        if not self.source.open():
+            return False
+        self.width, self.height = self.source.width, self.source.height
+        self._t0 = time.time()
+        return True
+
+    def read(self):
+        ok = self.index < self.frames
+        if ok:
+            ok, frame, _ = self.source.read()
+        if not ok:
+            if not self.finished and self.on_end is not None:
+                self.on_end()
+            self.finished = True
+            return False, None, None
+        ts = self._t0 + self.index * self.step_s
+        self.index += 1
+        return True, frame, ts
+
+    def release(self):
+        self.source.release()
+
+
+def scenario_source(spec, step_s, idle_h=1.0, hold_h=1.05):
+    """
+    'synthetic': the strip stands for idle_h hours, falls over 30 s and stays
+    down for hold_h hours (every alert stage up to 1 h fires), then rises,
+    around the clock. Anything else is opened with open_source() and looped.
+    """
+    if spec == 'synthetic':
+        return SyntheticSource(num_frames=None, fps=1.0 / step_s, period_s=60.0,
+                               idle_s=idle_h * 3600.0, hold_s=hold_h * 3600.0)
+    return open_source(spec, loop=True)
+
+
+class StandInDB(AzureDBLogger):
+    """AzureDBLogger (same batch writer and spool) writing to a local SQLite file with an optional round trip."""
+
+    def __init__(self, path, rtt=0.0, spool_path='db_spool.jsonl'):
+        self.path = path
+        self.rtt = rtt
+        with sqlite3.connect(path) as conn:
+            conn.execute(SCHEMA)
+        super().__init__(check_connection=None, clip_column=False, spool_path=spool_path)
+
+    def _connect(self):
+        return SlowConnection(self.path, self.rtt)
+
+
+def _webhook_standin(conn, delay):
+    """Child process: the Logic App stand-in, kept out of the measured process's threads and sockets."""
+    from benchmark_webhook import StandInServer
+    server = StandInServer(delay=delay)
+    conn.send(server.url)
+    conn.recv()
+    conn.send({'requests': server.requests, 'delivered': len(server.received),
+               'connections': len(server.connections)})
+    server.close()
+
+
+def _open_files(process):
+    return process.num_fds() if hasattr(process, 'num_fds') else process.num_handles()
+
+
+def _alerts_fired():
+    from cylinder_fall_detection import NOTIFICATION_THRESHOLDS
+    return sum(ALERTS.labels(f"{t:g}").value for t in NOTIFICATION_THRESHOLDS)
+
+
+def _top_growth(snapshot, baseline, top):
+    """Largest allocation growth by source line since the baseline snapshot."""
+    rows = []
+    for stat in snapshot.compare_to(baseline, 'lineno')[:top]:
+        frame = stat.traceback[0]
+        where = os.path.join(os.path.basename(os.path.dirname(frame.filename)), os.path.basename(frame.filename))
+        rows.append({'where': f"{where}:{frame.lineno}", 'growth_kb': round(stat.size_diff / 1024, 1),
+                     'blocks': stat.count_diff, 'size_kb': round(stat.size / 1024, 1)})
+    return rows
+
+
+class SoakSampler:
+    """
+    Samples the process every `interval` wall seconds on its own thread:
+    RSS, threads, open files, traced Python heap, frames and alerts so far,
+    and each stage's latency since the previous sample (StageTimer.drain()).
+    Stage samples from the first and last window of the run are kept whole
+    (preallocated) for the drift comparison; tracemalloc snapshots are taken
+    at the end of warm-up and every snapshot_frames frames after it.
+    """
+
+    def __init__(self, timer, step_s, total, warmup, window, interval=10.0, snapshot_frames=None, top=10):
+        import psutil
+        self.timer = timer
+        self.step_s = step_s
+        self.total = total
+        self.warmup = warmup
+        self.first_end = warmup + window
+        self.last_start = total - window
+        self.window = window
+        self.interval = interval
+        self.snapshot_frames = snapshot_frames
+        self.top = top
+        self.samples = []
+        self.windows = {'first': {}, 'last': {}}  # name -> {stage: [array, filled]}
+        self.allocators = []
+        self._process = psutil.Process()
+        self._frames0 = FRAMES.labels().value
+        self._alerts0 = _alerts_fired()
+        self._baseline = None
+        self._next_snapshot = warmup
+        self._start = time.perf_counter()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="soak-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def finish(self):
+        """Final sample and snapshot; called once the source runs out, before shutdown."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        self.sample(final=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def _keep(self, window, drained):
+        stages = self.windows[window]
+        for name, seconds in drained.items():
+            buf, filled = stages[name]
+            n = min(len(seconds), len(buf) - filled)
+            buf[filled:filled + n] = seconds[:n]
+            stages[name][1] = filled + n
+
+    def sample(self, final=False):
+        with self._lock:
+            frames = FRAMES.labels().value - self._frames0
+            p = self._process
+            with p.oneshot():
+                rss = p.memory_info().rss
+                threads = p.num_threads()
+                files = _open_files(p)
+            heap = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+            drained = self.timer.drain()
+            for name in drained:
+                if name not in self.windows['first']:
+                    # Both windows' buffers up front, so the last one is not heap growth
+                    for stages in self.windows.values():
+                        stages[name] = [np.full(self.window + 1000, np.nan), 0]
+            if self.warmup <= frames < self.first_end:
+                self._keep('first', drained)
+            if frames >= self.last_start:
+                self._keep('last', drained)
+            record = {
+                'wall_s': round(time.perf_counter() - self._start, 1),
+                'sim_h': round(frames * self.step_s / 3600.0, 3),
+                'frames': frames,
+                'rss_mb': round(rss / (1024 * 1024), 2),
+                'threads': threads,
+                'open_files': files,
+                'heap_mb': round(heap / (1024 * 1024), 3) if heap is not None else None,
+                'alerts': _alerts_fired() - self._alerts0,
+                'p99_ms': {name: round(float(np.percentile(s, 99)) * 1000.0, 3) for name, s in drained.items()},
+            }
+            self.samples.append(record)
+            if tracemalloc.is_tracing() and (frames >= self._next_snapshot or final):
+                self._snapshot(record['sim_h'])
+        fps = frames / record['wall_s'] if record['wall_s'] else 0.0
+        _say(f"[SOAK] {record['sim_h']:7.2f}h of {self.total * self.step_s / 3600.0:.0f}h  {frames:>8} frames "
+             f"({fps:,.0f}/s)  RSS {record['rss_mb']:.0f}MB  heap {record['heap_mb'] or 0:.1f}MB  "
+             f"threads {threads}  files {files}  alerts {record['alerts']}")
+        return record
+
+    def _snapshot(self, sim_h):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        if self._baseline is None:
+            self._baseline = snapshot
+        else:
+            self.allocators.append({'sim_h': sim_h, 'top': _top_growth(snapshot, self._baseline, self.top)})
+        if self.snapshot_frames:
+            self._next_snapshot += self.snapshot_frames
+        else:
+            self._next_snapshot = float('inf')
+
+    def window_stats(self, window):
+        """{stage: (count, p50_ms, p99_ms)} over the samples kept for window 'first' or 'last'."""
+        out = {}
+        for name, (buf, filled) in self.windows[window].items():
+            if filled:
+                p50, p99 = np.percentile(buf[:filled], [50, 99]) * 1000.0
+                out[name] = (filled, float(p50), float(p99))
+        return out
+
+
+def evaluate(sampler, budgets, events):
+    """
+    Checks the run against the budgets. Memory, threads and open files are
+    compared by their floor (minimum) in the first and last window after
+    warm-up, so transient threads, clip exports or a GC cycle in flight do
+    not count, only what never goes away. Returns [check dicts].
+    """
+    first = [s for s in sampler.samples if sampler.warmup <= s['frames'] < sampler.first_end]
+    last = [s for s in sampler.samples if s['frames'] >= sampler.last_start]
+    checks = []
+    if not first or not last:
+        return [{'name': 'samples', 'value': len(sampler.samples), 'limit': 'first and last window', 'unit': '',
+                 'ok': False, 'note': "run too short for the sample interval"}]
+    days = (last[-1]['sim_h'] - first[0]['sim_h']) / 24.0
+
+    def floor_growth(key):
+        return min(s[key] for s in last) - min(s[key] for s in first)
+
+    checks.append({'name': 'RSS growth', 'value': round(floor_growth('rss_mb'), 2), 'unit': 'MB',
+                   'limit': round(budgets['rss_mb_per_day'] * days + budgets['slack_mb'], 2)})
+    if first[0]['heap_mb'] is not None:
+        checks.append({'name': 'Python heap growth', 'value': round(floor_growth('heap_mb'), 3), 'unit': 'MB',
+                       'limit': round(budgets['heap_mb_per_day'] * days + budgets['slack_mb'], 2)})
+    checks.append({'name': 'Thread growth', 'value': floor_growth('threads'), 'unit': '',
+                   'limit': budgets['threads']})
+    checks.append({'name': 'Open file growth', 'value': floor_growth('open_files'), 'unit': '',
+                   'limit': budgets['open_files']})
+
+    before, after = sampler.window_stats('first'), sampler.window_stats('last')
+    for name in sorted(set(before) & set(after)):
+        (n0, _, p0), (n1, _, p1) = before[name], after[name]
+        if min(n0, n1) < MIN_STAGE_SAMPLES:
+            continue
+        checks.append({'name': f"{name} p99", 'value': round(p1, 3), 'unit': 'ms',
+                       'limit': round(p0 * budgets['latency_ratio'] + budgets['latency_slack_ms'], 3)})
+
+    lost = events['fired'] - min(events['db_rows'], events['local_rows'], events['webhook_delivered'])
+    checks.append({'name': 'Alerts lost', 'value': lost, 'unit': '', 'limit': 0})
+    for check in checks:
+        check.setdefault('ok', check['value'] <= check['limit'])
+    return checks
+
+
+def _disk_mb(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files) / 1e6
+
+
+def run_soak(source='synthetic', hours=48.0, step_s=2.0, warmup=0.1, window=0.1, sample_every=10.0,
+             snapshot_hours=12.0, top=10, budgets=None, out_dir='soak_report', idle_h=1.0, hold_h=1.05,
+             db_rtt=0.005, webhook_delay=0.0, trace=True, pipelined=True, verbose=False):
+    """
+    Runs cylinder_fall_detection.main() headless over `hours` of simulated
+    time (one frame every step_s seconds of capture time) with a SQLite DB
+    stand-in, a local webhook stand-in in a child process, telemetry, clips
+    and the status server on, sampling as described in SoakSampler.
+    warmup and window are fractions of the run. Writes soak_report.json and
+    soak_report.md (plus the monitor's output in soak_monitor.log unless
+    verbose) to out_dir and returns the report dict.
+    """
+    import cylinder_fall_detection
+
+    budgets = dict(DEFAULT_BUDGETS, **(budgets or {}))
+    out_dir = os.path.abspath(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    total = int(hours * 3600.0 / step_s)
+    ctx = mp.get_context('spawn')
+    parent, child = ctx.Pipe()
+    webhook = ctx.Process(target=_webhook_standin, args=(child, webhook_delay), daemon=True)
+    webhook.start()
+    url = parent.recv()
+
+    if trace:
+        tracemalloc.start(1)
+    cwd = os.getcwd()
+    saved_url = cylinder_fall_detection.LOGIC_APP_URL
+    log_path = os.path.join(out_dir, 'soak_monitor.log')
+    started = datetime.datetime.now()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        cylinder_fall_detection.LOGIC_APP_URL = url
+        try:
+            timer = StageTimer()
+            db = StandInDB(os.path.join(scratch, 'standin.sqlite'), rtt=db_rtt)
+            sampler = SoakSampler(timer, step_s, total, int(total * warmup), int(total * window),
+                                  interval=sample_every,
+                                  snapshot_frames=int(snapshot_hours * 3600.0 / step_s) if snapshot_hours else None,
+                                  top=top)
+            replay = AcceleratedSource(scenario_source(source, step_s, idle_h, hold_h), step_s, total,
+                                       on_end=sampler.finish)
+            _say(f"[SOAK] {hours:g}h simulated ({total} frames, {step_s:g}s apart) from {source}, "
+                 f"report in {out_dir}")
+            with open(log_path, 'w') as log, \
+                    (contextlib.nullcontext() if verbose else contextlib.redirect_stdout(log)):
+                sampler.start()
+                cylinder_fall_detection.main(
+                    source=replay, headless=True, db=db, timer=timer, pipelined=pipelined, drop_policy='block',
+                    telemetry_dir='telemetry', instrument=True, motion_gate={'min_rate': 1.0}, tilt_filter=True,
+                    clips={'directory': 'clips', 'fps': 1.0 / step_s}, status={'port': 0})
+                sampler.finish()
+            wall_s = time.perf_counter() - sampler._start
+
+            with sqlite3.connect(db.path) as conn:
+                db_rows = conn.execute("SELECT COUNT(*) FROM FallEvents").fetchone()[0]
+            with sqlite3.connect(cylinder_fall_detection.LOCAL_STORE_PATH) as conn:
+                local_rows = conn.execute("SELECT COUNT(*) FROM FallEvents").fetchone()[0]
+            parent.send('stop')
+            hook = parent.recv()
+            events = {'fired': _alerts_fired() - sampler._alerts0, 'db_rows': db_rows, 'local_rows': local_rows,
+                      'webhook_delivered': hook['delivered'], 'webhook_connections': hook['connections'],
+                      'clips': len(os.listdir('clips')) if os.path.isdir('clips') else 0}
+            disk_mb = _disk_mb(scratch)
+        finally:
+            os.chdir(cwd)
+            cylinder_fall_detection.LOGIC_APP_URL = saved_url
+            if trace:
+                tracemalloc.stop()
+    webhook.join(10.0)
+
+    checks = evaluate(sampler, budgets, events)
+    report = {
+        'passed': all(c['ok'] for c in checks),
+        'started': started.isoformat(timespec='seconds'),
+        'config': {'source': source, 'hours': hours, 'step_s': step_s, 'frames': total, 'warmup': warmup,
+                   'window': window, 'sample_every_s': sample_every, 'pipelined': pipelined,
+                   'tracemalloc': trace, 'db_rtt_s': db_rtt, 'webhook_delay_s': webhook_delay},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'opencv': cv2.__version__, 'numpy': np.__version__, 'cpus': os.cpu_count()},
+        'budgets': budgets,
+        'wall_s': round(wall_s, 1),
+        'frames': sampler.samples[-1]['frames'] if sampler.samples else 0,
+        'events': events,
+        'disk_mb': round(disk_mb, 1),
+        'checks': checks,
+        'stages': {'first': sampler.window_stats('first'), 'last': sampler.window_stats('last')},
+        'allocators': sampler.allocators,
+        'samples': sampler.samples,
+    }
+    with open(os.path.join(out_dir, 'soak_report.json'), 'w') as f:
+        json.dump(report, f, indent=1)
+    with open(os.path.join(out_dir, 'soak_report.md'), 'w') as f:
+        f.write(format_report(report))
+    return report
+
+
+def format_report(report):
+    """Markdown summary of a soak run, for attaching to a release."""
+    cfg, ev, samples = report['config'], report['events'], report['samples']
+    lines = [
+        f"# Soak test: {'PASS' if report['passed'] else 'FAIL'}",
+        "",
+        f"- Started {report['started']}, {report['wall_s'] / 60.0:.1f} min wall time for {cfg['hours']:g} h "
+        f"simulated ({report['frames']} frames, {cfg['step_s']:g} s apart, source `{cfg['source']}`, "
+        f"{'pipelined' if cfg['pipelined'] else 'sequential'})",
+        f"- Python {report['environment']['python']}, OpenCV {report['environment']['opencv']}, "
+        f"NumPy {report['environment']['numpy']}, {report['environment']['cpus']} CPU(s), "
+        f"{report['environment']['platform']}",
+        f"- Alerts fired {ev['fired']}: DB stand-in rows {ev['db_rows']}, local store rows {ev['local_rows']}, "
+        f"webhooks delivered {ev['webhook_delivered']} over {ev['webhook_connections']} connection(s), "
+        f"clips {ev['clips']}; {report['disk_mb']:.1f} MB written",
+        "",
+        "## Budgets",
+        "",
+        "| check | value | limit | result |",
+        "|---|---:|---:|---|",
+    ]
+    for c in report['checks']:
+        lines.append(f"| {c['name']} | {c['value']} {c['unit']} | {c['limit']} {c['unit']} | "
+                     f"{'ok' if c['ok'] else '**FAIL**'}{' (' + c['note'] + ')' if c.get('note') else ''} |")
+    if samples:
+        lines += ["", "## Resources", "", "| metric | start | min | max | end |", "|---|---:|---:|---:|---:|"]
+        for key, label in (('rss_mb', 'RSS MB'), ('heap_mb', 'Python heap MB'), ('threads', 'threads'),
+                           ('open_files', 'open files')):
+            values = [s[key] for s in samples if s[key] is not None]
+            if values:
+                lines.append(f"| {label} | {values[0]} | {min(values)} | {max(values)} | {values[-1]} |")
+    first, last = report['stages']['first'], report['stages']['last']
+    if first or last:
+        lines += ["", "## Stage latency (first vs last window)", "",
+                  "| stage | frames | p50 ms | p99 ms | frames | p50 ms | p99 ms |",
+                  "|---|---:|---:|---:|---:|---:|---:|"]
+        for name in sorted(set(first) | set(last)):
+            a = first.get(name, (0, float('nan'), float('nan')))
+            b = last.get(name, (0, float('nan'), float('nan')))
+            lines.append(f"| {name} | {a[0]} | {a[1]:.3f} | {a[2]:.3f} | {b[0]} | {b[1]:.3f} | {b[2]:.3f} |")
+    if report['allocators']:
+        final = report['allocators'][-1]
+        lines += ["", f"## Top allocation growth since warm-up (at {final['sim_h']:g} h)", "",
+                  "| where | growth KB | blocks | size KB |", "|---|---:|---:|---:|"]
+        for row in final['top']:
+            lines.append(f"| `{row['where']}` | {row['growth_kb']} | {row['blocks']} | {row['size_kb']} |")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Soak test: days of simulated operation through the full monitor, with drift budgets")
+    parser.add_argument('--source', default='synthetic',
+                        help="'synthetic' (fall cycles) or a video file / image directory, looped")
+    parser.add_argument('--hours', type=float, default=48.0, help="Simulated hours of operation")
+    parser.add_argument('--frame-step', type=float, default=2.0, help="Simulated seconds between frames")
+    parser.add_argument('--idle-hours', type=float, default=1.0, help="Synthetic: standing time between falls")
+    parser.add_argument('--hold-hours', type=float, default=1.05, help="Synthetic: time each fall stays down")
+    parser.add_argument('--warmup', type=float, default=0.1,
+                        help="Fraction of the run before baselines; cover at least one full fall cycle")
+    parser.add_argument('--window', type=float, default=0.1, help="Fraction of the run in each compared window")
+    parser.add_argument('--sample-every', type=float, default=10.0, help="Wall seconds between samples")
+    parser.add_argument('--snapshot-hours', type=float, default=12.0,
+                        help="Simulated hours between tracemalloc snapshots")
+    parser.add_argument('--top', type=int, default=10, help="Allocation sites listed per snapshot")
+    parser.add_argument('--no-tracemalloc', action='store_true', help="Skip Python heap tracing (faster)")
+    parser.add_argument('--sequential', action='store_true', help="Single-threaded loop instead of the pipeline")
+    parser.add_argument('--db-rtt-ms', type=float, default=5.0, help="DB stand-in round trip")
+    parser.add_argument('--webhook-delay-ms', type=float, default=0.0, help="Webhook stand-in response time")
+    parser.add_argument('--out', default='soak_report', help="Report directory")
+    parser.add_argument('--verbose', action='store_true', help="Show the monitor's output instead of logging it")
+    for key, value in DEFAULT_BUDGETS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value,
+                            help=f"Budget (default {value})")
+    args = parser.parse_args()
+
+    report = run_soak(args.source, args.hours, args.frame_step, args.warmup, args.window, args.sample_every,
+                      args.snapshot_hours, args.top, {k: getattr(args, k) for k in DEFAULT_BUDGETS}, args.out,
+                      args.idle_hours, args.hold_hours, args.db_rtt_ms / 1000.0, args.webhook_delay_ms / 1000.0,
+                      trace=not args.no_tracemalloc, pipelined=not args.sequential, verbose=args.verbose)
+    for c in report['checks']:
+        print(f"[SOAK] {'ok  ' if c['ok'] else 'FAIL'} {c['name']}: {c['value']} {c['unit']} (limit {c['limit']})")
+    print(f"[SOAK] {'PASS' if report['passed'] else 'FAIL'}: report in {os.path.join(args.out, 'soak_report.md')}")
+    raise SystemExit(0 if report['passed'] else 1)
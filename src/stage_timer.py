@@ -0,0 +1,138 @@
+import time
+import numpy as np
+
+
+class _Stage:
+    __slots__ = ('samples', 'histogram', 'pending', 'hit', '_start')
+
+    def __init__(self, samples, histogram=None):
+        self.samples = samples
+        self.histogram = histogram
+        self.pending = 0.0
+        self.hit = False
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.pending += time.perf_counter() - self._start
+        self.hit = True
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class StageTimer:
+    """
+    Collects wall-clock durations per named stage of the detection loop.
+    Usage:  with timer.stage('detect'): ...   then timer.end_frame() once per frame.
+    A stage entered several times in one frame is summed into one sample.
+    Not thread-safe: each thread should time its own stages on a fork().
+    keep=False only tracks the current frame (elapsed()) and stores no
+    samples, for long live runs that feed per-frame telemetry.
+    histogram: a labelled instrumentation.Histogram (e.g. STAGE_SECONDS);
+    each frame's stage durations are also observed into it at end_frame().
+    """
+
+    def __init__(self, samples=None, keep=True, histogram=None):
+        self.samples = {} if samples is None else samples
+        self.keep = keep
+        self.histogram = histogram
+        self._stages = {}
+
+    def stage(self, name):
+        st = self._stages.get(name)
+        if st is None:
+            child = self.histogram.labels(name) if self.histogram is not None else None
+            st = self._stages[name] = _Stage(self.samples.setdefault(name, []), child)
+        return st
+
+    def fork(self):
+        """Timer for another thread that reports into the same summary."""
+        return StageTimer(self.samples, self.keep, self.histogram)
+
+    def elapsed(self, name):
+        """Seconds spent in stage name so far in the current frame."""
+        st = self._stages.get(name)
+        return st.pending if st is not None else 0.0
+
+    def record(self, name, seconds):
+        st = self.stage(name)
+        st.pending += seconds
+        st.hit = True
+
+    def end_frame(self):
+        for st in self._stages.values():
+            if st.hit:
+                if self.keep:
+                    st.samples.append(st.pending)
+                if st.histogram is not None:
+                    st.histogram.observe(st.pending)
+                st.pending = 0.0
+                st.hit = False
+
+    def drain(self):
+        """
+        Returns {stage: seconds array} of the samples kept since the last
+        drain and removes them, so a long run can be windowed without the
+        lists growing. Safe from another thread: end_frame() only appends,
+        and only the first n samples seen here are taken and deleted.
+        """
+        out = {}
+        for name, samples in list(self.samples.items()):
+            n = len(samples)
+            if n:
+                out[name] = np.asarray(samples[:n])
+                del samples[:n]
+        return out
+
+    def summary(self):
+        """Returns {stage: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}."""
+        out = {}
+        for name, samples in self.samples.items():
+            if not samples:
+                continue
+            ms = np.asarray(samples) * 1000.0
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            out[name] = {
+                'count': int(ms.size),
+                'mean_ms': float(ms.mean()),
+                'p50_ms': float(p50),
+                'p95_ms': float(p95),
+                'p99_ms': float(p99),
+                'max_ms': float(ms.max()),
+            }
+        return out
+
+
+class NullTimer:
+    """Drop-in StageTimer that records nothing (default for live runs)."""
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def fork(self):
+        return self
+
+    def elapsed(self, name):
+        return float('nan')
+
+    def record(self, name, seconds):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def summary(self):
+        return {}
@@ -0,0 +1,282 @@
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import cv2
+
+from instrumentation import STATUS_DROPPED, STATUS_SUBSCRIBERS
+
+SSE_HEADERS = (b"HTTP/1.1 200 OK\r\n"
+               b"Content-Type: text/event-stream\r\n"
+               b"Cache-Control: no-cache\r\n"
+               b"Connection: keep-alive\r\n"
+               b"Access-Control-Allow-Origin: *\r\n\r\n"
+               b"retry: 2000\n\n")
+MJPEG_BOUNDARY = b"frame"
+
+
+class LatestSlot:
+    """
+    Single-writer latest-value slot. publish() replaces one reference, which
+    is atomic under the GIL: no lock, no queue, nothing a reader can make the
+    writer wait on. Readers see the newest (seq, value) and skip whatever
+    they missed.
+    """
+
+    def __init__(self):
+        self._item = (0, None)
+
+    def publish(self, value):
+        self._item = (self._item[0] + 1, value)
+
+    def latest(self):
+        return self._item
+
+
+class StatusServer:
+    """
+    Local HTTP streaming API for the live detector state, on its own thread
+    and asyncio loop:
+
+    - GET /status: Server-Sent Events, one JSON status per update.
+    - GET /status.json: the latest status.
+    - GET /preview.jpg, /preview: latest JPEG / MJPEG stream of downscaled
+      frames, when preview_fps > 0.
+
+    The detection loop only calls publish() / offer_frame(), which put a
+    value into a LatestSlot. The loop thread samples the slot `rate` times a
+    second, encodes a new status once and writes the same bytes to every
+    subscriber's socket in one pass (no task or queue per subscriber). A
+    subscriber that reads slowly skips statuses until it catches up, so at
+    most one message per client is ever buffered; one that stays behind for
+    stall_timeout seconds is disconnected.
+    """
+
+    def __init__(self, port=9110, host='127.0.0.1', rate=10.0, preview_fps=0.0, preview_width=320,
+                 jpeg_quality=70, keepalive=15.0, stall_timeout=10.0):
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.preview_fps = preview_fps
+        self.preview_width = preview_width
+        self.jpeg_quality = jpeg_quality
+        self.keepalive = keepalive
+        self.stall_timeout = stall_timeout
+        self.status = LatestSlot()
+        self.preview = LatestSlot()
+        self.stats = {'clients': 0, 'updates': 0, 'sent': 0, 'skipped': 0, 'dropped': 0, 'previews': 0}
+        self._next_preview = 0.0
+        self._streams = {'status': {}, 'preview': {}}  # name -> {transport: time it started falling behind}
+        self._latest = {'status': None, 'preview': None}  # last message of each stream, as written
+        self._jpeg = None
+        self._handlers = set()
+        self._loop = None
+        self._stop = None
+        self._started = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="status-http", daemon=True)
+
+    # --- Detection thread ---
+    def publish(self, status):
+        """Makes status (a JSON-serializable dict) the latest one."""
+        self.status.publish(status)
+
+    def offer_frame(self, frame, ts):
+        """Keeps a downscaled copy of frame for the preview, at most preview_fps times a second."""
+        if not self.preview_fps or ts < self._next_preview:
+            return
+        self._next_preview = ts + 1.0 / self.preview_fps
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.preview_width / w)
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        self.preview.publish(cv2.resize(frame, size, interpolation=cv2.INTER_AREA))
+
+    # --- Lifecycle ---
+    def start(self):
+        self._thread.start()
+        self._started.wait()
+        if self._error is not None:
+            raise self._error
+        preview = f", preview on /preview" if self.preview_fps else ""
+        print(f"[INFO] Live status on http://{self.host}:{self.port}/status{preview}")
+        return self
+
+    def close(self, timeout=5.0):
+        if self._loop is not None and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._stop.set)
+            self._thread.join(timeout)
+
+    def _run(self):
+        asyncio.run(self._serve())
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        try:
+            server = await asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+        except OSError as e:
+            self._error = e
+            self._started.set()
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        self._started.set()
+        tasks = [asyncio.create_task(self._sample_status())]
+        if self.preview_fps:
+            tasks.append(asyncio.create_task(self._sample_preview()))
+        async with server:
+            await self._stop.wait()
+            for task in tasks:
+                task.cancel()
+            server.close()
+            for subscribers in self._streams.values():
+                for transport in list(subscribers):
+                    transport.abort()
+            if self._handlers:
+                await asyncio.wait(self._handlers, timeout=1.0)
+
+    # --- Sampling and broadcast (loop thread) ---
+    async def _sample_status(self):
+        seen = 0
+        idle = 0.0
+        interval = 1.0 / self.rate
+        while True:
+            await asyncio.sleep(interval)
+            seq, status = self.status.latest()
+            if seq != seen:
+                seen = seq
+                idle = 0.0
+                self.stats['updates'] += 1
+                self._broadcast('status', b"data: " + json.dumps(status).encode('utf-8') + b"\n\n")
+            else:
+                idle += interval
+                if idle >= self.keepalive:
+                    idle = 0.0
+                    self._broadcast('status', b": keepalive\n\n")
+
+    async def _sample_preview(self):
+        seen = 0
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        while True:
+            await asyncio.sleep(0.5 / self.preview_fps)
+            seq, frame = self.preview.latest()
+            if seq == seen:
+                continue
+            seen = seq
+            # imencode releases the GIL; off the loop so status streams keep flowing
+            ok, jpeg = await self._loop.run_in_executor(None, cv2.imencode, '.jpg', frame, params)
+            if ok:
+                self.stats['previews'] += 1
+                self._jpeg = jpeg.tobytes()
+                self._broadcast('preview', self._mjpeg_part(self._jpeg))
+
+    def _broadcast(self, name, message):
+        """
+        Writes message to every subscriber of stream `name` whose socket has
+        taken the previous one. A subscriber still holding unsent data skips
+        this message (it gets a newer one once it catches up); one that has
+        been behind for stall_timeout seconds is disconnected.
+        """
+        self._latest[name] = message
+        now = time.monotonic()
+        subscribers = self._streams[name]
+        for transport, behind_since in list(subscribers.items()):
+            if transport.is_closing():
+                continue
+            if transport.get_write_buffer_size() == 0:
+                transport.write(message)
+                self.stats['sent'] += 1
+                if behind_since is not None:
+                    subscribers[transport] = None
+                continue
+            self.stats['skipped'] += 1
+            if behind_since is None:
+                subscribers[transport] = now
+            elif now - behind_since > self.stall_timeout:
+                self.stats['dropped'] += 1
+                STATUS_DROPPED.inc()
+                transport.abort()
+
+    # --- Clients ---
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5.0)
+            parts = request.split(b"\r\n", 1)[0].split()
+            path = parts[1].decode('ascii', errors='replace').split('?')[0] if len(parts) > 1 else ''
+            if path == '/status':
+                await self._subscribe(reader, writer, 'status', SSE_HEADERS)
+            elif path == '/status.json':
+                seq, status = self.status.latest()
+                await self._respond(writer, 200, 'application/json', json.dumps(status).encode('utf-8'))
+            elif path == '/preview' and self.preview_fps:
+                await self._subscribe(reader, writer, 'preview',
+                                      b"HTTP/1.1 200 OK\r\nCache-Control: no-cache\r\n"
+                                      b"Content-Type: multipart/x-mixed-replace; boundary=" + MJPEG_BOUNDARY
+                                      + b"\r\n\r\n")
+            elif path == '/preview.jpg' and self._jpeg is not None:
+                await self._respond(writer, 200, 'image/jpeg', self._jpeg)
+            else:
+                await self._respond(writer, 404, 'text/plain', b"not found\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            self._handlers.discard(task)
+
+    async def _subscribe(self, reader, writer, name, headers):
+        """Registers the connection with stream `name` until the client goes away."""
+        transport = writer.transport
+        transport.write(headers + (self._latest[name] or b""))
+        subscribers = self._streams[name]
+        subscribers[transport] = None
+        self.stats['clients'] += 1
+        STATUS_SUBSCRIBERS.set(sum(len(s) for s in self._streams.values()))
+        try:
+            while await reader.read(4096):
+                pass  # nothing is expected from the client; EOF ends the subscription
+        finally:
+            subscribers.pop(transport, None)
+            STATUS_SUBSCRIBERS.set(sum(len(s) for s in self._streams.values()))
+
+    @staticmethod
+    def _mjpeg_part(jpeg):
+        return (b"--" + MJPEG_BOUNDARY + b"\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                + str(len(jpeg)).encode('ascii') + b"\r\n\r\n" + jpeg + b"\r\n")
+
+    @staticmethod
+    async def _respond(writer, code, content_type, body):
+        reason = {200: 'OK', 404: 'Not Found'}[code]
+        writer.write(f"HTTP/1.1 {code} {reason}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('ascii') + body)
+        await writer.drain()
+
+
+def read_status(host='127.0.0.1', port=9110, timeout=10.0):
+    """Yields each status (decoded JSON) from a running server's /status stream."""
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall(f"GET /status HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('ascii'))
+        buf = b""
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return
+            buf += chunk
+            while b"\n\n" in buf:
+                event, buf = buf.split(b"\n\n", 1)
+                for line in event.split(b"\n"):
+                    if line.startswith(b"data: "):
+                        yield json.loads(line[6:])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the live status stream of a running monitor")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9110)
+    args = parser.parse_args()
+    for status in read_status(args.host, args.port, timeout=None):
+        print(f"{time.strftime('%H:%M:%S')} {status['camera']}: {status['status']}, "
+              f"{status['markers']} markers, angle {status['angle']:.0f}")
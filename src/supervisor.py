@@ -0,0 +1,337 @@
+import argparse
+import datetime
+import json
+import multiprocessing as mp
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from cylinder_fall_detection import (CylinderMonitor, check_webhook_ready, close_event_store, close_webhook_dispatcher,
+                                     dispatch_alert)
+from clip_recorder import ClipRecorder
+from frame_sources import open_source
+from instrumentation import FRAMES, FRAMES_DROPPED, MetricsServer
+from shared_frames import SharedFrameRing
+from stage_timer import StageTimer
+from status_stream import StatusServer
+from telemetry import TelemetryWriter
+
+# Camera config keys that configure the CylinderMonitor rather than the frame source
+MONITOR_KEYS = ('tracking', 'cylinder_diameter', 'cylinders', 'motion_gate', 'tilt_filter', 'detect_every',
+                'detector_params')
+
+
+def load_camera_config(path):
+    """
+    Reads a JSON list of cameras, e.g.
+      [{"camera_id": "Cylinder_Cam_01", "source": 0},
+       {"camera_id": "Cylinder_Cam_02", "source": "recordings/cam2.mp4", "loop": true}]
+    MONITOR_KEYS (tracking, cylinder_diameter, cylinders, motion_gate, tilt_filter,
+    detect_every, detector_params) are passed to the camera's CylinderMonitor; other keys go to frame_sources.open_source().
+    """
+    with open(path, 'r') as f:
+        cameras = json.load(f)
+    for i, cam in enumerate(cameras):
+        cam.setdefault('camera_id', f"Cylinder_Cam_{i + 1:02d}")
+    return cameras
+
+
+def _capture_loop(source, ring, stop, camera_id, first=None):
+    """
+    Feeds the camera's ring, starting with `first` (the (frame, ts) the ring
+    was sized from). Frames of another size are resized into the slot.
+    """
+    height, width = ring.shape[:2]
+    warned = False
+    try:
+        ret, frame, frame_ts = (True,) + first if first is not None else source.read()
+        while ret and not stop.is_set():
+            if frame.shape[:2] != (height, width):
+                if not warned:
+                    print(f"[SUPERVISOR] {camera_id}: frame size changed to {frame.shape[1]}x{frame.shape[0]}, "
+                          f"resizing to {width}x{height}.")
+                    warned = True
+                frame = cv2.resize(frame, (width, height))
+            if not ring.write(frame, frame_ts):
+                break
+            ret, frame, frame_ts = source.read()
+    finally:
+        ring.close()
+        source.release()
+
+
+def _detector_worker(cameras, event_q, processed, dropped, experiment_id, stop, telemetry_dir=None, clips=None,
+                     status=None):
+    """
+    Worker process: round-robins over its assigned cameras' shared rings and
+    runs one CylinderMonitor per camera. Alerts go back to the supervisor
+    through event_q instead of being logged here.
+    cameras: list of (counter_index, camera_id, ring_spec, monitor_options, source_fps).
+    telemetry_dir: each camera writes its debug telemetry to <telemetry_dir>/<camera_id>.
+    clips: ClipRecorder options; each camera buffers its own frames and exports
+    its clips from this process, and the clip path travels with the alert.
+    status: StatusServer options; camera n streams its live status from this
+    process on port status['port'] + n.
+    """
+    def alert_sink(camera_id, threshold, angle, exp_id, event_key, clip_path=None):
+        event_q.put((camera_id, threshold, angle, exp_id, event_key, clip_path))
+
+    rings, monitors, buffers, writers, recorders, servers = [], [], [], [], [], []
+    for idx, camera_id, spec, options, fps in cameras:
+        ring = SharedFrameRing.attach(spec)
+        h, w = spec['shape'][:2]
+        rings.append((idx, ring))
+        telemetry, timer = None, None
+        if telemetry_dir:
+            telemetry = TelemetryWriter(os.path.join(telemetry_dir, camera_id.replace(':', '_')))
+            timer = StageTimer(keep=False)
+            writers.append(telemetry)
+        recorder = None
+        if clips:
+            recorder = ClipRecorder(**dict({'fps': fps} if fps else {}, **clips))
+            recorders.append(recorder)
+        server = None
+        if status:
+            server = StatusServer(**dict(status, port=status['port'] + idx)).start()
+            servers.append(server)
+        monitors.append(CylinderMonitor(w, h, None, camera_id, experiment_id, timer, alert_sink=alert_sink,
+                                        telemetry=telemetry, clips=recorder, status=server, **options))
+        buffers.append(np.empty(spec['shape'], dtype=np.uint8))
+
+    try:
+        while not stop.is_set():
+            busy = False
+            for (idx, ring), monitor, buf in zip(rings, monitors, buffers):
+                got = ring.read(buf)
+                if got is None:
+                    continue
+                _, frame_ts, skipped = got
+                monitor.process(buf, frame_ts)
+                monitor.timer.end_frame()
+                processed[idx] += 1
+                dropped[idx] += skipped
+                busy = True
+            if not busy:
+                if all(ring.exhausted() for _, ring in rings):
+                    break
+                time.sleep(0.001)
+    finally:
+        for _, ring in rings:
+            ring.release()
+        for recorder in recorders:
+            recorder.close()
+        for server in servers:
+            server.close()
+        for telemetry in writers:
+            telemetry.close()
+
+
+def _event_loop(event_q, db, store=None):
+    while True:
+        item = event_q.get()
+        if item is None:
+            break
+        dispatch_alert(db, *item, store=store)
+
+
+def run_supervisor(cameras, db=None, workers=None, lossless=False, duration=None, slots=4,
+                   telemetry_dir='telemetry', metrics_port=None, clips=None, status=None, store=None):
+    """
+    Runs one detector process per core (or `workers`) over all cameras.
+    Capture runs on a thread per camera in this process and hands frames to
+    the detectors through SharedFrameRing blocks; all fall alerts are
+    funnelled back into one dispatch path (local log, DB, webhook) here.
+    db: an event logger with no running threads of its own (the detector
+    processes are forked after it exists); None creates an AzureDBLogger
+    once they have started.
+    store: local event store for the alerts (None = the process-wide one).
+    telemetry_dir: per-camera binary debug telemetry (None = off).
+    clips: ClipRecorder options for per-alert video clips (None = off).
+    status: StatusServer options for live status streams, one port per camera
+    from status['port'] on in camera order (None = off).
+    metrics_port serves this process's metrics (alert path, sinks, frame and
+    drop counts summed over workers); per-stage histograms stay in the
+    worker processes and are not exported.
+    Returns per-camera stats: {camera_id: {'processed', 'dropped', 'fps'}}.
+    """
+    experiment_id = f"EXP_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}"
+    print(f"[INFO] Current Experiment ID: {experiment_id}")
+
+    ctx = mp.get_context()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(cameras)))
+
+    sources, rings, options, firsts = [], [], [], []
+    for cam in cameras:
+        opts = {k: v for k, v in cam.items() if k not in ('camera_id', 'source') + MONITOR_KEYS}
+        source = open_source(cam['source'], **opts)
+        if not source.open():
+            print(f"[SUPERVISOR] Skipping {cam['camera_id']}: source did not open.")
+            continue
+        # Size the ring from what the source delivers, not what was requested
+        ret, frame, frame_ts = source.read()
+        if not ret:
+            print(f"[SUPERVISOR] Skipping {cam['camera_id']}: no first frame.")
+            source.release()
+            continue
+        height, width = frame.shape[:2]
+        if (height, width) != (source.height, source.width):
+            print(f"[SUPERVISOR] {cam['camera_id']}: source delivers {width}x{height}, "
+                  f"not {source.width}x{source.height}.")
+        sources.append((cam['camera_id'], source))
+        options.append({k: cam[k] for k in MONITOR_KEYS if k in cam})
+        rings.append(SharedFrameRing((height, width, 3), slots=slots, lossless=lossless))
+        firsts.append((frame, frame_ts))
+
+    processed = ctx.Array('q', len(sources), lock=False)
+    dropped = ctx.Array('q', len(sources), lock=False)
+    event_q = ctx.Queue()
+    stop_workers = ctx.Event()
+    stop_capture = threading.Event()
+
+    # Round-robin camera assignment: worker k gets cameras k, k+workers, ...
+    assignments = [[] for _ in range(workers)]
+    for i, ((camera_id, source), ring) in enumerate(zip(sources, rings)):
+        assignments[i % workers].append((i, camera_id, ring.spec(), options[i], source.fps))
+
+    procs = [ctx.Process(target=_detector_worker, name=f"detector-{k}",
+                         args=(assignments[k], event_q, processed, dropped, experiment_id, stop_workers,
+                               telemetry_dir, clips, status),
+                         daemon=True)
+             for k in range(workers) if assignments[k]]
+    captures = [threading.Thread(target=_capture_loop, name=f"capture-{camera_id}",
+                                 args=(source, ring, stop_capture, camera_id, first), daemon=True)
+                for (camera_id, source), ring, first in zip(sources, rings, firsts)]
+
+    print(f"[SUPERVISOR] {len(sources)} cameras on {len(procs)} detector processes.")
+    start = time.perf_counter()
+    # Processes first: forking while our own threads hold locks is unsafe,
+    # and the DB logger and webhook check start threads
+    for p in procs:
+        p.start()
+    if db is None:
+        from db_logger import AzureDBLogger
+        print("[INFO] Starting database logger (connection check in background)...")
+        db = AzureDBLogger()
+        threading.Thread(target=check_webhook_ready, name="webhook-check", daemon=True).start()
+    events = threading.Thread(target=_event_loop, args=(event_q, db, store), daemon=True)
+    events.start()
+    for t in captures:
+        t.start()
+
+    server = MetricsServer(metrics_port).start() if metrics_port else None
+    frames_metric, dropped_metric = FRAMES.labels(), FRAMES_DROPPED.labels('ring')
+    seen_frames = seen_dropped = 0
+    try:
+        while any(p.is_alive() for p in procs):
+            if duration is not None and time.perf_counter() - start >= duration:
+                break
+            time.sleep(0.05)
+            total_frames, total_dropped = sum(processed), sum(dropped)
+            frames_metric.inc(total_frames - seen_frames)
+            dropped_metric.inc(total_dropped - seen_dropped)
+            seen_frames, seen_dropped = total_frames, total_dropped
+    except KeyboardInterrupt:
+        print("[SUPERVISOR] Interrupted, shutting down.")
+    finally:
+        elapsed = time.perf_counter() - start
+        stop_capture.set()
+        for ring in rings:
+            ring.close()
+        stop_workers.set()
+        for p in procs:
+            p.join(timeout=5.0)
+        frames_metric.inc(sum(processed) - seen_frames)
+        dropped_metric.inc(sum(dropped) - seen_dropped)
+        for t in captures:
+            t.join(timeout=5.0)
+        event_q.put(None)
+        events.join(timeout=5.0)
+        db.close()
+        close_event_store()
+        close_webhook_dispatcher()
+        if server is not None:
+            server.close()
+        for ring in rings:
+            ring.release()
+
+    stats = {}
+    for i, (camera_id, _) in enumerate(sources):
+        stats[camera_id] = {
+            'processed': processed[i],
+            'dropped': dropped[i],
+            'fps': processed[i] / elapsed if elapsed > 0 else 0.0,
+        }
+    stats['_total'] = {
+        'processed': sum(processed),
+        'dropped': sum(dropped),
+        'fps': sum(processed) / elapsed if elapsed > 0 else 0.0,
+        'seconds': elapsed,
+        'workers': len(procs),
+    }
+    return stats
+
+
+def run_scaling_benchmark(video, max_cameras=None, frames=None):
+    """
+    Replays the same recording on 1..max_cameras virtual cameras (lossless,
+    no DB or local event store) and reports aggregate detector FPS and scaling efficiency
+    (fps_n / (n * fps_1)). Linear scaling shows up as ~1.0 up to the core count.
+    """
+    from benchmark import NullDBLogger, NullEventStore
+
+    max_cameras = max_cameras or os.cpu_count() or 1
+    results = []
+    for n in range(1, max_cameras + 1):
+        cameras = [{'camera_id': f"Replay_{i + 1:02d}", 'source': video} for i in range(n)]
+        if frames and str(video).startswith('synthetic'):
+            for cam in cameras:
+                cam['source'] = f"synthetic:{frames}"
+        stats = run_supervisor(cameras, db=NullDBLogger(), workers=n, lossless=True, telemetry_dir=None,
+                               store=NullEventStore())
+        results.append((n, stats['_total']['fps']))
+
+    base = results[0][1]
+    print(f"\n{'cameras':>8}{'agg FPS':>10}{'efficiency':>12}")
+    for n, fps in results:
+        eff = fps / (n * base) if base > 0 else 0.0
+        print(f"{n:>8}{fps:>10.1f}{eff:>12.2f}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-camera fall detection supervisor")
+    parser.add_argument('--config', help="JSON camera list (see load_camera_config)")
+    parser.add_argument('--workers', type=int, default=None, help="Detector processes (default: one per core)")
+    parser.add_argument('--lossless', action='store_true', help="Never drop frames (for replays)")
+    parser.add_argument('--scaling', metavar='VIDEO',
+                        help="Run the scaling benchmark on this recording (or 'synthetic') instead")
+    parser.add_argument('--max-cameras', type=int, default=None, help="Upper bound for --scaling")
+    parser.add_argument('--frames', type=int, default=300, help="Frames per synthetic camera for --scaling")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument('--status-port', type=int, default=None,
+                        help="Stream each camera's live status as SSE on PORT, PORT+1, ... in config order")
+    parser.add_argument('--preview-fps', type=float, default=0.0,
+                        help="JPEG preview frames per second on /preview with --status-port (0 = off)")
+    parser.add_argument('--clips', default=None, metavar='DIR',
+                        help="Save a pre/post-event video clip per fall alert to DIR")
+    parser.add_argument('--clip-gray', action='store_true', help="Buffer and save clips in grayscale")
+    parser.add_argument('--clip-scale', type=float, default=0.5, help="Scale of buffered clip frames (1.0 = full size)")
+    args = parser.parse_args()
+
+    if args.scaling:
+        run_scaling_benchmark(args.scaling, args.max_cameras, args.frames)
+    elif args.config:
+        stats = run_supervisor(load_camera_config(args.config), workers=args.workers,
+                               lossless=args.lossless, metrics_port=args.metrics_port,
+                               clips={'directory': args.clips, 'grayscale': args.clip_gray,
+                                      'scale': args.clip_scale} if args.clips else None,
+                               status={'port': args.status_port,
+                                       'preview_fps': args.preview_fps} if args.status_port else None)
+        for camera_id, s in stats.items():
+            print(f"[SUPERVISOR] {camera_id}: {s}")
+    else:
+        parser.error("either --config or --scaling is required")
@@ -0,0 +1,261 @@
+import contextlib
+import io
+
+import cv2
+import numpy as np
+
+from cylinder_pose import strip_object_points
+from generate_bottom_marker import bottom_marker_image
+from generate_cylinder_marker import create_marker_strip
+
+BOTTOM_MARKER_ID = 99
+
+
+def cylinder_rotation(tilt, spin=0.0, azimuth=90.0):
+    """
+    Rotation cylinder frame -> camera frame (cylinder frame as in
+    cylinder_pose: Y along the axis, up). The upright cylinder is turned by
+    `spin` degrees about its own axis, then tilted by `tilt` degrees about a
+    horizontal camera axis at `azimuth` degrees from camera X in the X-Z plane
+    (90 = in the image plane, sideways; 0 / 180 = toward / away from the camera).
+    The tilt is exactly the angle calculate_angle() measures.
+    """
+    upright = np.diag([1.0, -1.0, -1.0])  # cylinder up = camera up (-Y), facing the camera
+    s = np.radians(spin)
+    spin_m = np.array([[np.cos(s), 0.0, np.sin(s)], [0.0, 1.0, 0.0], [-np.sin(s), 0.0, np.cos(s)]])
+    a = np.radians(azimuth)
+    axis = np.array([np.cos(a), 0.0, np.sin(a)]) * np.radians(tilt)
+    tilt_m, _ = cv2.Rodrigues(axis)
+    return tilt_m @ upright @ spin_m
+
+
+class CylinderScene:
+    """
+    Ray-casts a cylinder wrapped in the marker strip from
+    generate_cylinder_marker.create_marker_strip, with the ID 99 marker from
+    generate_bottom_marker on its bottom cap, into labelled camera frames.
+
+    The camera is the detector's approximate calibration (focal length =
+    image width, principal point at the centre, no distortion), so angles
+    measured on the frames compare directly with the ground truth.
+    Textures are mip-mapped, and `supersample` renders at a multiple of the
+    output size and downsamples, so small distant markers are not aliased.
+    """
+
+    def __init__(self, diameter_mm=100.0, marker_size_mm=15.0, above_mm=100.0, below_mm=100.0,
+                 width=640, height=480, dpi=300, supersample=2):
+        self.radius = diameter_mm / 2000.0
+        self.marker_size = marker_size_mm / 1000.0
+        self.y_top = above_mm / 1000.0
+        self.y_bottom = -below_mm / 1000.0
+        self.width = width
+        self.height = height
+        self.supersample = supersample
+        self.camera_matrix = np.array([[width, 0, width / 2], [0, width, height / 2], [0, 0, 1]], dtype=np.float64)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            strip = create_marker_strip(diameter_mm, marker_size_mm, dpi)
+        self.strip_px_per_m = dpi / 0.0254
+        # Row of the strip's centre line (cylinder y = 0)
+        self.strip_center = strip.shape[0] / 2.0
+        self.strip_levels = self._mipmap(strip)
+        self.strip_width = strip.shape[1]
+        self.circumference = 2 * np.pi * self.radius
+
+        # Bottom sticker: marker plus quiet zone, a square spanning 1.3 radii
+        bottom = bottom_marker_image(BOTTOM_MARKER_ID)
+        self.bottom_side = 1.3 * self.radius
+        self.bottom_levels = self._mipmap(bottom)
+
+        self.marker_points = strip_object_points(diameter_mm / 1000.0, self.marker_size)
+
+    @staticmethod
+    def _mipmap(texture, min_size=8):
+        levels = [texture]
+        while min(levels[-1].shape) // 2 >= min_size:
+            levels.append(cv2.pyrDown(levels[-1]))
+        return levels
+
+    @staticmethod
+    def _level(levels, texels_per_pixel):
+        """Mip level whose texel density is closest to one texel per rendered pixel (not below)."""
+        level = int(np.clip(np.floor(np.log2(max(texels_per_pixel, 1.0))), 0, len(levels) - 1))
+        return levels[level], 2.0 ** -level
+
+    def render(self, tilt, distance, spin=0.0, azimuth=90.0, offset=(0.0, 0.0), blur=0.0, noise=0.0,
+               background=110, rng=None):
+        """
+        One BGR frame of the cylinder `distance` metres in front of the camera
+        (strip centre; offset shifts it in metres along camera X / Y).
+        blur: Gaussian sigma in output pixels; noise: sensor noise sigma in gray levels.
+        Returns (frame, label) with label = {'tilt', 'distance', 'blur', 'noise',
+        'rvec', 'tvec', 'visible_ids'}.
+        """
+        ss = self.supersample
+        w, h = self.width * ss, self.height * ss
+        f = self.width * ss
+        R = cylinder_rotation(tilt, spin, azimuth)
+        t = np.array([offset[0], offset[1], distance], dtype=np.float64)
+
+        # Camera rays in the cylinder frame
+        u = (np.arange(w, dtype=np.float32) + 0.5 - w / 2.0) / f
+        v = (np.arange(h, dtype=np.float32) + 0.5 - h / 2.0) / f
+        du, dv = np.meshgrid(u, v)
+        rays = np.stack([du, dv, np.ones_like(du)], axis=-1) @ R.astype(np.float32)  # R^T d per pixel
+        dx, dy, dz = rays[..., 0], rays[..., 1], rays[..., 2]
+        ox, oy, oz = (-R.T @ t).astype(np.float32)
+        r = self.radius
+
+        # Side: nearest intersection with x^2 + z^2 = r^2 inside the body's height
+        a = dx * dx + dz * dz
+        b = 2.0 * (ox * dx + oz * dz)
+        c = ox * ox + oz * oz - r * r
+        disc = b * b - 4.0 * a * c
+        with np.errstate(invalid='ignore', divide='ignore'):
+            s_side = (-b - np.sqrt(disc)) / (2.0 * a)
+        y_side = oy + s_side * dy
+        s_side = np.where((disc >= 0) & (s_side > 0) & (y_side >= self.y_bottom) & (y_side <= self.y_top),
+                          s_side, np.inf)
+
+        # Caps: planes y = y_bottom / y_top inside the radius
+        caps = []
+        for y_cap in (self.y_bottom, self.y_top):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                s = (y_cap - oy) / dy
+            x, z = ox + s * dx, oz + s * dz
+            caps.append((np.where((s > 0) & (x * x + z * z <= r * r), s, np.inf), x, z))
+        s_bottom, xb, zb = caps[0]
+        s_top = caps[1][0]
+
+        nearest = np.argmin(np.stack([s_side, s_bottom, s_top]), axis=0)
+        hit = np.isfinite(np.minimum(np.minimum(s_side, s_bottom), s_top))
+        ray_len = np.sqrt(a + dy * dy)
+        img = np.empty((h, w), dtype=np.float32)
+        img[:] = background + 25.0 * (np.arange(h, dtype=np.float32)[:, None] / h - 0.5)
+
+        # Side texture: arc length around the axis and height -> strip pixels
+        side = hit & (nearest == 0)
+        if side.any():
+            with np.errstate(invalid='ignore'):
+                xs, zs = ox + s_side * dx, oz + s_side * dz
+            arc = np.mod(np.arctan2(xs, zs) * r, self.circumference)
+            texels = self.strip_px_per_m * distance / f
+            tex, scale = self._level(self.strip_levels, texels)
+            map_x = (arc * self.strip_px_per_m * scale).astype(np.float32)
+            map_y = ((self.strip_center - y_side * self.strip_px_per_m) * scale).astype(np.float32)
+            map_x[~side] = -1
+            sampled = cv2.remap(tex, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT,
+                                borderValue=225).astype(np.float32)
+            facing = np.abs(xs * dx + zs * dz) / (r * ray_len)
+            img[side] = (sampled * (0.35 + 0.65 * facing))[side]
+
+        # Bottom cap: sticker square centred on the axis (marker up = cylinder +z)
+        bottom = hit & (nearest == 1)
+        if bottom.any():
+            tex, scale = self._level(self.bottom_levels, self.bottom_levels[0].shape[0] / self.bottom_side
+                                     * distance / f)
+            size = tex.shape[0]
+            map_x = ((xb / self.bottom_side + 0.5) * size).astype(np.float32)
+            map_y = ((-zb / self.bottom_side + 0.5) * size).astype(np.float32)
+            map_x[~bottom] = -1
+            sampled = cv2.remap(tex, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT,
+                                borderValue=225).astype(np.float32)
+            facing = np.abs(dy) / ray_len
+            img[bottom] = (sampled * (0.35 + 0.65 * facing))[bottom]
+
+        top = hit & (nearest == 2)
+        img[top] = 200.0 * (0.35 + 0.65 * (np.abs(dy) / ray_len))[top]
+
+        frame = cv2.resize(img, (self.width, self.height), interpolation=cv2.INTER_AREA) if ss > 1 else img
+        if blur > 0:
+            frame = cv2.GaussianBlur(frame, (0, 0), blur)
+        if noise > 0:
+            rng = rng if rng is not None else np.random.default_rng()
+            frame = frame + rng.normal(0.0, noise, frame.shape).astype(np.float32)
+        frame = cv2.cvtColor(np.clip(frame, 0, 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+
+        rvec, _ = cv2.Rodrigues(R)
+        label = {'tilt': float(tilt), 'distance': float(distance), 'blur': float(blur), 'noise': float(noise),
+                 'rvec': rvec.ravel().tolist(), 'tvec': t.tolist(),
+                 'visible_ids': self.visible_ids(R, t)}
+        return frame, label
+
+    def visible_ids(self, R, t, max_angle=60.0):
+        """Marker IDs facing the camera within max_angle and inside the frame (what a detector should find)."""
+        cos_max = np.cos(np.radians(max_angle))
+        ids = []
+        markers = list(self.marker_points.items())
+        markers.append((BOTTOM_MARKER_ID, None))
+        for marker_id, pts in markers:
+            if pts is None:
+                centre, normal = np.array([0.0, self.y_bottom, 0.0]), np.array([0.0, -1.0, 0.0])
+                half = self.bottom_side * 200 / 300 / 2  # code area of the sticker
+                pts = centre + np.array([[-half, 0, half], [half, 0, half], [half, 0, -half], [-half, 0, -half]])
+            else:
+                centre = pts.mean(axis=0)
+                normal = np.array([centre[0], 0.0, centre[2]]) / np.hypot(centre[0], centre[2])
+            c_cam = R @ centre + t
+            if -(R @ normal) @ c_cam / np.linalg.norm(c_cam) < cos_max:
+                continue
+            img, _ = cv2.projectPoints(np.asarray(pts, dtype=np.float64), cv2.Rodrigues(R)[0], t,
+                                       self.camera_matrix, None)
+            img = img.reshape(-1, 2)
+            if (img >= 0).all() and (img[:, 0] < self.width).all() and (img[:, 1] < self.height).all():
+                ids.append(int(marker_id))
+        return ids
+
+
+def scene_grid(tilts, distances, blurs, noises, seed=0):
+    """
+    render() keyword arguments for every combination of the given tilts /
+    distances / blur / noise levels, with a random spin, tilt direction,
+    small offset and noise seed per frame (all drawn from `seed`).
+    """
+    rng = np.random.default_rng(seed)
+    grid = []
+    for tilt in tilts:
+        for distance in distances:
+            for blur in blurs:
+                for noise in noises:
+                    grid.append({'tilt': tilt, 'distance': distance, 'blur': blur, 'noise': noise,
+                                 'spin': float(rng.uniform(-40, 40)), 'azimuth': float(rng.uniform(0, 360)),
+                                 'offset': tuple((rng.uniform(-0.15, 0.15, 2) * distance).tolist()),
+                                 'seed': int(rng.integers(2 ** 31))})
+    return grid
+
+
+def labelled_frames(scene, grid):
+    """Renders a scene_grid(); yields (gray frame, label)."""
+    for kwargs in grid:
+        kwargs = dict(kwargs)
+        rng = np.random.default_rng(kwargs.pop('seed', None))
+        frame, label = scene.render(rng=rng, **kwargs)
+        yield cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), label
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Render labelled synthetic cylinder frames")
+    parser.add_argument('--out', default='synthetic_frames', help="Output directory (PNG + labels.json)")
+    parser.add_argument('--diameter', type=float, default=100.0, help="Cylinder diameter (mm)")
+    parser.add_argument('--marker-size', type=float, default=15.0, help="Strip marker size (mm)")
+    parser.add_argument('--tilts', default="0,30,60,90", help="Tilt angles (degrees)")
+    parser.add_argument('--distances', default="0.3,0.6,1.0", help="Distances (m)")
+    parser.add_argument('--blurs', default="0,2", help="Gaussian blur sigmas (px)")
+    parser.add_argument('--noises', default="0,8", help="Noise sigmas (gray levels)")
+    args = parser.parse_args()
+
+    import json
+    import os
+    floats = lambda text: [float(v) for v in text.split(',')]
+    scene = CylinderScene(args.diameter, args.marker_size)
+    os.makedirs(args.out, exist_ok=True)
+    labels = {}
+    grid = scene_grid(floats(args.tilts), floats(args.distances), floats(args.blurs), floats(args.noises))
+    for i, (frame, label) in enumerate(labelled_frames(scene, grid)):
+        name = f"frame_{i:04d}.png"
+        cv2.imwrite(os.path.join(args.out, name), frame)
+        labels[name] = label
+    with open(os.path.join(args.out, 'labels.json'), 'w') as f:
+        json.dump(labels, f, indent=1)
+    print(f"[SCENE] Saved {len(labels)} labelled frames to {args.out}")
@@ -0,0 +1,271 @@
+import argparse
+import datetime
+import glob
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+# Per-frame stages stored with every record (milliseconds, NaN = not timed)
+STAGES = ('cvtColor', 'detectMarkers', 'estimatePose', 'calculate_angle', 'logging')
+
+MAGIC = b'CFDTELE1'
+HEADER_ALIGN = 64
+
+
+def telemetry_dtype(stages=STAGES):
+    """Fixed-width record: capture time, marker count, angle, fall flag, fall duration, stage timings."""
+    return np.dtype([('ts', '<f8'), ('markers', '<u2'), ('angle', '<f4'), ('detected', 'u1'),
+                     ('duration', '<f4')] + [(f"{s}_ms", '<f4') for s in stages])
+
+
+def _header(dtype, stages):
+    meta = json.dumps({'dtype': dtype.descr, 'stages': list(stages)}).encode('utf-8')
+    size = len(MAGIC) + 4 + len(meta)
+    pad = -size % HEADER_ALIGN
+    return MAGIC + struct.pack('<I', len(meta) + pad) + meta + b' ' * pad
+
+
+def _read_header(path):
+    """Returns (dtype, stages, data offset) of a telemetry file."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a telemetry file")
+        (length,) = struct.unpack('<I', f.read(4))
+        meta = json.loads(f.read(length).decode('utf-8'))
+    dtype = np.dtype([tuple(field) for field in meta['dtype']])
+    return dtype, meta['stages'], len(MAGIC) + 4 + length
+
+
+class TelemetryWriter:
+    """
+    Per-frame debug telemetry without file I/O on the video thread.
+
+    record() copies one fixed-width row into a preallocated NumPy structured
+    buffer (two buffers, swapped by the writer). A background thread flushes
+    the filled buffer every flush_interval seconds, or early when it is 3/4
+    full, as one bulk write. Files are rotated when they would exceed
+    max_bytes and when the day changes; each starts with a small header
+    describing the record layout so open_telemetry() can np.memmap it.
+    If the flusher falls behind a whole buffer, rows are dropped and counted
+    in stats['dropped'] instead of blocking detection.
+    """
+
+    def __init__(self, directory='telemetry', stages=STAGES, capacity=4096, flush_interval=1.0,
+                 max_bytes=64 * 1024 * 1024, prefix='telemetry'):
+        self.directory = directory
+        self.stages = tuple(stages)
+        self.dtype = telemetry_dtype(self.stages)
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.stats = {'records': 0, 'dropped': 0, 'flushes': 0, 'files': 0, 'bytes': 0, 'errors': 0}
+
+        self._buffers = [np.zeros(capacity, dtype=self.dtype), np.zeros(capacity, dtype=self.dtype)]
+        self._active = 0
+        self._count = 0
+        self._high_water = max(1, capacity * 3 // 4)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+        self._file = None
+        self._file_day = None
+        self._file_bytes = 0
+        self._header = _header(self.dtype, self.stages)
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, ts, markers, angle, detected, duration, timings=()):
+        """
+        Appends one row; timings are seconds per stage in self.stages order.
+        Never blocks on I/O. Returns False if the row was dropped.
+        """
+        row = (ts, markers, angle, detected, duration) + tuple(t * 1000.0 for t in timings)
+        with self._lock:
+            n = self._count
+            if n == self.capacity:
+                self.stats['dropped'] += 1
+                return False
+            self._buffers[self._active][n] = row
+            self._count = n + 1
+        self.stats['records'] += 1
+        if n + 1 == self._high_water:
+            self._wake.set()
+        return True
+
+    def close(self, timeout=5.0):
+        """Flushes pending rows and closes the current file."""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                self._flush()
+            self._flush()
+        finally:
+            if self._file is not None:
+                self._file.close()
+
+    def _flush(self):
+        with self._lock:
+            rows = self._buffers[self._active][:self._count]
+            self._active ^= 1
+            self._count = 0
+        if not len(rows):
+            return
+        data = rows.tobytes()
+        try:
+            self._rotate(len(data))
+            self._file.write(data)
+            self._file.flush()
+        except OSError as e:
+            self.stats['errors'] += 1
+            print(f"[TELEMETRY ERROR] {len(rows)} rows lost: {e}")
+            if self._file is not None:
+                self._file.close()
+            self._file = None
+            return
+        self._file_bytes += len(data)
+        self.stats['bytes'] += len(data)
+        self.stats['flushes'] += 1
+
+    def _rotate(self, incoming):
+        now = datetime.datetime.now()
+        day = now.strftime('%Y%m%d')
+        if (self._file is not None and day == self._file_day
+                and self._file_bytes + incoming <= self.max_bytes):
+            return
+        if self._file is not None:
+            self._file.close()
+        # Milliseconds in the name keep files from quick successive rotations apart
+        name = f"{self.prefix}_{now.strftime('%Y%m%d_%H%M%S_%f')[:-3]}.bin"
+        self._file = open(os.path.join(self.directory, name), 'wb')
+        self._file.write(self._header)
+        self._file_day = day
+        self._file_bytes = len(self._header)
+        self.stats['files'] += 1
+
+
+def open_telemetry(path):
+    """Memory-maps one telemetry file as a read-only structured array (no parsing)."""
+    dtype, _, offset = _read_header(path)
+    count = (os.path.getsize(path) - offset) // dtype.itemsize  # ignores a torn last row
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+
+
+def telemetry_files(directory='telemetry', day=None, prefix='telemetry'):
+    """Telemetry files in write order; day as 'YYYYMMDD', 'YYYY-MM-DD' or a date."""
+    if day is None:
+        pattern = f"{prefix}_*.bin"
+    else:
+        if isinstance(day, (datetime.date, datetime.datetime)):
+            day = day.strftime('%Y%m%d')
+        pattern = f"{prefix}_{day.replace('-', '')}_*.bin"
+    return sorted(glob.glob(os.path.join(directory, pattern)))
+
+
+def load_telemetry(directory='telemetry', day=None, prefix='telemetry'):
+    """
+    All records of one day (or everything) as one structured array.
+    A single file is returned as its memmap; several are concatenated.
+    """
+    arrays = [open_telemetry(p) for p in telemetry_files(directory, day, prefix)]
+    if not arrays:
+        return np.zeros(0, dtype=telemetry_dtype())
+    if len(arrays) == 1:
+        return arrays[0]
+    return np.concatenate(arrays)
+
+
+def export_csv(records, path):
+    """Writes records as CSV with the old debug_stream.csv columns first, then stage timings."""
+    stage_fields = [name for name in records.dtype.names if name.endswith('_ms')]
+    # Local wall-clock time, as the old debug_stream.csv had
+    offset = datetime.datetime.now().astimezone().utcoffset().total_seconds()
+    stamps = np.datetime_as_string(((records['ts'] + offset) * 1e6).astype('datetime64[us]'), unit='ms')
+    columns = [records[name] for name in ('markers', 'angle', 'detected', 'duration')]
+    columns += [records[name] for name in stage_fields]
+    with open(path, 'w') as f:
+        f.write(",".join(["Time", "Markers", "Angle", "FallDetected", "Duration"] + stage_fields) + "\n")
+        for stamp, markers, angle, detected, duration, *timings in zip(stamps, *columns):
+            f.write(f"{stamp},{markers},{angle:.1f},{detected},{duration:.2f}"
+                    + "".join(f",{t:.3f}" for t in timings) + "\n")
+
+
+def summarize(records):
+    """Quick overview of a record array: span, marker / angle stats, p50/p95 per stage."""
+    if not len(records):
+        return {'records': 0}
+    out = {
+        'records': int(len(records)),
+        'start': datetime.datetime.fromtimestamp(float(records['ts'][0])).isoformat(sep=' '),
+        'end': datetime.datetime.fromtimestamp(float(records['ts'][-1])).isoformat(sep=' '),
+        'max_angle': float(records['angle'].max()),
+        'fall_records': int(records['detected'].sum()),
+        'mean_markers': float(records['markers'].mean()),
+    }
+    for name in records.dtype.names:
+        if name.endswith('_ms'):
+            values = records[name][~np.isnan(records[name])]
+            if values.size:
+                p50, p95 = np.percentile(values, [50, 95])
+                out[name] = {'p50': float(p50), 'p95': float(p95)}
+    return out
+
+
+def bench_record_cost(records=10000):
+    """Caller-side cost per row: the old open/getsize/append CSV path vs TelemetryWriter.record()."""
+    import tempfile
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, "debug_stream.csv")
+        t0 = time.perf_counter()
+        for i in range(records):
+            with open(path, "a") as f:
+                if os.path.getsize(path) == 0:
+                    f.write("Time,Markers,Angle,FallDetected,Duration\n")
+                f.write(f"{datetime.datetime.now().strftime('%H:%M:%S.%f')},3,{i % 90},0,0.00\n")
+        csv_us = (time.perf_counter() - t0) / records * 1e6
+
+        writer = TelemetryWriter(os.path.join(scratch, "telemetry"), capacity=max(4096, records))
+        timings = (0.001,) * len(STAGES)
+        t0 = time.perf_counter()
+        for i in range(records):
+            writer.record(time.time(), 3, i % 90, 0, 0.0, timings)
+        bin_us = (time.perf_counter() - t0) / records * 1e6
+        writer.close()
+        print(f"[TELEMETRY BENCH] CSV append {csv_us:.1f} us/row | binary record {bin_us:.1f} us/row "
+              f"| {writer.stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or export binary fall-detection telemetry")
+    parser.add_argument('directory', nargs='?', default='telemetry')
+    parser.add_argument('--day', default=None, help="YYYYMMDD or YYYY-MM-DD (default: all files)")
+    parser.add_argument('--csv', default=None, help="Export the selected records to this CSV file")
+    parser.add_argument('--bench', type=int, default=0, metavar='N',
+                        help="Compare per-row cost of the old CSV append and record() over N rows")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench_record_cost(args.bench)
+        raise SystemExit
+
+    t0 = time.perf_counter()
+    records = load_telemetry(args.directory, args.day)
+    print(f"[TELEMETRY] Loaded {len(records)} records in {(time.perf_counter() - t0) * 1000:.1f} ms")
+    print(json.dumps(summarize(records), indent=2))
+    if args.csv:
+        export_csv(records, args.csv)
+        print(f"[TELEMETRY] Wrote {args.csv}")
@@ -0,0 +1,53 @@
+class TiltFilter:
+    """
+    Alpha-beta filter on one cylinder's tilt (degrees) with a hold-over window.
+
+    update(z, ts) folds in a measured tilt; predict(ts) extrapolates with the
+    estimated tilt rate when the markers were not seen this frame (blur,
+    turned away, or a frame where detection did not run). Within hold_s
+    seconds of the last measurement the prediction is trusted with a
+    confidence decaying linearly from 1 to 0; after that the filter reports
+    (0.0, 0.0) and restarts from the next measurement.
+    The bottom marker is held over the same way (bottom()).
+    """
+    __slots__ = ('alpha', 'beta', 'hold_s', 'angle', 'rate', 'ts', 'meas_ts', 'bottom_ts')
+
+    def __init__(self, alpha=0.6, beta=0.1, hold_s=1.0):
+        self.alpha = alpha
+        self.beta = beta
+        self.hold_s = hold_s
+        self.angle = 0.0
+        self.rate = 0.0        # degrees per second
+        self.ts = None         # time of the current estimate
+        self.meas_ts = None    # time of the last measurement
+        self.bottom_ts = None  # time the bottom marker was last seen
+
+    def update(self, z, ts):
+        """Measurement z at capture time ts; returns (filtered angle, confidence)."""
+        if self.meas_ts is None or ts - self.meas_ts > self.hold_s:
+            self.angle, self.rate = z, 0.0
+        else:
+            dt = ts - self.ts
+            predicted = self.angle + self.rate * dt
+            residual = z - predicted
+            self.angle = predicted + self.alpha * residual
+            if dt > 0:
+                self.rate += self.beta * residual / dt
+        self.angle = min(max(self.angle, 0.0), 180.0)
+        self.ts = self.meas_ts = ts
+        return self.angle, 1.0
+
+    def predict(self, ts):
+        """No measurement this frame; returns (predicted angle, confidence)."""
+        if self.meas_ts is None or ts - self.meas_ts > self.hold_s:
+            return 0.0, 0.0
+        self.angle = min(max(self.angle + self.rate * (ts - self.ts), 0.0), 180.0)
+        self.ts = ts
+        return self.angle, 1.0 - (ts - self.meas_ts) / self.hold_s
+
+    def bottom(self, seen, ts):
+        """Whether the bottom marker counts as visible at ts (seen now, or within hold_s)."""
+        if seen:
+            self.bottom_ts = ts
+            return True
+        return self.bottom_ts is not None and ts - self.bottom_ts <= self.hold_s
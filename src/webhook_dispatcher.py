@@ -0,0 +1,167 @@
+import queue
+import random
+import socket
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+from instrumentation import SINK_FAILURES, WEBHOOK_SECONDS
+
+_STOP = object()
+
+
+class WebhookDispatcher:
+    """
+    Fixed pool of worker threads posting JSON alerts to the Logic App.
+
+    - All workers share one requests.Session, so TLS connections are kept
+      alive and reused instead of a new handshake per alert.
+    - send() never blocks: alerts go into a bounded queue, and when it is
+      full the alert is counted in stats['overflow'] and dropped.
+    - Connection errors, timeouts, 429 and 5xx are retried with exponential
+      backoff and full jitter; other 4xx responses are not retried.
+    - dedupe_key: an alert whose key was already accepted within
+      dedupe_ttl seconds is ignored (e.g. the same fall stage re-sent); an
+      alert dropped on overflow does not count as accepted.
+    - close() stops intake and drains the queue before returning.
+    - check_reachable() opens a bare TCP connection to the endpoint (no
+      request, so the Logic App does not run) for startup readiness checks.
+    requests is imported on construction, not with this module.
+    """
+
+    def __init__(self, url, workers=2, queue_size=100, timeout=30.0, max_retries=5,
+                 backoff_base=1.0, backoff_max=60.0, dedupe_ttl=3600.0, session=None):
+        self.url = url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.dedupe_ttl = dedupe_ttl
+        self.stats = {'queued': 0, 'sent': 0, 'failed': 0, 'retries': 0,
+                      'overflow': 0, 'deduped': 0, 'high_water': 0}
+
+        import requests
+        from requests.adapters import HTTPAdapter
+        self._request_error = requests.RequestException
+        self.reachable = None
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._seen = OrderedDict()  # dedupe_key -> expiry (monotonic)
+        self._lock = threading.Lock()
+        self._closing = threading.Event()
+        self._workers = [threading.Thread(target=self._run, name=f"webhook-{i}", daemon=True)
+                         for i in range(workers)]
+        for w in self._workers:
+            w.start()
+
+    def send(self, payload, dedupe_key=None):
+        """Queues one alert. Returns False if it was a duplicate, overflowed or the dispatcher is closed."""
+        if self._closing.is_set():
+            return False
+        if dedupe_key is not None and not self._claim(dedupe_key):
+            self.stats['deduped'] += 1
+            return False
+        try:
+            self._queue.put_nowait((payload, dedupe_key))
+        except queue.Full:
+            if dedupe_key is not None:
+                self._release(dedupe_key)  # dropped, so a retry of this alert is not a duplicate
+            self.stats['overflow'] += 1
+            SINK_FAILURES.labels('webhook', 'overflow').inc()
+            print(f"[WEBHOOK ERROR] Queue full ({self._queue.maxsize}), alert dropped.")
+            return False
+        self.stats['queued'] += 1
+        self.stats['high_water'] = max(self.stats['high_water'], self._queue.qsize())
+        return True
+
+    def close(self, timeout=10.0):
+        """Stops accepting alerts and waits up to timeout for queued ones to be delivered."""
+        self._closing.set()
+        deadline = time.monotonic() + timeout
+        for _ in self._workers:
+            try:
+                self._queue.put(_STOP, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for w in self._workers:
+            w.join(max(0.0, deadline - time.monotonic()))
+        pending = self._queue.qsize()
+        if pending:
+            print(f"[WEBHOOK ERROR] Shutdown with {pending} undelivered alert(s).")
+        self.session.close()
+
+    def _claim(self, key):
+        now = time.monotonic()
+        with self._lock:
+            while self._seen:
+                oldest, expiry = next(iter(self._seen.items()))
+                if expiry > now:
+                    break
+                del self._seen[oldest]
+            if key in self._seen:
+                return False
+            self._seen[key] = now + self.dedupe_ttl
+            return True
+
+    def _release(self, key):
+        with self._lock:
+            self._seen.pop(key, None)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            payload, dedupe_key = item
+            self._deliver(payload, dedupe_key)
+
+    def check_reachable(self, timeout=5.0):
+        """Whether the endpoint accepts a TCP connection; sets self.reachable."""
+        parts = urlsplit(self.url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        try:
+            with socket.create_connection((parts.hostname, port), timeout=timeout):
+                self.reachable = True
+        except (OSError, TypeError) as e:
+            print(f"[WEBHOOK] Endpoint {parts.hostname}:{port} not reachable: {e}")
+            self.reachable = False
+        return self.reachable
+
+    def _deliver(self, payload, dedupe_key):
+        headers = {'Idempotency-Key': dedupe_key} if dedupe_key else None
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self.session.post(self.url, json=payload, headers=headers, timeout=self.timeout)
+                outcome = 'ok' if response.status_code < 400 else f"{response.status_code // 100}xx"
+                WEBHOOK_SECONDS.labels(outcome).observe(time.perf_counter() - start)
+                if response.status_code < 400:
+                    self.stats['sent'] += 1
+                    print(f"[WEBHOOK] Sent. Status: {response.status_code} | Body: {response.text}")
+                    return True
+                if response.status_code != 429 and response.status_code < 500:
+                    print(f"[WEBHOOK ERROR] Rejected. Status: {response.status_code} | Body: {response.text}")
+                    SINK_FAILURES.labels('webhook', 'rejected').inc()
+                    self.stats['failed'] += 1
+                    return False
+                error = f"HTTP {response.status_code}"
+            except self._request_error as e:
+                WEBHOOK_SECONDS.labels('error').observe(time.perf_counter() - start)
+                error = e
+            if attempt == self.max_retries:
+                print(f"[WEBHOOK ERROR] {error} (giving up after {attempt + 1} attempts)")
+                SINK_FAILURES.labels('webhook', 'gave_up').inc()
+                break
+            # Full jitter: spread retries so many cameras do not retry in lockstep
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+            self.stats['retries'] += 1
+            print(f"[WEBHOOK ERROR] {error}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+        self.stats['failed'] += 1
+        return False